@@ -2,6 +2,8 @@
 import pandas as pd
 from datetime import datetime
 
+from emotion_rules import ScoreRules
+
 # ================= CONFIGURATION =================
 INPUT_FILE = "predicted_history.csv"      # <-- Apni file ka naam yahan likho agar alag hai
 OUTPUT_FILE = "predicted_history_with_emotions.csv"  # Final file with emotions
@@ -150,42 +152,8 @@ DOMAIN_TO_EDUCATION = {
     "xvideos.com": 1,
 }
 
-def add_emotions_file(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
-    """Read CSV at input_file, add emotion mappings and scores, save to output_file and return dataframe.
-    This function encapsulates the original script behavior so it can be used as an API.
-    """
-
-    print("Loading your browsing history with predictions...")
-    df = pd.read_csv(input_file)
-
-    print(f"Total visits loaded: {len(df)}")
-
-    # Step 1: Clean category names (remove extra spaces, lowercase for safety)
-    if 'predicted_category' in df.columns:
-        df['predicted_category'] = df['predicted_category'].astype(str).str.strip()
-    else:
-        print("ERROR: 'predicted_category' column not found!")
-        print("Available columns:", list(df.columns))
-        raise ValueError("predicted_category column missing")
-
-    # Step 2: Map category → emotion
-    df['predicted_emotion'] = df['predicted_category'].map(EMOTION_MAPPING)
-
-    # Step 3: Fallback using domain (bohat powerful!)
-    def get_emotion_from_domain(row):
-        if pd.notna(row['predicted_emotion']):
-            return row['predicted_emotion']
-
-        domain = str(row.get('url_domain', '')).lower()
-        for key, emotion in DOMAIN_TO_EMOTION.items():
-            if key in domain:
-                return emotion
-        return "Neutral"  # Final fallback
-
-    df['predicted_emotion'] = df.apply(get_emotion_from_domain, axis=1)
-
-    # Step 4: Add emotion intensity score (-3 to +3)
-    EMOTION_SCORE = {
+# Emotion intensity score (-3 to +3)
+EMOTION_SCORE = {
     "Joy": 3,
     "Excitement": 2,
     "Pride": 2,
@@ -202,41 +170,49 @@ def add_emotions_file(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
     "Guilt": -3,
 }
 
+# Output column -> (category mapping, domain fallback, default), compiled once
+SCORE_RULES = ScoreRules({
+    'predicted_emotion': (EMOTION_MAPPING, DOMAIN_TO_EMOTION, "Neutral"),
+    'stress_score': (STRESS_MAPPING, DOMAIN_TO_STRESS, 1),
+    'social_media_score': (SOCIAL_MEDIA_MAPPING, DOMAIN_TO_SOCIAL_MEDIA, 1),
+    'education_score': (EDUCATION_MAPPING, DOMAIN_TO_EDUCATION, 1),
+})
+
+# Column order of the scored file
+SCORE_COLUMNS = ['predicted_emotion', 'emotion_score', 'stress_score', 'social_media_score', 'education_score']
+
+def score_emotions(df):
+    """Add predicted_emotion, emotion_score and the stress / social media / education scores
+    to a dataframe with predicted_category, in memory.
+    """
+    # Step 1: Clean category names (remove extra spaces, lowercase for safety)
+    if 'predicted_category' in df.columns:
+        df['predicted_category'] = df['predicted_category'].astype(str).str.strip()
+    else:
+        print("ERROR: 'predicted_category' column not found!")
+        print("Available columns:", list(df.columns))
+        raise ValueError("predicted_category column missing")
+
+    # Steps 2-5: category → emotion and scores, falling back to the domain
+    # (bohat powerful!); the domain rules run once per distinct url_domain
+    for column in SCORE_COLUMNS:
+        if column not in df.columns:
+            df[column] = None  # keeps the output column order
+    df = SCORE_RULES.apply(df)
     df['emotion_score'] = df['predicted_emotion'].map(EMOTION_SCORE)
+    return df
+
+def add_emotions_file(input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    """Read CSV at input_file, add emotion mappings and scores, save to output_file and return dataframe.
+    This function encapsulates the original script behavior so it can be used as an API.
+    """
 
-    # Step 5: Add stress, social media, and education scores
-    df['stress_score'] = df['predicted_category'].map(STRESS_MAPPING)
-    def get_stress_from_domain(row):
-        if pd.notna(row['stress_score']):
-            return row['stress_score']
-        domain = str(row.get('url_domain', '')).lower()
-        for key, score in DOMAIN_TO_STRESS.items():
-            if key in domain:
-                return score
-        return 1  # Default
-    df['stress_score'] = df.apply(get_stress_from_domain, axis=1)
+    print("Loading your browsing history with predictions...")
+    df = pd.read_csv(input_file)
 
-    df['social_media_score'] = df['predicted_category'].map(SOCIAL_MEDIA_MAPPING)
-    def get_social_media_from_domain(row):
-        if pd.notna(row['social_media_score']):
-            return row['social_media_score']
-        domain = str(row.get('url_domain', '')).lower()
-        for key, score in DOMAIN_TO_SOCIAL_MEDIA.items():
-            if key in domain:
-                return score
-        return 1  # Default
-    df['social_media_score'] = df.apply(get_social_media_from_domain, axis=1)
+    print(f"Total visits loaded: {len(df)}")
 
-    df['education_score'] = df['predicted_category'].map(EDUCATION_MAPPING)
-    def get_education_from_domain(row):
-        if pd.notna(row['education_score']):
-            return row['education_score']
-        domain = str(row.get('url_domain', '')).lower()
-        for key, score in DOMAIN_TO_EDUCATION.items():
-            if key in domain:
-                return score
-        return 1  # Default
-    df['education_score'] = df.apply(get_education_from_domain, axis=1)
+    df = score_emotions(df)
 
     # Step 6: Save the final file
     df.to_csv(output_file, index=False)
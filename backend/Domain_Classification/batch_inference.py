@@ -0,0 +1,106 @@
+# batch_inference.py
+import os
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from model_registry import load_model_file, model_version
+
+# Worker processes for large prediction batches (0 = one per CPU)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0")) or os.cpu_count() or 1
+# URLs per task sent to a worker
+INFERENCE_CHUNK_SIZE = int(os.getenv("INFERENCE_CHUNK_SIZE", "20000"))
+
+# Model loaded once in each worker process by _init_worker (memory-mapped
+# where the artifact allows it, so the workers share its pages)
+_worker_model = None
+
+def _init_worker(model_path, version):
+    # Refuse a file that is no longer the version the caller loaded, so
+    # predictions are never cached under another model's version
+    global _worker_model
+    before = model_version(model_path)
+    model, _ = load_model_file(model_path)
+    after = model_version(model_path)
+    if version is not None and not before == after == version:
+        raise RuntimeError(f"{model_path} is version {after}, expected {version}")
+    _worker_model = model
+
+def _predict_chunk(urls):
+    return _worker_model.predict(urls)
+
+_pool_lock = threading.Lock()
+_pool = None
+_pool_key = None    # (model_path, version, workers) the pool's workers have loaded
+_pool_users = {}    # pool -> callers currently mapping on it
+
+@contextmanager
+def _use_pool(model_path, version, workers):
+    """
+    Process pool whose workers hold the given model version, reserved for the
+    with block. A pool for another version is replaced, but only shut down once
+    its last caller is done, so a running map never submits to a closed pool.
+    """
+    global _pool, _pool_key
+    key = (model_path, version, workers)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None and not _pool_users.get(_pool):
+                _pool.shutdown(wait=False)
+            # spawn, not fork: requests are served from threads
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker, initargs=(model_path, version)
+            )
+            _pool_key = key
+        pool = _pool
+        _pool_users[pool] = _pool_users.get(pool, 0) + 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[pool] -= 1
+            if not _pool_users[pool]:
+                del _pool_users[pool]
+                if pool is not _pool:
+                    pool.shutdown(wait=False)
+
+def shutdown_pool():
+    """
+    Shut the current pool down, or leave that to its last caller if it is in use.
+    """
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is not None and not _pool_users.get(_pool):
+            _pool.shutdown()
+        _pool = _pool_key = None
+
+def predict_urls(model, urls, model_path=None, version=None, workers=INFERENCE_WORKERS,
+                 chunk_size=INFERENCE_CHUNK_SIZE):
+    """
+    Predict a category for each of `urls` (already deduplicated by the caller).
+    Inputs larger than two chunks are split into chunk_size pieces and spread
+    across a process pool that loads the model from model_path once per worker;
+    smaller ones, or calls without a model_path, run in this process. So do
+    batches whose workers find model_path no longer matches `version`.
+    """
+    global _pool_key
+    urls = list(urls)
+    if model_path is None or workers <= 1 or len(urls) <= 2 * chunk_size:
+        return np.asarray(model.predict(urls), dtype=object)
+
+    chunks = [urls[start:start + chunk_size] for start in range(0, len(urls), chunk_size)]
+    with _use_pool(model_path, version, workers) as pool:
+        try:
+            return np.concatenate([np.asarray(part, dtype=object) for part in pool.map(_predict_chunk, chunks)])
+        except BrokenProcessPool:
+            # The workers refused the file (it changed since `model` was
+            # loaded); the next call starts a new pool
+            with _pool_lock:
+                if _pool is pool:
+                    _pool_key = None
+    return np.asarray(model.predict(urls), dtype=object)
@@ -0,0 +1,114 @@
+# correlation.py
+import os
+
+import numpy as np
+import pandas as pd
+
+from add_emotions import score_emotions
+
+# Score columns correlated by /correlation, in the order of the matrix
+CORRELATION_COLUMNS = ['stress_score', 'social_media_score', 'education_score', 'emotion_score']
+# Rows per chunk when reading a CSV
+CORRELATION_CHUNK_ROWS = int(os.getenv("CORRELATION_CHUNK_ROWS", "100000"))
+
+class CoMoments:
+    """
+    Running count, means and co-moment matrix (sums of products of
+    deviations from the mean) of a set of columns, over the rows where all of
+    them are present. Batches are folded in with the pairwise update of Chan
+    et al., so states of separate chunks, partitions or users merge into the
+    state of their union, and a batch folded in before can be taken out again.
+    """
+    def __init__(self, columns=CORRELATION_COLUMNS, n=0, mean=None, comoment=None):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = int(n)
+        self.mean = np.zeros(k) if mean is None else np.asarray(mean, dtype=float)
+        self.comoment = np.zeros((k, k)) if comoment is None else np.asarray(comoment, dtype=float)
+
+    @classmethod
+    def from_frame(cls, df, columns=CORRELATION_COLUMNS):
+        state = cls(columns)
+        state.update(df)
+        return state
+
+    def _combine(self, n, mean, comoment, sign):
+        if n == 0:
+            return
+        if sign > 0:
+            total = self.n + n
+            delta = mean - self.mean
+            self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.n * n / total)
+            self.mean = self.mean + delta * (n / total)
+            self.n = total
+            return
+        rest = self.n - n
+        if rest < 0:
+            raise ValueError("Cannot remove more rows than were added")
+        if rest == 0:
+            self.n, self.mean, self.comoment = 0, np.zeros_like(self.mean), np.zeros_like(self.comoment)
+            return
+        rest_mean = (self.n * self.mean - n * mean) / rest
+        delta = mean - rest_mean
+        self.comoment = self.comoment - comoment - np.outer(delta, delta) * (rest * n / self.n)
+        self.mean = rest_mean
+        self.n = rest
+
+    def update(self, df, sign=1):
+        """
+        Fold in the rows of df (sign=-1 takes them out). Values are coerced to
+        numbers and rows missing any of the columns are skipped.
+        """
+        values = np.column_stack([pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=float)
+                                  for c in self.columns]) if len(df) else np.empty((0, len(self.columns)))
+        values = values[~np.isnan(values).any(axis=1)]
+        if not len(values):
+            return self
+        mean = values.mean(axis=0)
+        deviations = values - mean
+        self._combine(len(values), mean, deviations.T @ deviations, sign)
+        return self
+
+    def merge(self, other):
+        """
+        Fold in another state over the same columns.
+        """
+        if other.columns != self.columns:
+            raise ValueError(f"Cannot merge states over different columns: {other.columns}")
+        self._combine(other.n, other.mean, other.comoment, 1)
+        return self
+
+    def corr(self):
+        """
+        Pearson correlation matrix as a DataFrame (NaN where a column is constant).
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scale = np.sqrt(np.diag(self.comoment))
+            matrix = self.comoment / np.outer(scale, scale)
+        matrix[~np.isfinite(matrix)] = np.nan
+        matrix = np.clip(matrix, -1, 1)
+        np.fill_diagonal(matrix, np.where(scale > 0, 1.0, np.nan))
+        return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+
+    def to_dict(self):
+        return {"columns": self.columns, "n": self.n, "mean": self.mean.tolist(), "comoment": self.comoment.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(state['columns'], state['n'], state['mean'], state['comoment'])
+
+def comoments_from_csv(path, chunk_rows=CORRELATION_CHUNK_ROWS):
+    """
+    CoMoments of the score columns of a CSV, read chunk_rows at a time.
+    Files with predicted_category are scored the same way as add_emotions_file;
+    others must already have the score columns.
+    """
+    state = CoMoments()
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        if 'predicted_category' in chunk.columns:
+            chunk = score_emotions(chunk)
+        missing = [col for col in CORRELATION_COLUMNS if col not in chunk.columns]
+        if missing:
+            raise ValueError(f"Missing required columns in data for correlation: {missing}")
+        state.update(chunk)
+    return state
@@ -0,0 +1,84 @@
+# emotion_data.py
+import os
+import threading
+
+import pandas as pd
+
+class QueryError(ValueError):
+    """
+    Raised for malformed row selection parameters (offset, limit, tail, fields).
+    """
+
+class CsvCache:
+    """
+    Parsed CSV files kept in memory, re-read only when a file's size or
+    modification time changes.
+    """
+    def __init__(self, reader=pd.read_csv):
+        self.reader = reader
+        self._lock = threading.Lock()
+        self._entries = {}  # path -> ((size, mtime_ns), df)
+
+    def get(self, path):
+        """
+        (df, stat) for the file at path, or (None, None) if it doesn't exist.
+        The frame is shared between callers and must not be modified.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None, None
+        key = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == key:
+                return entry[1], stat
+        df = self.reader(path)
+        with self._lock:
+            self._entries[path] = (key, df)
+        return df, stat
+
+def _parse_count(args, name):
+    value = args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise QueryError(f"Invalid {name}: {value!r}")
+    if value < 0:
+        raise QueryError(f"{name} must be >= 0")
+    return value
+
+def parse_row_args(args):
+    """
+    Read the row selection parameters from a request's query string:
+    offset, limit, tail (the last N rows; overrides offset) and fields
+    (comma-separated column names).
+    """
+    fields = args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+    return {
+        'offset': _parse_count(args, 'offset') or 0,
+        'limit': _parse_count(args, 'limit'),
+        'tail': _parse_count(args, 'tail'),
+        'fields': fields,
+    }
+
+def select_rows(df, offset=0, limit=None, tail=None, fields=None):
+    """
+    Rows offset .. offset + limit of df (or its last `tail` rows, then
+    limited), with only the requested fields. Returns (rows, start), where
+    start is the position of the first returned row in df.
+    """
+    if fields:
+        unknown = [f for f in fields if f not in df.columns]
+        if unknown:
+            raise QueryError(f"Unknown fields: {unknown}")
+
+    start = max(len(df) - tail, 0) if tail is not None else min(offset, len(df))
+    stop = len(df) if limit is None else min(start + limit, len(df))
+    rows = df.iloc[start:stop]
+    if fields:
+        rows = rows[fields]
+    return rows, start
@@ -0,0 +1,87 @@
+# emotion_rules.py
+import re
+
+import numpy as np
+import pandas as pd
+
+class DomainMatcher:
+    """
+    All substring keys of several domain tables compiled into one regex.
+    Keys are tried longest first in a lookahead, so at every position the
+    regex reports the longest key starting there; the shorter keys matching at
+    the same position are exactly its prefixes, which are precomputed. That
+    gives every key contained in a domain from a single scan.
+    """
+    def __init__(self, tables):
+        self.tables = tables
+        keys = sorted({key for table in tables.values() for key in table}, key=len, reverse=True)
+        self.pattern = re.compile('(?=(' + '|'.join(map(re.escape, keys)) + '))') if keys else None
+        self.prefixes = {key: [k for k in keys if key.startswith(k)] for key in keys}
+        # Position of each key in each table, for first-match resolution
+        self.ranks = {name: {key: i for i, key in enumerate(table)} for name, table in tables.items()}
+
+    def contained_keys(self, domain):
+        if self.pattern is None:
+            return set()
+        found = set()
+        for match in self.pattern.finditer(domain):
+            found.update(self.prefixes[match.group(1)])
+        return found
+
+    def first_matches(self, domain):
+        """
+        {table name: value of the first key of that table contained in domain, or absent}.
+        """
+        found = self.contained_keys(domain)
+        result = {}
+        for name, ranks in self.ranks.items():
+            hits = [key for key in found if key in ranks]
+            if hits:
+                result[name] = self.tables[name][min(hits, key=ranks.__getitem__)]
+        return result
+
+class ScoreRules:
+    """
+    Output column -> (category mapping, domain-substring fallback, default),
+    with every domain table compiled into one DomainMatcher. For each row the
+    category mapping wins; otherwise the first key of the column's domain
+    table (in table order) contained in url_domain; otherwise the default.
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        self.matcher = DomainMatcher({column: table for column, (_, table, _) in rules.items()})
+
+    def domain_fallbacks(self, url_domain, columns):
+        """
+        Fallback value of each column for every row, from its url_domain. The
+        matcher runs once per distinct domain; rows get the result by their code.
+        """
+        codes, uniques = pd.factorize(pd.Series(url_domain, dtype=object), use_na_sentinel=False)
+        per_domain = [self.matcher.first_matches(str(domain).lower()) for domain in uniques]
+        fallbacks = {}
+        for column in columns:
+            default = self.rules[column][2]
+            values = np.array([found.get(column, default) for found in per_domain] or [default], dtype=object)
+            fallbacks[column] = values[codes] if len(codes) else values[:0]
+        return fallbacks
+
+    def apply(self, df, columns=None, category_column='predicted_category'):
+        """
+        Fill the given output columns (default all of them) from the
+        category mapping, falling back to the first matching domain key and then
+        the default. Same results as checking every row against every rule.
+        """
+        columns = list(self.rules if columns is None else columns)
+        if not columns:
+            return df
+        domains = df['url_domain'] if 'url_domain' in df.columns else pd.Series('', index=df.index)
+        fallbacks = self.domain_fallbacks(domains.to_numpy(dtype=object), columns)
+        for column in columns:
+            mapping = self.rules[column][0]
+            if category_column in df.columns:
+                mapped = df[category_column].map(mapping)
+            else:
+                mapped = pd.Series(np.nan, index=df.index, dtype=object)
+            fallback = pd.Series(fallbacks[column], index=df.index)
+            df[column] = fallback.where(mapped.isna(), mapped.astype(object)).infer_objects()
+        return df
@@ -0,0 +1,153 @@
+# model_registry.py
+import os
+import time
+import hashlib
+import warnings
+import threading
+from datetime import datetime
+
+import joblib
+
+# Minimum seconds between checks of the model file for a new version
+MODEL_CHECK_SECONDS = float(os.getenv("MODEL_CHECK_SECONDS", "5"))
+
+_version_lock = threading.Lock()
+_versions = {}  # (path, size, mtime_ns, inode) -> content hash
+
+def model_version(path):
+    """
+    Version of a model file: a hash of its contents, recomputed only when the
+    file's size, modification time or inode changes.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+    with _version_lock:
+        if key in _versions:
+            return _versions[key]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    version = digest.hexdigest()[:16]
+    with _version_lock:
+        _versions[key] = version
+    return version
+
+def load_model_file(path):
+    """
+    joblib.load with mmap_mode='r', so the numpy arrays of an uncompressed
+    artifact are memory-mapped and their pages shared by every process that
+    loads the same file. Compressed artifacts can't be mapped and are loaded
+    normally. Returns (model, memory_mapped).
+    """
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        model = joblib.load(path, mmap_mode='r')
+    mapped = not any('mmap' in str(w.message) for w in caught)
+    return model, mapped
+
+class ModelRegistry:
+    """
+    The classifier model, loaded on first use and swapped for a new version
+    when the file on disk changes. Callers take (model, version) from get() per
+    request, so requests already running keep the model they started with.
+    """
+    def __init__(self, path, check_seconds=MODEL_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._current = None      # (model, version) swapped as one reference
+        self._stat = None         # (size, mtime_ns, inode) of the loaded file
+        self._failed_stat = None  # ... of a version that failed to load, not retried
+        self._checked_at = 0.0
+        self.loaded_at = None
+        self.load_seconds = None
+        self.memory_mapped = None
+        self.reloads = 0
+        self.last_error = None
+
+    def _file_stat(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def _load(self, stat):
+        # Hash, load, then check the file is still the one `stat` describes, so
+        # the version always names the bytes that were loaded
+        start = time.perf_counter()
+        version = model_version(self.path)
+        model, mapped = load_model_file(self.path)
+        if self._file_stat() != stat:
+            raise RuntimeError(f"{self.path} changed while it was loaded; it is loaded again on the next check")
+        with self._lock:
+            replaced = self._current is not None
+            self._current = (model, version)
+            self._stat = stat
+            self.loaded_at = datetime.now().isoformat()
+            self.load_seconds = time.perf_counter() - start
+            self.memory_mapped = mapped
+            self.last_error = None
+            if replaced:
+                self.reloads += 1
+
+    def get(self):
+        """
+        (model, version), loading or reloading the file if needed.
+        Raises FileNotFoundError if no model has been loaded and the file is
+        missing. If a new version fails to load, the previous one stays in use.
+        """
+        now = time.monotonic()
+        with self._lock:
+            current = self._current
+            due = current is None or now - self._checked_at >= self.check_seconds
+            if due:
+                self._checked_at = now
+        if not due:
+            return current
+
+        try:
+            stat = self._file_stat()
+        except FileNotFoundError:
+            if current is None:
+                raise FileNotFoundError(f"Model file not found: {self.path}")
+            return current
+        if current is not None and stat in (self._stat, self._failed_stat):
+            return current
+
+        # One thread loads; the others keep serving the current model meanwhile
+        if not self._load_lock.acquire(blocking=current is None):
+            return current
+        try:
+            with self._lock:
+                if self._current is not None and self._stat == stat:
+                    return self._current
+            try:
+                self._load(stat)
+            except Exception as e:
+                with self._lock:
+                    self.last_error = f"{type(e).__name__}: {e}"
+                    self._failed_stat = stat
+                if current is None:
+                    raise
+        finally:
+            self._load_lock.release()
+        with self._lock:
+            return self._current
+
+    def info(self):
+        """
+        State of the registry for the /model endpoint.
+        """
+        with self._lock:
+            version = self._current[1] if self._current is not None else None
+            return {
+                "path": self.path,
+                "loaded": self._current is not None,
+                "version": version,
+                "loaded_at": self.loaded_at,
+                "load_seconds": self.load_seconds,
+                "memory_mapped": self.memory_mapped,
+                "reloads": self.reloads,
+                "last_error": self.last_error,
+                "check_seconds": self.check_seconds,
+            }
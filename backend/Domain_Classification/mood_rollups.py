@@ -0,0 +1,208 @@
+# mood_rollups.py
+import threading
+
+import numpy as np
+import pandas as pd
+
+from correlation import CoMoments
+
+# Seconds from the Chrome epoch (1601-01-01) to the Unix epoch (1970-01-01)
+CHROME_EPOCH_OFFSET = 11644473600
+
+PERIODS = ('daily', 'weekly', 'monthly')
+
+# Averaged score column -> name of the average in a trend point
+SCORE_POINTS = {
+    'emotion_score': 'mood_score',
+    'stress_score': 'avg_stress',
+    'social_media_score': 'avg_social_media',
+    'education_score': 'avg_education',
+}
+
+# Columns identifying a visit across refreshes of the emotions data. Not 'id':
+# that is derived from a client_id, so a rebuilt history can renumber it
+KEY_COLUMNS = ['profile', 'visit_id']
+
+MINUTES_PER_VISIT = 5  # Assumed time spent per visit in the emotion distribution
+
+def visit_times(df):
+    """
+    Timestamps of the visits: visit_time as exported by browsing-history
+    (Chrome microseconds since 1601) or any parseable datetime. Without a
+    visit_time column the rows get synthetic hourly timestamps from
+    2024-01-01, for demo data.
+    """
+    if 'visit_time' not in df.columns:
+        return pd.Series(pd.date_range(start='2024-01-01', periods=len(df), freq='h'), index=df.index)
+    values = df['visit_time']
+    if pd.api.types.is_numeric_dtype(values):
+        return pd.to_datetime(values - CHROME_EPOCH_OFFSET * 1_000_000, unit='us')
+    return pd.to_datetime(values)
+
+def visit_keys(df):
+    """
+    (profile, visit_id) of each visit as an index, or None when the visits
+    can't be told apart (no visit_id, missing or repeated keys). Exports from
+    before the profile column existed are keyed on visit_id alone.
+    """
+    if 'visit_id' not in df.columns or df['visit_id'].isna().any():
+        return None
+    if 'profile' in df.columns:
+        keys = pd.MultiIndex.from_arrays([df['profile'].astype(object).fillna('').to_numpy(),
+                                          df['visit_id'].to_numpy()], names=KEY_COLUMNS)
+    else:
+        keys = pd.Index(df['visit_id'].to_numpy(), name='visit_id')
+    return keys if keys.is_unique else None
+
+def period_labels(times, period):
+    """
+    Bucket label of each timestamp: '2025-09-03' (daily),
+    '2025-09-01/2025-09-07' (weekly) or '2025-09' (monthly).
+    """
+    if period == 'daily':
+        return times.dt.strftime('%Y-%m-%d')
+    return times.dt.to_period('W' if period == 'weekly' else 'M').astype(str)
+
+def bucket_totals(df, labels):
+    """
+    Per label: visits, the sum and non-null count of each score and a
+    histogram of predicted_emotion ('emotion:<name>' columns).
+    """
+    parts = {'visits': np.ones(len(df), dtype=np.int64)}
+    for column in SCORE_POINTS:
+        scores = pd.to_numeric(df[column], errors='coerce')
+        parts[f'sum:{column}'] = scores.fillna(0).to_numpy(dtype=float)
+        parts[f'n:{column}'] = scores.notna().to_numpy(dtype=np.int64)
+    parts = pd.DataFrame(parts, index=df.index)
+    emotions = pd.get_dummies(df['predicted_emotion'], prefix='emotion', prefix_sep=':', dtype=np.int64)
+    return pd.concat([parts, emotions], axis=1).groupby(labels.to_numpy()).sum()
+
+class MoodRollups:
+    """
+    Daily, weekly and monthly mood totals (visits, score sums and counts,
+    emotion histograms) of the emotions data. Averages and the most frequent
+    emotion of a bucket come from its totals, so reading the trends doesn't
+    depend on the number of visits. The co-moments of the scores over all
+    visits are kept the same way, for /correlation.
+
+    update() takes the whole current dataset. When its visits have a key
+    (profile and visit_id), only the visits added, removed or rescored since
+    the previous update are folded in; otherwise the totals are rebuilt. The
+    server calls it when it publishes new emotions data, so requests only read.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.tables = {period: pd.DataFrame() for period in PERIODS}
+        self.comoments = CoMoments()
+        self.source = None  # Tag of the data the totals reflect
+        self._rows = None   # Key-indexed emotion, scores and timestamp of the visits counted
+        self._key = None
+        self.last_update = None  # {'mode': 'rebuild' | 'incremental', 'added': n, 'removed': n}
+
+    def _fold(self, rows, sign):
+        if rows.empty:
+            return
+        self.comoments.update(rows, sign)
+        for period in PERIODS:
+            totals = bucket_totals(rows, period_labels(rows['_time'], period))
+            table = self.tables[period].add(sign * totals, fill_value=0).fillna(0)
+            self.tables[period] = table[table['visits'] > 0].sort_index()
+
+    def _contributions(self, df, keys):
+        rows = df[['predicted_emotion'] + list(SCORE_POINTS)].copy()
+        for column in SCORE_POINTS:
+            rows[column] = pd.to_numeric(rows[column], errors='coerce')
+        if keys is not None:
+            rows.index = keys
+        return rows
+
+    def update(self, df, source=None):
+        """
+        Bring the totals up to date with df, the full emotions dataset.
+        source tags the data version; an update for the current tag is skipped.
+        """
+        with self._lock:
+            if source is not None and source == self.source:
+                return
+            keys = visit_keys(df)
+            if 'visit_time' not in df.columns:
+                keys = None  # synthetic timestamps depend on row positions
+            key = tuple(keys.names) if keys is not None else None
+            rows = self._contributions(df, keys)
+            old = self._rows if key is not None else None
+
+            if old is None or self._key != key:
+                self.tables = {period: pd.DataFrame() for period in PERIODS}
+                self.comoments = CoMoments()
+                rows['_time'] = visit_times(df).to_numpy()
+                self._fold(rows, 1)
+                added, removed = rows, rows.iloc[:0]
+                mode = 'rebuild'
+            else:
+                known = rows.index.isin(old.index)
+                kept = old.index.isin(rows.index)
+                # Visits present before and now whose emotion or scores changed
+                common = old[kept]
+                current = rows.loc[common.index]
+                values = common.drop(columns='_time')
+                same = (values == current) | (values.isna() & current.isna())
+                changed = ~same.all(axis=1).to_numpy()
+
+                removed = pd.concat([old[~kept], common[changed]])
+                fresh = rows[~known].copy()
+                fresh['_time'] = visit_times(df[~known]).to_numpy()
+                rescored = current[changed].copy()
+                rescored['_time'] = common.loc[changed, '_time'].to_numpy()
+                added = pd.concat([fresh, rescored])
+
+                self._fold(removed, -1)
+                self._fold(added, 1)
+                rows = pd.concat([old[kept & ~old.index.isin(rescored.index)], added])
+                mode = 'incremental'
+
+            self._rows = rows if key is not None else None
+            self._key = key
+            self.source = source
+            self.last_update = {'mode': mode, 'added': len(added), 'removed': len(removed)}
+
+    def points(self, period):
+        """
+        One trend point per bucket, in label order: the average scores and the
+        most frequent emotion (alphabetically first on ties, 'Neutral' if none).
+        """
+        with self._lock:
+            table = self.tables[period]
+        if table.empty:
+            return []
+        points = pd.DataFrame({'period_label': table.index})
+        for column, name in SCORE_POINTS.items():
+            counts = table[f'n:{column}']
+            points[name] = (table[f'sum:{column}'] / counts.where(counts > 0)).to_numpy()
+        emotions = table[sorted(c for c in table.columns if c.startswith('emotion:'))]
+        if emotions.shape[1]:
+            labels = emotions.idxmax(axis=1).str[len('emotion:'):]
+            points['mood_label'] = labels.where(emotions.max(axis=1) > 0, 'Neutral').to_numpy()
+        else:
+            points['mood_label'] = 'Neutral'
+        return points.to_dict('records')
+
+    def correlation(self):
+        """
+        Copy of the score co-moments over all visits.
+        """
+        with self._lock:
+            return CoMoments.from_dict(self.comoments.to_dict())
+
+    def emotion_distribution(self):
+        """
+        Visits and estimated minutes per emotion over the whole dataset.
+        """
+        with self._lock:
+            table = self.tables['monthly']
+        totals = table[sorted(c for c in table.columns if c.startswith('emotion:'))].sum()
+        totals = totals[totals > 0]
+        return [
+            {'emotion': column[len('emotion:'):], 'visit_count': int(count),
+             'total_minutes': int(count) * MINUTES_PER_VISIT}
+            for column, count in totals.items()
+        ]
@@ -0,0 +1,95 @@
+# pipeline.py
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from add_emotions import score_emotions
+from prediction_cache import predict_with_cache
+
+class ResultStore:
+    """
+    The latest in-memory frame per name ('predicted', 'emotions'), with a
+    generation number that increases on every publish.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}  # name -> (df, generation, published_at as epoch seconds)
+        self._generation = 0
+
+    def publish(self, name, df):
+        """
+        Store df as the latest frame for name; returns (generation, published_at).
+        """
+        with self._lock:
+            self._generation += 1
+            self._frames[name] = (df, self._generation, time.time())
+            return self._frames[name][1:]
+
+    def get(self, name):
+        """
+        (df, generation, published_at), or None if nothing was published yet.
+        """
+        with self._lock:
+            return self._frames.get(name)
+
+class Persister:
+    """
+    Writes frames to CSV on a background thread. Files are replaced
+    atomically, and a write is skipped if a newer one for the same path was
+    queued after it.
+    """
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persist')
+        self._lock = threading.Lock()
+        self._latest = {}  # path -> generation of the newest queued write
+        self._written = {}  # path -> (size, mtime_ns) of the file as last written here
+        self.last_error = None
+
+    def submit(self, df, path, generation):
+        with self._lock:
+            self._latest[path] = generation
+        return self._executor.submit(self._write, df, path, generation)
+
+    def wrote(self, path, stat):
+        """
+        Whether the file with this os.stat() result is the one last written here.
+        """
+        with self._lock:
+            return self._written.get(path) == (stat.st_size, stat.st_mtime_ns)
+
+    def _write(self, df, path, generation):
+        with self._lock:
+            if self._latest.get(path) != generation:
+                return False  # superseded
+        try:
+            df.to_csv(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+            stat = os.stat(path)
+            with self._lock:
+                self._written[path] = (stat.st_size, stat.st_mtime_ns)
+            return True
+        except Exception as e:
+            self.last_error = f"{path}: {e}"
+            raise
+
+def run_pipeline(history_df, model, version, cache=None, model_path=None):
+    """
+    Classify and score a browsing-history frame in memory:
+    predict_with_cache -> score_emotions. Returns (predicted, emotions, info)
+    where info holds per-stage seconds and the cache hits/misses.
+    """
+    stages = {}
+
+    start = time.perf_counter()
+    predicted = history_df.loc[:, ~history_df.columns.str.contains('^Unnamed')].copy()
+    predicted['predicted_category'], cache_run = predict_with_cache(
+        model, predicted['url'], version, cache, model_path=model_path
+    )
+    stages['classify'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    emotions = score_emotions(predicted.copy())
+    stages['score'] = time.perf_counter() - start
+
+    return predicted, emotions, {"stages": stages, "cache": cache_run}
@@ -0,0 +1,140 @@
+# prediction_cache.py
+import os
+import time
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from batch_inference import predict_urls
+
+HERE = os.path.dirname(__file__)
+
+# On-disk cache of per-URL predictions, shared by every run and worker
+PREDICTION_CACHE_PATH = os.getenv("PREDICTION_CACHE_PATH", os.path.join(HERE, "prediction_cache.sqlite"))
+
+# Model versions whose predictions are kept, least recently stored evicted first;
+# two let the old and new model share the cache while a new one is swapped in
+PREDICTION_CACHE_VERSIONS = int(os.getenv("PREDICTION_CACHE_VERSIONS", "2"))
+
+# Keys per SELECT ... IN (...) (SQLite's default variable limit is 999)
+LOOKUP_BATCH = 900
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    url TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    category TEXT,
+    PRIMARY KEY (url, model_version)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS versions (
+    model_version TEXT PRIMARY KEY,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+class PredictionCache:
+    """
+    Predicted category per (url, model_version) in a SQLite table.
+    Lookups only match their own version, so a retrained model never reads
+    stale predictions. The max_versions most recently stored versions are kept;
+    older ones are evicted when a version is first stored by this process.
+    """
+    def __init__(self, path=PREDICTION_CACHE_PATH, max_versions=PREDICTION_CACHE_VERSIONS):
+        self.path = path
+        self.max_versions = max(1, max_versions)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._stored_versions = set()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get_many(self, urls, version):
+        """
+        Cached categories of the given URLs as a dict; absent URLs are left out.
+        """
+        found = {}
+        conn = self._connect()
+        try:
+            for start in range(0, len(urls), LOOKUP_BATCH):
+                batch = list(urls[start:start + LOOKUP_BATCH])
+                rows = conn.execute(
+                    f"SELECT url, category FROM predictions WHERE model_version = ? "
+                    f"AND url IN ({','.join('?' * len(batch))})", [version] + batch
+                )
+                found.update(rows)
+        finally:
+            conn.close()
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(urls) - len(found)
+        return found
+
+    def put_many(self, predictions, version):
+        """
+        Store a dict of url -> category for a model version.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO versions (model_version, last_used) VALUES (?, ?)", (version, time.time())
+                )
+                if version not in self._stored_versions:
+                    self._evict(conn)
+                    self._stored_versions.add(version)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO predictions (url, model_version, category) VALUES (?, ?, ?)",
+                    ((url, version, category) for url, category in predictions.items())
+                )
+        finally:
+            conn.close()
+
+    def _evict(self, conn):
+        # Predictions of versions stored before the versions table existed go too
+        conn.execute(
+            "DELETE FROM versions WHERE model_version NOT IN "
+            "(SELECT model_version FROM versions ORDER BY last_used DESC LIMIT ?)", (self.max_versions,)
+        )
+        conn.execute("DELETE FROM predictions WHERE model_version NOT IN (SELECT model_version FROM versions)")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else None,
+                "path": self.path,
+            }
+
+def predict_with_cache(model, urls, version, cache=None, model_path=None):
+    """
+    Predict a category per URL, running the model only on distinct URLs that
+    the cache doesn't already hold for this model version, and broadcasting the
+    results back to every row. With model_path, large batches of misses are
+    predicted across worker processes (see batch_inference.predict_urls).
+    Returns (predictions aligned with urls, {'hits': ..., 'misses': ...}).
+    """
+    urls = pd.Series(urls, dtype=object).fillna('')
+    codes, unique_urls = pd.factorize(urls)
+    unique_urls = list(unique_urls)
+
+    cached = cache.get_many(unique_urls, version) if cache is not None else {}
+    missing = [url for url in unique_urls if url not in cached]
+    if missing:
+        predicted = dict(zip(missing, (str(p) for p in predict_urls(model, missing, model_path, version))))
+        if cache is not None:
+            cache.put_many(predicted, version)
+        cached.update(predicted)
+
+    categories = np.array([cached[url] for url in unique_urls], dtype=object)
+    return categories[codes], {"hits": len(unique_urls) - len(missing), "misses": len(missing)}
@@ -1,16 +1,29 @@
 from flask import Flask, jsonify, send_file
 from flask_cors import CORS
 import os
+import time
 import pandas as pd
-import joblib
+from datetime import datetime, timezone
+from werkzeug.http import is_resource_modified
 
 from add_emotions import add_emotions_file
+from prediction_cache import PredictionCache, predict_with_cache
+from model_registry import ModelRegistry
+from pipeline import ResultStore, Persister, run_pipeline
+from emotion_data import CsvCache, QueryError, parse_row_args, select_rows
+from mood_rollups import MoodRollups, PERIODS
+from correlation import CORRELATION_COLUMNS, CoMoments, comoments_from_csv
 
 HERE = os.path.dirname(__file__)
 
 # Paths
 MODEL_PATH = os.path.join(HERE, "url_classifier_model_8classes.pkl")
-INPUT_PATH = os.path.normpath(os.path.join(HERE, "..", "browsing-history", "output", "history.csv"))
+HISTORY_DIR = os.path.normpath(os.path.join(HERE, "..", "browsing-history", "output"))
+INPUT_PATH = os.path.join(HISTORY_DIR, "history.csv")
+# URL strings of exports written with HISTORY_URL_IDS=1 (url_id / url_clean_id columns)
+URL_DICTIONARY_PATH = os.path.join(HISTORY_DIR, "urls.csv")
+# Columnar exports of the same data, read instead of the CSV when they are newer
+COLUMNAR_INPUT_PATHS = [os.path.join(HISTORY_DIR, "history.feather"), os.path.join(HISTORY_DIR, "history.parquet")]
 PREDICTED_PATH = os.path.join(HERE, "predicted_history.csv")
 EMOTIONS_PATH = os.path.join(HERE, "predicted_history_with_emotions.csv")
 
@@ -38,16 +51,23 @@ def calculate_correlation_insights(df):
     Correlations between features like stress, social media, education and mood are computed.
     Returns a dictionary with correlation coefficients and interpretations.
     """
-    correlation_results = {}
-
     # Relevant columns for correlation
     # Assuming df has columns like 'stress_score', 'social_media_score', 'education_score', 'emotion_score'
-    relevant_columns = ['stress_score', 'social_media_score', 'education_score', 'emotion_score']
-    missing_cols = [col for col in relevant_columns if col not in df.columns]
+    missing_cols = [col for col in CORRELATION_COLUMNS if col not in df.columns]
     if missing_cols:
         raise ValueError(f"Missing required columns in data for correlation: {missing_cols}")
 
-    corr_matrix = df[relevant_columns].corr()
+    return correlation_insights(CoMoments.from_frame(df))
+
+def correlation_insights(state):
+    """
+    Correlation coefficients and interpretations from the co-moments of the
+    score columns (see correlation.CoMoments).
+    """
+    correlation_results = {}
+    relevant_columns = state.columns
+
+    corr_matrix = state.corr()
 
     correlation_results['correlation_matrix'] = corr_matrix.to_dict()
 
@@ -71,43 +91,144 @@ def calculate_correlation_insights(df):
 
     return correlation_results
 
-def load_model(path=MODEL_PATH):
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Model file not found: {path}")
-    return joblib.load(path)
+def latest_history_path():
+    """Return the most recently written browsing-history export, or None."""
+    candidates = [p for p in COLUMNAR_INPUT_PATHS + [INPUT_PATH] if os.path.exists(p)]
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+def decode_url_ids(df, dictionary_path=URL_DICTIONARY_PATH):
+    """Restore url / url_clean from the url dictionary in id-encoded exports."""
+    id_columns = {'url_id': 'url', 'url_clean_id': 'url_clean'}
+    if not any(col in df.columns and name not in df.columns for col, name in id_columns.items()):
+        return df
+    stored = pd.read_csv(dictionary_path, dtype={'url': object}, keep_default_na=False)
+    urls = pd.Series(stored['url'].to_numpy(dtype=object), index=stored['url_id'])
+    for col, name in id_columns.items():
+        if col in df.columns:
+            # Unknown ids (e.g. -1 for a missing URL) become NaN
+            df[col] = urls.reindex(df[col]).to_numpy()
+            df = df.rename(columns={col: name})
+    return df
+
+def read_history(path):
+    """Read a browsing-history export; feather files are memory-mapped."""
+    if path.endswith('.feather'):
+        from pyarrow import feather
+        df = feather.read_table(path, memory_map=True).to_pandas()
+    elif path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    else:
+        # Use pandas to load the CSV (auto-detect delimiter)
+        df = pd.read_csv(path, sep=None, engine="python")
+    return decode_url_ids(df)
 
+# Loaded on first use and hot-swapped when the model file changes
+model_registry = ModelRegistry(MODEL_PATH)
 
-model = None
+category_cache = None
 try:
-    model = load_model()
+    category_cache = PredictionCache()
 except Exception as e:
-    # Model might be missing in some dev setups; endpoints will return helpful error
-    logger.warning(f"Warning: could not load model: {e}")
+    # Classification still works without the cache, just slower
+    logger.warning(f"Warning: could not open prediction cache: {e}")
+
+# Latest predicted / emotions frames, so readers don't go back to the CSVs
+results = ResultStore()
+# Writes those frames to PREDICTED_PATH / EMOTIONS_PATH off the request thread
+persister = Persister()
 
+def resident_etag(generation, published_at):
+    # The publish time keeps tags unique across server restarts
+    return f"emotions-g{generation}-{int(published_at * 1e6):x}"
+
+def publish_result(name, df, path=None):
+    """
+    Make df the resident frame for name and, given a path, save it in the
+    background. New emotions data is folded into the mood rollups here, once
+    per publish, so the trend and correlation endpoints only read them.
+    """
+    generation, published_at = results.publish(name, df)
+    if path is not None:
+        persister.submit(df, path, generation)
+    if name == 'emotions' and all(col in df.columns for col in ROLLUP_COLUMNS):
+        try:
+            mood_rollups.update(df, source=resident_etag(generation, published_at))
+        except Exception as e:
+            # The endpoints bring the rollups up to date themselves
+            logger.warning(f"Warning: could not update mood rollups: {e}")
+    return generation
+
+# Parsed emotions CSV, re-read only when the file changes
+csv_cache = CsvCache()
+
+def emotions_frame():
+    """
+    The current emotions data as (df, etag, last_modified epoch seconds), or
+    (None, None, None) if there is none. This is the resident frame unless the
+    CSV was rewritten by something else after it was published (e.g. running
+    add_emotions.py); then it is the CSV, parsed once per file version.
+    The frame is shared: callers must not modify it.
+    """
+    resident = results.get('emotions')
+    if resident is not None:
+        df, generation, published_at = resident
+        try:
+            stat = os.stat(EMOTIONS_PATH)
+            replaced = stat.st_mtime > published_at and not persister.wrote(EMOTIONS_PATH, stat)
+        except FileNotFoundError:
+            replaced = False
+        if not replaced:
+            return df, resident_etag(generation, published_at), published_at
+
+    df, stat = csv_cache.get(EMOTIONS_PATH)
+    if df is None:
+        return None, None, None
+    return df, f"emotions-{stat.st_size:x}-{stat.st_mtime_ns:x}", stat.st_mtime
+
+# Mood trend totals per day / week / month, kept in step with emotions_frame()
+mood_rollups = MoodRollups()
+# Columns the rollups are built from
+ROLLUP_COLUMNS = CORRELATION_COLUMNS + ['predicted_emotion']
+
+def set_validators(response, etag, last_modified):
+    """ETag / Last-Modified headers; clients must revalidate before reusing a response."""
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(int(last_modified), timezone.utc)
+    response.cache_control.no_cache = True
+    return response
 
 @app.route("/auto_classify", methods=["GET"])
 def auto_classify():
     try:
-        if not os.path.exists(INPUT_PATH):
+        input_path = latest_history_path()
+        if input_path is None:
             return jsonify({"error": f"Input file not found: {INPUT_PATH}"}), 404
 
-        if model is None:
+        try:
+            model, version = model_registry.get()
+        except Exception as e:
+            # Model might be missing in some dev setups
+            logger.warning(f"Warning: could not load model: {e}")
             return jsonify({"error": "Classification model not available on server."}), 500
 
-        # Use pandas to load the CSV (auto-detect delimiter)
-        df = pd.read_csv(INPUT_PATH, sep=None, engine="python")
+        df = read_history(input_path)
         if 'url' not in df.columns:
-            return jsonify({"error": "No 'url' column found in input CSV."}), 400
+            return jsonify({"error": "No 'url' column found in input file."}), 400
 
-        df['predicted_category'] = model.predict(df['url'])
+        # Only URLs not classified by this model version before reach the model
+        df['predicted_category'], cache_run = predict_with_cache(
+            model, df['url'], version, category_cache, model_path=MODEL_PATH
+        )
         df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
         df.to_csv(PREDICTED_PATH, index=False)
+        publish_result('predicted', df)
 
         return jsonify({
             "message": "Prediction complete",
-            "input_file": INPUT_PATH,
+            "input_file": input_path,
             "output_file": PREDICTED_PATH,
-            "rows": len(df)
+            "rows": len(df),
+            "cache": dict(cache_run, totals=category_cache.stats() if category_cache else None)
         })
 
     except Exception as e:
@@ -121,6 +242,7 @@ def add_emotions():
             return jsonify({"error": f"Predicted file not found: {PREDICTED_PATH}"}), 404
 
         df = add_emotions_file(input_file=PREDICTED_PATH, output_file=EMOTIONS_PATH)
+        publish_result('emotions', df)
 
         # Return some quick metadata and a preview
         preview = df[['title', 'url_domain', 'predicted_category', 'predicted_emotion', 'emotion_score']].head(10).to_dict(orient='records')
@@ -135,6 +257,67 @@ def add_emotions():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/pipeline", methods=["GET"])
+def pipeline():
+    # Classify and score the latest history in one pass, without the
+    # intermediate CSV round trip. The result stays in memory for the
+    # endpoints below; the CSVs are written in the background (?persist=0 skips them).
+    try:
+        input_path = latest_history_path()
+        if input_path is None:
+            return jsonify({"error": f"Input file not found: {INPUT_PATH}"}), 404
+
+        try:
+            model, version = model_registry.get()
+        except Exception as e:
+            logger.warning(f"Warning: could not load model: {e}")
+            return jsonify({"error": "Classification model not available on server."}), 500
+
+        start = time.perf_counter()
+        df = read_history(input_path)
+        read_seconds = time.perf_counter() - start
+        if 'url' not in df.columns:
+            return jsonify({"error": "No 'url' column found in input file."}), 400
+
+        predicted, emotions, info = run_pipeline(df, model, version, category_cache, model_path=MODEL_PATH)
+
+        persist = request.args.get('persist', '1').lower() in ('1', 'true', 'yes')
+        publish_result('predicted', predicted, PREDICTED_PATH if persist else None)
+        generation = publish_result('emotions', emotions, EMOTIONS_PATH if persist else None)
+
+        return jsonify({
+            "message": "Pipeline complete",
+            "input_file": input_path,
+            "output_files": [PREDICTED_PATH, EMOTIONS_PATH] if persist else [],
+            "rows": len(emotions),
+            "generation": generation,
+            "timings": dict(info["stages"], read=read_seconds),
+            "cache": dict(info["cache"], totals=category_cache.stats() if category_cache else None)
+        })
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/model', methods=['GET'])
+def model_info():
+    # Loaded model version, load time and reload count (?load=1 loads it if not loaded yet)
+    if request.args.get('load', '').lower() in ('1', 'true', 'yes'):
+        try:
+            model_registry.get()
+        except Exception as e:
+            return jsonify(dict(model_registry.info(), error=str(e))), 500
+    return jsonify(model_registry.info())
+
+
+@app.route('/prediction_cache', methods=['GET'])
+def prediction_cache_stats():
+    # Hit/miss counters of the per-URL prediction cache since the server started
+    if category_cache is None:
+        return jsonify({"error": "Prediction cache not available"}), 503
+    return jsonify(category_cache.stats())
+
+
 @app.route('/files/<path:filename>', methods=['GET'])
 def serve_file(filename):
     # Simple file serving helper for the two CSVs in the same folder
@@ -149,104 +332,65 @@ def serve_file(filename):
 
 @app.route('/correlation', methods=['GET'])
 def get_correlation():
-    import json
-    from flask import request
-
+    # Without a body, correlates the current emotions data from its running
+    # co-moments. A JSON body can instead carry 'data' (list of records),
+    # 'csv_path' (read in chunks) or 'states' (co-moment states returned by
+    # earlier calls, e.g. per partition or user, merged into one).
     try:
-
         data_json = request.get_json(force=True, silent=True)
-        if data_json is None:
-            return jsonify({"error": "Invalid or missing JSON data in request"}), 400
-        
+        if data_json is None and request.get_data():
+            return jsonify({"error": "Invalid JSON data in request"}), 400
+
+        if not data_json:
+            df, etag, _ = emotions_frame()
+            if df is None:
+                return jsonify({"error": f"Emotions file not found: {EMOTIONS_PATH}"}), 404
+            missing = [col for col in ROLLUP_COLUMNS if col not in df.columns]
+            if missing:
+                return jsonify({"error": f"Missing required columns: {missing}"}), 400
+            # Up to date since the publish, unless the CSV was rewritten outside the server
+            if mood_rollups.source != etag:
+                mood_rollups.update(df, source=etag)
+            state = mood_rollups.correlation()
         # Option 1: data included directly as list of dicts
-        if 'data' in data_json:
-            records = data_json['data']
-            df = pd.DataFrame(records)
-        # Option 2: path to CSV (optional)
+        elif 'data' in data_json:
+            df = pd.DataFrame(data_json['data'])
+            # Calculate scores if missing (same rules as add_emotions_file)
+            from add_emotions import SCORE_RULES, EMOTION_SCORE
+
+            missing = [col for col in ('stress_score', 'social_media_score', 'education_score') if col not in df.columns]
+            # Emotion is only derived when there is a category to start from
+            derive_emotion = 'predicted_emotion' not in df.columns and 'predicted_category' in df.columns
+            df = SCORE_RULES.apply(df, (['predicted_emotion'] if derive_emotion else []) + missing)
+            if derive_emotion:
+                df['emotion_score'] = df['predicted_emotion'].map(EMOTION_SCORE)
+            missing_cols = [col for col in CORRELATION_COLUMNS if col not in df.columns]
+            if missing_cols:
+                raise ValueError(f"Missing required columns in data for correlation: {missing_cols}")
+            state = CoMoments.from_frame(df)
+        # Option 2: path to CSV (optional), scored chunk by chunk
         elif 'csv_path' in data_json:
             csv_path = data_json['csv_path']
             if not os.path.exists(csv_path):
                 return jsonify({"error": f"CSV path does not exist: {csv_path}"}), 400
-            df = pd.read_csv(csv_path)
+            state = comoments_from_csv(csv_path)
+        # Option 3: partial states to merge
+        elif 'states' in data_json:
+            state = CoMoments()
+            for partial in data_json['states']:
+                state.merge(CoMoments.from_dict(partial))
         else:
-            return jsonify({"error": "JSON must contain 'data' or 'csv_path' key"}), 400
+            return jsonify({"error": "JSON must contain 'data', 'csv_path' or 'states' key"}), 400
 
-        # Add emotions and scores to df using add_emotions_file logic (if needed)
-        # Use add_emotions_file only if input is from csv_path to update EMOTIONS_PATH
-        if 'csv_path' in data_json:
-            # This will save the emotions csv but also return the df with emotions and scores
-            df = add_emotions_file(input_file=data_json['csv_path'], output_file=EMOTIONS_PATH)
-        else:
-            # If data given directly, calculate scores if missing
-            from add_emotions import STRESS_MAPPING, DOMAIN_TO_STRESS, SOCIAL_MEDIA_MAPPING, DOMAIN_TO_SOCIAL_MEDIA, EDUCATION_MAPPING, DOMAIN_TO_EDUCATION, EMOTION_MAPPING, DOMAIN_TO_EMOTION, EMOTION_SCORE
-
-            # Calculate emotion if missing
-            if 'predicted_emotion' not in df.columns:
-                if 'predicted_category' in df.columns:
-                    df['predicted_emotion'] = df['predicted_category'].map(EMOTION_MAPPING)
-                    def get_emotion_from_domain(row):
-                        if pd.notna(row['predicted_emotion']):
-                            return row['predicted_emotion']
-                        domain = str(row.get('url_domain', '')).lower()
-                        for key, emotion in DOMAIN_TO_EMOTION.items():
-                            if key in domain:
-                                return emotion
-                        return "Neutral"
-                    df['predicted_emotion'] = df.apply(get_emotion_from_domain, axis=1)
-                    df['emotion_score'] = df['predicted_emotion'].map(EMOTION_SCORE)
-
-            # Calculate scores if missing
-            if 'stress_score' not in df.columns:
-                df['stress_score'] = df['predicted_category'].map(STRESS_MAPPING) if 'predicted_category' in df.columns else None
-                def get_stress_from_domain(row):
-                    if pd.notna(row['stress_score']):
-                        return row['stress_score']
-                    domain = str(row.get('url_domain', '')).lower()
-                    for key, score in DOMAIN_TO_STRESS.items():
-                        if key in domain:
-                            return score
-                    return 1
-                df['stress_score'] = df.apply(get_stress_from_domain, axis=1)
-
-            if 'social_media_score' not in df.columns:
-                df['social_media_score'] = df['predicted_category'].map(SOCIAL_MEDIA_MAPPING) if 'predicted_category' in df.columns else None
-                def get_social_media_from_domain(row):
-                    if pd.notna(row['social_media_score']):
-                        return row['social_media_score']
-                    domain = str(row.get('url_domain', '')).lower()
-                    for key, score in DOMAIN_TO_SOCIAL_MEDIA.items():
-                        if key in domain:
-                            return score
-                    return 1
-                df['social_media_score'] = df.apply(get_social_media_from_domain, axis=1)
-
-            if 'education_score' not in df.columns:
-                df['education_score'] = df['predicted_category'].map(EDUCATION_MAPPING) if 'predicted_category' in df.columns else None
-                def get_education_from_domain(row):
-                    if pd.notna(row['education_score']):
-                        return row['education_score']
-                    domain = str(row.get('url_domain', '')).lower()
-                    for key, score in DOMAIN_TO_EDUCATION.items():
-                        if key in domain:
-                            return score
-                    return 1
-                df['education_score'] = df.apply(get_education_from_domain, axis=1)
-
-        # Ensure relevant columns are numeric before correlation
-        relevant_columns = ['stress_score', 'social_media_score', 'education_score', 'emotion_score']
-        for col in relevant_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        df = df.dropna(subset=relevant_columns)
-
-        correlation_results = calculate_correlation_insights(df)
-
-        logger.info(f"/getCorrelationInsights processed successfully with {len(df)} records.")
+        correlation_results = correlation_insights(state)
+
+        logger.info(f"/getCorrelationInsights processed successfully with {state.n} records.")
 
         return jsonify({
             "message": "Correlation analysis complete",
             "correlation_results": correlation_results,
-            "data_rows": len(df)
+            "data_rows": state.n,
+            "state": state.to_dict()
         })
 
     except Exception as e:
@@ -256,85 +400,66 @@ def get_correlation():
 
 @app.route('/get_emotion_data', methods=['GET'])
 def get_emotion_data():
+    # Rows can be narrowed with offset / limit, tail (the last N rows) and
+    # fields (comma-separated columns). Responses carry an ETag and
+    # Last-Modified; a matching If-None-Match / If-Modified-Since gets a 304.
     try:
-        if not os.path.exists(EMOTIONS_PATH):
+        try:
+            row_args = parse_row_args(request.args)
+        except QueryError as e:
+            return jsonify({"error": str(e)}), 400
+
+        df, etag, last_modified = emotions_frame()
+        if df is None:
             return jsonify({"error": f"Emotions file not found: {EMOTIONS_PATH}"}), 404
 
-        df = pd.read_csv(EMOTIONS_PATH)
+        modified_at = datetime.fromtimestamp(int(last_modified), timezone.utc)
+        if not is_resource_modified(request.environ, etag=etag, last_modified=modified_at):
+            return set_validators(app.response_class(status=304), etag, last_modified)
+
+        try:
+            rows, start = select_rows(df, **row_args)
+        except QueryError as e:
+            return jsonify({"error": str(e)}), 400
+
         # Convert to JSON serializable format
-        data = df.to_dict(orient='records')
-        return jsonify({
+        data = rows.to_dict(orient='records')
+        return set_validators(jsonify({
             "message": "Emotion data retrieved successfully",
             "data": data,
-            "rows": len(data)
-        })
+            "rows": len(data),
+            "total_rows": len(df),
+            "offset": start
+        }), etag, last_modified)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/mood/generateMoodTrends', methods=['GET'])
 def generate_mood_trends():
+    # Served from the daily / weekly / monthly rollups; publishing new emotions
+    # data folds its changed visits in, so this only catches up on CSVs
+    # rewritten outside the server
     try:
         period = request.args.get('period', 'monthly')
+        if period not in PERIODS:
+            period = 'monthly'
 
-        if not os.path.exists(EMOTIONS_PATH):
+        df, etag, _ = emotions_frame()
+        if df is None:
             return jsonify({"error": f"Emotions file not found: {EMOTIONS_PATH}"}), 404
 
-        df = pd.read_csv(EMOTIONS_PATH)
-
         # Ensure we have the required columns
         required_cols = ['emotion_score', 'stress_score', 'social_media_score', 'education_score', 'predicted_emotion']
         missing_cols = [col for col in required_cols if col not in df.columns]
         if missing_cols:
             return jsonify({"error": f"Missing required columns: {missing_cols}"}), 400
 
-        # Add visit_time if not present (for grouping)
-        if 'visit_time' not in df.columns:
-            # Create synthetic timestamps for demo purposes
-            df['visit_time'] = pd.date_range(start='2024-01-01', periods=len(df), freq='H')
-
-        df['visit_time'] = pd.to_datetime(df['visit_time'])
-
-        # Group by period
-        if period == 'daily':
-            df['period'] = df['visit_time'].dt.date
-            df['period_label'] = df['visit_time'].dt.strftime('%Y-%m-%d')
-        elif period == 'weekly':
-            df['period'] = df['visit_time'].dt.to_period('W').astype(str)
-            df['period_label'] = df['period']
-        else:  # monthly
-            df['period'] = df['visit_time'].dt.to_period('M').astype(str)
-            df['period_label'] = df['period']
-
-        # Calculate mood trends
-        mood_trends = df.groupby('period_label').agg({
-            'emotion_score': 'mean',
-            'stress_score': 'mean',
-            'social_media_score': 'mean',
-            'education_score': 'mean',
-            'predicted_emotion': lambda x: x.mode().iloc[0] if len(x) > 0 else 'Neutral'
-        }).reset_index()
-
-        # Rename columns to match expected format
-        mood_trends = mood_trends.rename(columns={
-            'emotion_score': 'mood_score',
-            'predicted_emotion': 'mood_label',
-            'stress_score': 'avg_stress',
-            'social_media_score': 'avg_social_media',
-            'education_score': 'avg_education'
-        })
-
-        # Calculate emotion distribution
-        emotion_dist = df.groupby('predicted_emotion').size().reset_index(name='visit_count')
-        emotion_dist['total_minutes'] = emotion_dist['visit_count'] * 5  # Assuming 5 minutes per visit
-        emotion_dist = emotion_dist.rename(columns={'predicted_emotion': 'emotion'})
-
-        # Convert to expected format
-        points = mood_trends.to_dict('records')
-        emotion_distribution = emotion_dist.to_dict('records')
+        if mood_rollups.source != etag:
+            mood_rollups.update(df, source=etag)
 
         return jsonify({
-            "points": points,
-            "emotion_distribution": emotion_distribution
+            "points": mood_rollups.points(period),
+            "emotion_distribution": mood_rollups.emotion_distribution()
         })
 
     except Exception as e:
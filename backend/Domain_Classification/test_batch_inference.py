@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test script for batch inference across worker processes."""
+
+import os
+import sys
+import tempfile
+import joblib
+sys.path.append(os.path.dirname(__file__))
+
+import batch_inference
+from batch_inference import predict_urls, shutdown_pool
+from model_registry import model_version
+
+class LengthModel:
+    """Picklable stand-in for the classifier: the category is the URL's length."""
+    def __init__(self, label='len'):
+        self.label = label
+
+    def predict(self, urls):
+        return [f"{self.label}{len(url)}" for url in urls]
+
+URLS = [f"https://example.com/{'x' * i}" for i in range(40)]
+
+def save_model(path, model):
+    joblib.dump(model, path + '.tmp')
+    os.replace(path + '.tmp', path)
+    return model_version(path)
+
+def test_batch_path_matches_in_process():
+    """URLs split across worker processes come back in order with the in-process predictions."""
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'model.pkl')
+        version = save_model(model_path, LengthModel('worker'))
+        try:
+            predicted = predict_urls(LengthModel(), URLS, model_path, version, workers=2, chunk_size=8)
+        finally:
+            shutdown_pool()
+        assert list(predicted) == LengthModel('worker').predict(URLS)
+
+def test_workers_refuse_a_swapped_file():
+    """If the file changed since the caller loaded its model, the batch runs on the caller's model."""
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'model.pkl')
+        version = save_model(model_path, LengthModel('old'))
+        save_model(model_path, LengthModel('new'))
+        try:
+            predicted = predict_urls(LengthModel('old'), URLS, model_path, version, workers=2, chunk_size=8)
+            assert list(predicted) == LengthModel('old').predict(URLS)
+            assert batch_inference._pool_key is None
+
+            # The next call for the file's current version starts a working pool
+            current = model_version(model_path)
+            predicted = predict_urls(LengthModel('caller'), URLS, model_path, current, workers=2, chunk_size=8)
+            assert list(predicted) == LengthModel('new').predict(URLS)
+        finally:
+            shutdown_pool()
+
+def test_replaced_pool_outlives_its_callers():
+    """A new model version replaces the pool without closing it under a caller still mapping on it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path, new_path = os.path.join(tmp, 'old.pkl'), os.path.join(tmp, 'new.pkl')
+        old_version = save_model(old_path, LengthModel('old'))
+        new_version = save_model(new_path, LengthModel('new'))
+        try:
+            with batch_inference._use_pool(old_path, old_version, 2) as old_pool:
+                # Another request swaps in the next version meanwhile
+                predicted = predict_urls(LengthModel(), URLS, new_path, new_version, workers=2, chunk_size=8)
+                assert list(predicted) == LengthModel('new').predict(URLS)
+                assert batch_inference._pool is not old_pool
+
+                chunks = [URLS[:8], URLS[8:16]]
+                parts = list(old_pool.map(batch_inference._predict_chunk, chunks))
+                assert parts == [LengthModel('old').predict(chunk) for chunk in chunks]
+            # Its last caller is done, so the replaced pool is closed
+            assert old_pool._shutdown_thread
+            assert old_pool not in batch_inference._pool_users
+        finally:
+            shutdown_pool()
+
+if __name__ == "__main__":
+    test_batch_path_matches_in_process()
+    test_workers_refuse_a_swapped_file()
+    test_replaced_pool_outlives_its_callers()
+    print("Batch inference tests completed.")
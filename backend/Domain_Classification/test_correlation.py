@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Test script for the mergeable correlation accumulators."""
+
+import os
+import sys
+import tempfile
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from correlation import CORRELATION_COLUMNS, CoMoments, comoments_from_csv
+from mood_rollups import MoodRollups
+
+def make_scores(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.integers(-3, 5, size=(rows, 4)).astype(float), columns=CORRELATION_COLUMNS)
+    df['emotion_score'] += df['stress_score'] * 0.5
+    df.iloc[::17, 1] = np.nan  # incomplete rows are left out, as with dropna
+    return df
+
+def assert_close(state, df):
+    expected = df[CORRELATION_COLUMNS].dropna().corr()
+    assert state.n == len(df[CORRELATION_COLUMNS].dropna())
+    assert np.allclose(state.corr().to_numpy(), expected.to_numpy(), atol=1e-12, equal_nan=True)
+
+def test_matches_pandas_corr():
+    """Batched, merged and removed states give the same matrix as DataFrame.corr()."""
+    df = make_scores(2000)
+    assert_close(CoMoments.from_frame(df), df)
+
+    parts = [CoMoments.from_frame(df.iloc[i:i + 300]) for i in range(0, len(df), 300)]
+    merged = CoMoments()
+    for part in parts:
+        merged.merge(CoMoments.from_dict(part.to_dict()))
+    assert_close(merged, df)
+
+    merged.update(df.iloc[:600], sign=-1)
+    assert_close(merged, df.iloc[600:])
+
+def test_constant_column_is_nan():
+    """A constant column has no correlation, like pandas."""
+    df = make_scores(50)
+    df['social_media_score'] = 2.0
+    assert_close(CoMoments.from_frame(df), df)
+
+def test_csv_in_chunks():
+    """A CSV read in small chunks gives the same result as reading it at once."""
+    df = make_scores(1000, seed=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'scores.csv')
+        df.to_csv(path, index=False)
+        assert_close(comoments_from_csv(path, chunk_rows=97), df)
+
+def published(df, run):
+    """Scores as published by the server: keyed visits whose ids change with every full run."""
+    df = df.assign(profile='chrome/Default', visit_id=np.arange(len(df)), visit_time=13400668800000000 + np.arange(len(df)))
+    df['predicted_emotion'] = np.where(df['emotion_score'] > 1, 'Joy', 'Calm')
+    df['id'] = [f"run{run}-{i}" for i in range(len(df))]
+    return df
+
+def test_running_state_follows_published_deltas():
+    """The mood rollups' co-moments track rebuilt, rescored and shrunk data by folding only the delta."""
+    rollups = MoodRollups()
+    df = published(make_scores(1500, seed=2), 1)
+    rollups.update(df, source='a')
+    assert_close(rollups.correlation(), df)
+
+    rebuilt = published(make_scores(1500, seed=2), 2)
+    rebuilt.loc[rebuilt.index[:40], 'stress_score'] = 9.0
+    rebuilt = rebuilt.iloc[100:]
+    rollups.update(rebuilt, source='b')
+    assert rollups.last_update == {'mode': 'incremental', 'added': 0, 'removed': 100}
+    assert_close(rollups.correlation(), rebuilt)
+
+    rescored = rebuilt.copy()
+    rescored.loc[rescored.index[:30], 'education_score'] = -5.0
+    rollups.update(rescored, source='c')
+    assert rollups.last_update['added'] == rollups.last_update['removed'] == 30
+    assert_close(rollups.correlation(), rescored)
+
+if __name__ == "__main__":
+    test_matches_pandas_corr()
+    test_constant_column_is_nan()
+    test_csv_in_chunks()
+    test_running_state_follows_published_deltas()
+    print("Correlation tests completed.")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Test script for the cached, paginated /get_emotion_data."""
+
+import os
+import sys
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from emotion_data import QueryError, parse_row_args, select_rows
+
+def make_frame(rows=10):
+    return pd.DataFrame({
+        'url_domain': [f"site{i}.com" for i in range(rows)],
+        'predicted_emotion': ['Happy', 'Neutral'] * (rows // 2),
+        'emotion_score': range(rows),
+    })
+
+def test_select_rows():
+    """offset/limit, tail and fields select the expected slice."""
+    df = make_frame()
+    rows, start = select_rows(df, **parse_row_args({'offset': '2', 'limit': '3'}))
+    assert start == 2 and list(rows['emotion_score']) == [2, 3, 4]
+    rows, start = select_rows(df, **parse_row_args({'tail': '4', 'limit': '2', 'fields': 'emotion_score'}))
+    assert start == 6 and list(rows.columns) == ['emotion_score'] and list(rows['emotion_score']) == [6, 7]
+    rows, start = select_rows(df, **parse_row_args({'offset': '50'}))
+    assert start == 10 and rows.empty
+    for args in ({'limit': '-1'}, {'tail': 'x'}):
+        try:
+            parse_row_args(args)
+            assert False, args
+        except QueryError:
+            pass
+    try:
+        select_rows(df, fields=['nope'])
+        assert False
+    except QueryError:
+        pass
+
+def test_resident_data_is_conditional():
+    """The resident frame is served with an ETag, and a matching If-None-Match gets a 304."""
+    import server
+    client = server.app.test_client()
+    server.publish_result('emotions', make_frame())
+
+    response = client.get('/get_emotion_data?tail=3&fields=url_domain')
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['rows'] == 3 and body['total_rows'] == 10 and body['offset'] == 7
+    assert body['data'][0] == {'url_domain': 'site7.com'}
+    etag = response.headers['ETag']
+
+    response = client.get('/get_emotion_data?tail=3&fields=url_domain', headers={'If-None-Match': etag})
+    assert response.status_code == 304 and not response.data
+
+    server.publish_result('emotions', make_frame(4))
+    response = client.get('/get_emotion_data', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.get_json()['rows'] == 4
+    assert response.headers['ETag'] != etag
+
+    assert client.get('/get_emotion_data?fields=nope').status_code == 400
+
+if __name__ == "__main__":
+    test_select_rows()
+    test_resident_data_is_conditional()
+    print("Emotion data tests completed.")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Test script for the compiled emotion / score rules."""
+
+import os
+import sys
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from add_emotions import SCORE_RULES, EMOTION_SCORE
+from emotion_rules import DomainMatcher
+
+DOMAINS = [
+    'youtube.com', 'm.youtube.com', 'docs.google.com', 'netflix.com', 'news.ycombinator.com', 'GMAIL.COM',
+    'instagram.com.reddit.com', 'localhost', 'xvideos.com', 'example.org', '', None,
+]
+CATEGORIES = ['Entertainment', 'Unknown', None, 'Education', 'Social Media', 'nan']
+
+def legacy_rule(row, column):
+    """The original row-by-row rule: category mapping, else first domain key in table order, else default."""
+    mapping, table, default = SCORE_RULES.rules[column]
+    value = mapping.get(row['predicted_category']) if pd.notna(row['predicted_category']) else None
+    if value is not None:
+        return value
+    domain = str(row.get('url_domain', '')).lower()
+    for key, fallback in table.items():
+        if key in domain:
+            return fallback
+    return default
+
+def make_frame():
+    rows = [(d, c) for d in DOMAINS for c in CATEGORIES]
+    return pd.DataFrame(rows, columns=['url_domain', 'predicted_category'])
+
+def test_matches_row_by_row_rules():
+    """Every output equals the first-match result of checking each row against each rule."""
+    df = SCORE_RULES.apply(make_frame())
+    for column in SCORE_RULES.rules:
+        expected = [legacy_rule(row, column) for _, row in make_frame().iterrows()]
+        assert list(df[column]) == expected, column
+
+def test_first_match_follows_table_order():
+    """Overlapping keys resolve by table order, not by position in the domain."""
+    matcher = DomainMatcher({'t': {'google.com': 'a', 'docs.google.com': 'b', 'x.com': 'c'}})
+    assert matcher.first_matches('docs.google.com') == {'t': 'a'}
+    assert matcher.first_matches('netflix.com') == {'t': 'c'}
+    assert matcher.contained_keys('docs.google.com') == {'google.com', 'docs.google.com'}
+    assert matcher.first_matches('example.org') == {}
+
+def test_correlation_scores_payload():
+    """/correlation derives missing scores with the same rules."""
+    import server
+    records = make_frame().fillna({'url_domain': 'example.org', 'predicted_category': 'Unknown'})
+    response = server.app.test_client().get('/correlation', json={'data': records.to_dict(orient='records')})
+    assert response.status_code == 200, response.get_json()
+
+    expected = records.copy()
+    for column in SCORE_RULES.rules:
+        expected[column] = [legacy_rule(row, column) for _, row in records.iterrows()]
+    expected['emotion_score'] = expected['predicted_emotion'].map(EMOTION_SCORE)
+    columns = ['stress_score', 'social_media_score', 'education_score', 'emotion_score']
+    expected_matrix = expected[columns].astype(float).corr().to_dict()
+    matrix = response.get_json()['correlation_results']['correlation_matrix']
+    for a in columns:
+        for b in columns:
+            assert abs(matrix[a][b] - expected_matrix[a][b]) < 1e-12
+
+if __name__ == "__main__":
+    test_matches_row_by_row_rules()
+    test_first_match_follows_table_order()
+    test_correlation_scores_payload()
+    print("Emotion rules tests completed.")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Test script for the hot-swappable model registry."""
+
+import os
+import sys
+import tempfile
+import joblib
+import numpy as np
+sys.path.append(os.path.dirname(__file__))
+
+import model_registry
+from model_registry import ModelRegistry
+
+def replace_model(path, model, **kwargs):
+    """Write a model the way deployments should: to a temp file, renamed into place."""
+    joblib.dump(model, path + '.tmp', **kwargs)
+    os.replace(path + '.tmp', path)
+
+def test_uncompressed_model_is_memory_mapped():
+    """Arrays of an uncompressed artifact are mapped from the file; compressed ones are loaded."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.pkl')
+        replace_model(path, {'weights': np.arange(1000.0)})
+        registry = ModelRegistry(path, check_seconds=0)
+        model, _ = registry.get()
+        assert isinstance(model['weights'], np.memmap)
+        assert registry.info()["memory_mapped"] is True
+
+        replace_model(path, {'weights': np.arange(1000.0)}, compress=3)
+        model, _ = registry.get()
+        assert not isinstance(model['weights'], np.memmap)
+        assert registry.info()["memory_mapped"] is False
+
+def test_reload_on_change():
+    """A replaced file is loaded as a new version; an unchanged one is not reloaded."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.pkl')
+        replace_model(path, {'name': 'first'})
+        registry = ModelRegistry(path, check_seconds=0)
+        first, first_version = registry.get()
+        assert first['name'] == 'first'
+        assert registry.get()[1] == first_version and registry.info()["reloads"] == 0
+
+        replace_model(path, {'name': 'second'})
+        second, second_version = registry.get()
+        assert second['name'] == 'second' and second_version != first_version
+        assert registry.info()["reloads"] == 1
+
+def test_failed_load_keeps_previous_model():
+    """A broken new file leaves the previous model in use and is not retried until it changes."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.pkl')
+        replace_model(path, {'name': 'good'})
+        registry = ModelRegistry(path, check_seconds=0)
+        _, version = registry.get()
+
+        with open(path + '.tmp', 'wb') as f:
+            f.write(b'not a pickle')
+        os.replace(path + '.tmp', path)
+        model, current = registry.get()
+        assert model['name'] == 'good' and current == version
+        assert registry.info()["last_error"]
+
+        loads = []
+        real_load = model_registry.load_model_file
+        model_registry.load_model_file = lambda p: loads.append(p) or real_load(p)
+        try:
+            registry.get()
+            assert loads == []
+        finally:
+            model_registry.load_model_file = real_load
+
+        try:
+            ModelRegistry(path).get()
+            assert False, "a registry with no previous model has nothing to fall back to"
+        except Exception:
+            pass
+
+def test_file_replaced_while_loading():
+    """A file swapped during the load is not given the version hashed before it; the next check loads it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'model.pkl')
+        replace_model(path, {'name': 'first'})
+        registry = ModelRegistry(path, check_seconds=0)
+        registry.get()
+
+        replace_model(path, {'name': 'second'})
+        real_load = model_registry.load_model_file
+
+        def load_then_replace(p):
+            loaded = real_load(p)
+            replace_model(path, {'name': 'third'})
+            return loaded
+
+        model_registry.load_model_file = load_then_replace
+        try:
+            model, _ = registry.get()
+        finally:
+            model_registry.load_model_file = real_load
+        assert model['name'] == 'first'
+        assert 'changed' in registry.info()["last_error"]
+
+        model, version = registry.get()
+        assert model['name'] == 'third' and version == model_registry.model_version(path)
+
+if __name__ == "__main__":
+    test_uncompressed_model_is_memory_mapped()
+    test_reload_on_change()
+    test_failed_load_keeps_previous_model()
+    test_file_replaced_while_loading()
+    print("Model registry tests completed.")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Test script for the incremental mood trend rollups."""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from mood_rollups import MoodRollups, PERIODS, period_labels, visit_times
+
+EMOTIONS = ['Joy', 'Stress', 'Curiosity', 'Fear', None]
+
+def make_frame(start, stop):
+    ids = np.arange(start, stop)
+    return pd.DataFrame({
+        'visit_id': ids,
+        # Chrome timestamps, one visit every 7 hours from 2025-09-01
+        'visit_time': 13400668800000000 + ids * 7 * 3600 * 1_000_000,
+        'predicted_emotion': [EMOTIONS[i % len(EMOTIONS)] for i in ids],
+        'emotion_score': (ids % 5) - 1,
+        'stress_score': np.where(ids % 3 == 0, np.nan, ids % 4 + 1),
+        'social_media_score': ids % 2 + 1,
+        'education_score': ids % 3 + 1,
+    })
+
+def legacy_points(df, period):
+    """The original groupby / mode aggregation of the mood trends endpoint."""
+    df = df.assign(period_label=period_labels(visit_times(df), period))
+    trends = df.groupby('period_label').agg({
+        'emotion_score': 'mean',
+        'stress_score': 'mean',
+        'social_media_score': 'mean',
+        'education_score': 'mean',
+        'predicted_emotion': lambda x: x.mode().iloc[0] if len(x.mode()) > 0 else 'Neutral'
+    }).reset_index()
+    return trends.rename(columns={
+        'emotion_score': 'mood_score', 'predicted_emotion': 'mood_label', 'stress_score': 'avg_stress',
+        'social_media_score': 'avg_social_media', 'education_score': 'avg_education'
+    }).to_dict('records')
+
+def assert_matches(rollups, df):
+    for period in PERIODS:
+        points, expected = rollups.points(period), legacy_points(df, period)
+        assert [p['period_label'] for p in points] == [e['period_label'] for e in expected], period
+        for point, row in zip(points, expected):
+            assert point['mood_label'] == row['mood_label'], (period, point, row)
+            for name in ('mood_score', 'avg_stress', 'avg_social_media', 'avg_education'):
+                assert np.isclose(point[name], row[name], equal_nan=True), (period, name, point, row)
+    counts = df['predicted_emotion'].value_counts().sort_index()
+    assert [(d['emotion'], d['visit_count']) for d in rollups.emotion_distribution()] == list(counts.items())
+
+def test_rebuild_matches_groupby():
+    """Totals built from scratch give the same trends as grouping the rows."""
+    df = make_frame(0, 500)
+    rollups = MoodRollups()
+    rollups.update(df)
+    assert rollups.last_update['mode'] == 'rebuild'
+    assert_matches(rollups, df)
+
+def test_incremental_update():
+    """Added, dropped and rescored visits are folded in without a rebuild."""
+    rollups = MoodRollups()
+    rollups.update(make_frame(0, 500), source='a')
+
+    df = make_frame(100, 700)
+    df.loc[df.index[:20], ['predicted_emotion', 'emotion_score']] = ['Fear', 10]
+    rollups.update(df, source='b')
+    assert rollups.last_update == {'mode': 'incremental', 'added': 220, 'removed': 120}
+    assert_matches(rollups, df)
+
+    rollups.update(df, source='b')  # same data version: nothing to do
+    assert rollups.last_update['added'] == 220
+
+def with_run_ids(df, run):
+    """Profiles and the per-run ids a full browsing-history rebuild regenerates."""
+    df = df.assign(profile=np.where(df['visit_id'] % 2 == 0, 'chrome/Default', 'edge/Default'))
+    # The same raw visit_id in two profiles is two visits
+    df['visit_id'] = df['visit_id'] // 2
+    df['id'] = [f"run{run}-{i}" for i in range(len(df))]
+    return df
+
+def test_key_survives_regenerated_ids():
+    """A rebuild that renumbers every id only folds in the visits that really changed."""
+    rollups = MoodRollups()
+    rollups.update(with_run_ids(make_frame(0, 500), 1), source='a')
+
+    df = with_run_ids(make_frame(0, 520), 2)
+    rollups.update(df, source='b')
+    assert rollups.last_update == {'mode': 'incremental', 'added': 20, 'removed': 0}
+    assert_matches(rollups, df)
+
+    rescored = df.copy()
+    rescored.loc[rescored.index[:5], ['predicted_emotion', 'emotion_score']] = ['Fear', 10]
+    rollups.update(rescored, source='c')
+    assert rollups.last_update == {'mode': 'incremental', 'added': 5, 'removed': 5}
+    assert_matches(rollups, rescored)
+
+if __name__ == "__main__":
+    test_rebuild_matches_groupby()
+    test_incremental_update()
+    test_key_survives_regenerated_ids()
+    print("Mood rollups tests completed.")
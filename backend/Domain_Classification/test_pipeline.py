@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Test script for the in-memory classify -> score pipeline."""
+
+import os
+import sys
+import tempfile
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from add_emotions import add_emotions_file
+from pipeline import run_pipeline
+from prediction_cache import PredictionCache, predict_with_cache
+
+HERE = os.path.dirname(__file__)
+
+# Includes a category with no emotion mapping, so the domain fallback runs too
+CATEGORIES = ['Entertainment', 'News & Media', 'Technology', 'Business & Finance', 'Social Media', 'Unlisted']
+
+class UrlLengthModel:
+    """Deterministic stand-in for the classifier."""
+    def predict(self, urls):
+        return [CATEGORIES[len(url) % len(CATEGORIES)] for url in urls]
+
+def load_history():
+    # The checked-in sample export, without the category the pipeline adds
+    return pd.read_csv(os.path.join(HERE, 'predicted_history.csv')).drop(columns=['predicted_category'])
+
+def test_pipeline_matches_two_step_output():
+    """run_pipeline writes the same CSVs as /auto_classify followed by /add_emotions."""
+    with tempfile.TemporaryDirectory() as tmp:
+        history = load_history()
+        model = UrlLengthModel()
+
+        # The old path: classify, write predicted CSV, read it back and score
+        old = history.copy()
+        old['predicted_category'], _ = predict_with_cache(model, old['url'], 'v1')
+        old.to_csv(os.path.join(tmp, 'old_predicted.csv'), index=False)
+        add_emotions_file(os.path.join(tmp, 'old_predicted.csv'), os.path.join(tmp, 'old_emotions.csv'))
+
+        cache = PredictionCache(os.path.join(tmp, 'cache.sqlite'))
+        for run in range(2):  # cold, then fully cached
+            predicted, emotions, info = run_pipeline(history, model, 'v1', cache)
+            predicted.to_csv(os.path.join(tmp, 'predicted.csv'), index=False)
+            emotions.to_csv(os.path.join(tmp, 'emotions.csv'), index=False)
+            for name in ('predicted', 'emotions'):
+                pd.testing.assert_frame_equal(pd.read_csv(os.path.join(tmp, f'{name}.csv')),
+                                              pd.read_csv(os.path.join(tmp, f'old_{name}.csv')))
+            assert info["cache"]["misses"] == (0 if run else history['url'].nunique())
+            assert set(info["stages"]) == {'classify', 'score'}
+
+def test_pipeline_leaves_input_untouched():
+    """The input frame is not modified, and an index column from an old CSV export is dropped."""
+    history = load_history().head(50)
+    history.insert(0, 'Unnamed: 0', range(len(history)))
+    before = history.copy()
+    predicted, emotions, _ = run_pipeline(history, UrlLengthModel(), 'v1')
+    pd.testing.assert_frame_equal(history, before)
+    assert 'Unnamed: 0' not in predicted.columns and 'Unnamed: 0' not in emotions.columns
+    assert 'predicted_emotion' not in predicted.columns and emotions['predicted_emotion'].notna().all()
+
+if __name__ == "__main__":
+    test_pipeline_matches_two_step_output()
+    test_pipeline_leaves_input_untouched()
+    print("Pipeline tests completed.")
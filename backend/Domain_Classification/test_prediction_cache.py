@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test script for the per-URL prediction cache."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+
+from prediction_cache import PredictionCache, predict_with_cache
+
+class CountingModel:
+    """Predicts '<label>:<url>' and records every URL it is asked about."""
+    def __init__(self, label):
+        self.label = label
+        self.seen = []
+
+    def predict(self, urls):
+        self.seen.extend(urls)
+        return [f"{self.label}:{url}" for url in urls]
+
+def stored_versions(path):
+    conn = sqlite3.connect(path)
+    try:
+        return sorted(v for (v,) in conn.execute("SELECT DISTINCT model_version FROM predictions"))
+    finally:
+        conn.close()
+
+def test_hits_and_misses():
+    """Only URLs the cache lacks reach the model, and every row gets its URL's prediction."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = PredictionCache(os.path.join(tmp, 'cache.sqlite'))
+        model = CountingModel('a')
+
+        predicted, run = predict_with_cache(model, ['x', 'y', 'x', None], 'v1', cache)
+        assert list(predicted) == ['a:x', 'a:y', 'a:x', 'a:']
+        assert run == {"hits": 0, "misses": 3}
+
+        predicted, run = predict_with_cache(model, ['y', 'z', 'x'], 'v1', cache)
+        assert list(predicted) == ['a:y', 'a:z', 'a:x']
+        assert run == {"hits": 2, "misses": 1}
+        assert model.seen == ['x', 'y', '', 'z']
+        assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 4
+
+def test_versions_do_not_share_predictions():
+    """A new version misses the old version's rows, and both survive being stored in turn."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite')
+        cache = PredictionCache(path)
+        old, new = CountingModel('old'), CountingModel('new')
+
+        predict_with_cache(old, ['x', 'y'], 'v1', cache)
+        predicted, run = predict_with_cache(new, ['x', 'y'], 'v2', cache)
+        assert list(predicted) == ['new:x', 'new:y'] and run["misses"] == 2
+
+        # While a model is swapped in, requests on the old one keep their cache
+        predict_with_cache(old, ['z'], 'v1', cache)
+        predicted, run = predict_with_cache(old, ['x', 'y', 'z'], 'v1', cache)
+        assert list(predicted) == ['old:x', 'old:y', 'old:z'] and run["misses"] == 0
+        assert stored_versions(path) == ['v1', 'v2']
+
+def test_least_recently_stored_version_is_evicted():
+    """Storing a third version drops the version stored longest ago."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cache.sqlite')
+        cache = PredictionCache(path, max_versions=2)
+        model = CountingModel('m')
+
+        predict_with_cache(model, ['x'], 'v1', cache)
+        predict_with_cache(model, ['x'], 'v2', cache)
+        predict_with_cache(model, ['y'], 'v1', cache)
+        predict_with_cache(model, ['x'], 'v3', cache)
+        assert stored_versions(path) == ['v1', 'v3']
+
+        # Another process (a fresh cache object) sees the same versions
+        _, run = predict_with_cache(model, ['x', 'y'], 'v1', PredictionCache(path, max_versions=2))
+        assert run["hits"] == 2
+
+if __name__ == "__main__":
+    test_hits_and_misses()
+    test_versions_do_not_share_predictions()
+    test_least_recently_stored_version_is_evicted()
+    print("Prediction cache tests completed.")
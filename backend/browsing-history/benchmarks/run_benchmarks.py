@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark the browsing-history pipeline on synthetic History databases.
+
+Each size runs in a fresh process: read_chrome_history -> clean_data ->
+engineer_features -> export_data, reporting per-stage wall time, rows per
+second and peak RSS (plus tracemalloc peaks with --trace-memory). Results are
+appended to benchmarks/results.jsonl (local to the machine, not committed; pick
+another file with --results) together with the git commit, and each run is
+compared with the last stored result for the same size and machine from another
+commit, so regressions show up across commits.
+
+    python benchmarks/run_benchmarks.py --sizes 10000,100000,1000000
+"""
+
+import os
+import sys
+import json
+import platform
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(BENCH_DIR)
+
+from synthetic_history import generate_history_db
+
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_FILE = os.path.join(BENCH_DIR, 'results.jsonl')
+
+def git_revision():
+    """
+    Short commit hash of the working tree, with '-dirty' if the pipeline code
+    has local changes, including new files not committed yet.
+    """
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', os.path.dirname(BENCH_DIR)], cwd=BENCH_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return rev + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_pipeline(db_path, formats, trace_memory=False):
+    """
+    Run the pipeline once on db_path and return the per-stage measurements.
+    Meant to run in a fresh process, so peak RSS belongs to this run only.
+    """
+    import tracemalloc
+    import pandas as pd
+    from modules.db_reader import read_chrome_history
+    from modules.data_cleaner import clean_data
+    from modules.feature_engineering import engineer_features
+    from modules.exporter import export_data
+    from modules.metrics import PipelineRun, peak_rss_bytes
+
+    if trace_memory:
+        tracemalloc.start()
+    run = PipelineRun('benchmark')
+    with tempfile.TemporaryDirectory(prefix='history_bench_') as output_dir:
+        with run.stage('read') as stage:
+            history = read_chrome_history(db_path)
+            stage.rows_out = len(history)
+        with run.stage('clean', rows_in=len(history)) as stage:
+            df = clean_data(history)
+            stage.rows_out = len(df)
+        del history
+        with run.stage('features', rows_in=len(df)) as stage:
+            df = engineer_features(df)
+            stage.rows_out = len(df)
+        with run.stage('export', rows_in=len(df)) as stage:
+            export_data(df, output_dir, formats)
+            stage.rows_out = len(df)
+
+    stages = []
+    for stage in run.stages:
+        rows = stage.rows_in if stage.rows_in is not None else stage.rows_out
+        stages.append(dict(stage.to_dict(), rows_per_second=rows / stage.seconds if stage.seconds else None))
+    return {
+        'rows': len(df),
+        'seconds': sum(stage.seconds for stage in run.stages),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'stages': stages,
+        'pandas': pd.__version__,
+    }
+
+def ensure_database(visits, seed, days, regenerate=False):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'History_{visits}_s{seed}_d{days}.db')
+    if regenerate or not os.path.exists(path):
+        print(f"Generating {visits} visits -> {path}")
+        generate_history_db(path, visits=visits, days=days, seed=seed,
+                            end_time_us=1_760_000_000_000_000)  # fixed end date keeps runs comparable
+    return path
+
+def load_results(path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def previous_result(results, record):
+    """
+    Latest stored result for the same workload on the same kind of machine
+    from a different commit.
+    """
+    for old in reversed(results):
+        if (old['visits'] == record['visits'] and old['seed'] == record['seed']
+                and old['formats'] == record['formats'] and old['commit'] != record['commit']
+                and old.get('machine') == record['machine'] and old.get('cpus') == record['cpus']):
+            return old
+    return None
+
+def report(record, baseline=None):
+    print(f"\n{record['visits']:,} visits ({record['commit']}), "
+          f"total {record['seconds']:.2f}s, peak RSS {record['peak_rss_bytes'] / 2**20:.0f} MiB")
+    old_stages = {s['stage']: s for s in baseline['stages']} if baseline else {}
+    for stage in record['stages']:
+        line = f"  {stage['stage']:<10} {stage['seconds']:>8.3f}s {stage['rows_per_second']:>14,.0f} rows/s"
+        if stage['traced_peak_bytes'] is not None:
+            line += f" {stage['traced_peak_bytes'] / 2**20:>8.1f} MiB traced"
+        old = old_stages.get(stage['stage'])
+        if old and old['seconds']:
+            line += f"  ({(stage['seconds'] / old['seconds'] - 1) * 100:+.1f}% vs {baseline['commit']})"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000', help='comma-separated visit counts')
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--formats', default='csv,json', help='export formats to time')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per size; the fastest is kept')
+    parser.add_argument('--trace-memory', action='store_true', help='record tracemalloc peaks (slower)')
+    parser.add_argument('--regenerate', action='store_true', help='rebuild the cached databases')
+    parser.add_argument('--results', default=RESULTS_FILE, help='JSON lines file the results are appended to')
+    parser.add_argument('--no-save', action='store_true', help='do not append to the results file')
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    results = load_results(args.results)
+    commit = git_revision()
+    context = multiprocessing.get_context('spawn')
+
+    for visits in sizes:
+        db_path = ensure_database(visits, args.seed, args.days, args.regenerate)
+        best = None
+        for _ in range(args.repeat):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                measured = pool.submit(benchmark_pipeline, db_path, formats, args.trace_memory).result()
+            if best is None or measured['seconds'] < best['seconds']:
+                best = measured
+
+        record = dict(best, visits=visits, seed=args.seed, days=args.days, formats=formats,
+                      commit=commit, recorded_at=datetime.now().isoformat(timespec='seconds'),
+                      python=platform.python_version(), machine=f"{platform.system()} {platform.machine()}",
+                      cpus=os.cpu_count())
+        report(record, previous_result(results, record))
+        results.append(record)
+        if not args.no_save:
+            with open(args.results, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+if __name__ == "__main__":
+    sys.exit(main())
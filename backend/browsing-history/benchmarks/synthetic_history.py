@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic Chrome History databases for benchmarking.
+
+The urls and visits tables follow Chrome's schema. Domain and page popularity
+are Zipf-skewed, visits come in browsing sessions chained through from_visit,
+and transitions carry realistic core types and qualifier bits.
+
+    python benchmarks/synthetic_history.py --visits 1000000 --out /tmp/History
+"""
+
+import os
+import sys
+import sqlite3
+import argparse
+import numpy as np
+
+# Chrome timestamps count microseconds since 1601-01-01
+CHROME_EPOCH_OFFSET_US = 11_644_473_600 * 1_000_000
+
+# ui::PageTransition core types and qualifiers
+LINK, TYPED, AUTO_BOOKMARK, GENERATED, FORM_SUBMIT, RELOAD, KEYWORD = 0, 1, 2, 5, 7, 8, 9
+FORWARD_BACK = 0x01000000
+FROM_ADDRESS_BAR = 0x02000000
+CHAIN_START = 0x10000000
+CHAIN_END = 0x20000000
+CLIENT_REDIRECT = 0x40000000
+SERVER_REDIRECT = 0x80000000
+
+POPULAR_DOMAINS = [
+    'google.com', 'youtube.com', 'github.com', 'stackoverflow.com', 'wikipedia.org',
+    'reddit.com', 'twitter.com', 'facebook.com', 'amazon.com', 'linkedin.com',
+    'netflix.com', 'medium.com', 'bbc.co.uk', 'daraz.pk', 'dawn.com',
+    'chatgpt.com', 'instagram.com', 'spotify.com', 'microsoft.com', 'apple.com',
+]
+SUFFIXES = ['com', 'com', 'com', 'org', 'net', 'io', 'co.uk', 'com.pk', 'edu.pk', 'de', 'github.io']
+SUBDOMAINS = ['www.', 'www.', '', '', 'm.', 'docs.', 'mail.', 'blog.']
+SECTIONS = ['watch', 'questions', 'wiki', 'r', 'news', 'product', 'search', 'article', 'user', 'docs']
+
+SCHEMA = """
+CREATE TABLE urls(id INTEGER PRIMARY KEY AUTOINCREMENT, url LONGVARCHAR, title LONGVARCHAR,
+                  visit_count INTEGER DEFAULT 0 NOT NULL, typed_count INTEGER DEFAULT 0 NOT NULL,
+                  last_visit_time INTEGER NOT NULL, hidden INTEGER DEFAULT 0 NOT NULL);
+CREATE TABLE visits(id INTEGER PRIMARY KEY, url INTEGER NOT NULL, visit_time INTEGER NOT NULL,
+                    from_visit INTEGER, transition INTEGER DEFAULT 0 NOT NULL, segment_id INTEGER,
+                    visit_duration INTEGER DEFAULT 0 NOT NULL);
+CREATE INDEX urls_url_index ON urls (url);
+CREATE INDEX visits_url_index ON visits (url);
+CREATE INDEX visits_from_index ON visits (from_visit);
+CREATE INDEX visits_time_index ON visits (visit_time);
+"""
+
+INSERT_BATCH_ROWS = 100_000
+
+def _zipf_weights(n, s):
+    weights = 1.0 / np.arange(1, n + 1) ** s
+    return weights / weights.sum()
+
+def _domain_names(n, rng):
+    names = list(POPULAR_DOMAINS[:n])
+    suffixes = rng.choice(SUFFIXES, size=max(n - len(names), 0))
+    for i, suffix in enumerate(suffixes, len(names)):
+        names.append(f'user{i}.github.io' if suffix == 'github.io' else f'site{i}.{suffix}')
+    return names
+
+def _url_strings(url_domain, domain_names, rng):
+    """
+    One URL per entry of url_domain (the domain index of each URL); the first
+    URL of each domain is its home page.
+    """
+    n = len(url_domain)
+    subdomain = rng.choice(SUBDOMAINS, size=n)
+    section = rng.choice(SECTIONS, size=n)
+    scheme = np.where(rng.random(n) < 0.05, 'http', 'https')
+    extra = rng.random(n)
+    is_home = np.r_[True, url_domain[1:] != url_domain[:-1]]
+
+    urls = []
+    for i in range(n):
+        host = subdomain[i] + domain_names[url_domain[i]]
+        if is_home[i]:
+            path = '/'
+        elif extra[i] < 0.15:
+            path = f'/{section[i]}?id={i}'
+        elif extra[i] < 0.22:
+            path = f'/{section[i]}/{i}?utm_source=newsletter&utm_medium=email'
+        elif extra[i] < 0.25:
+            path = f'/{section[i]}/{i}#comments'
+        else:
+            path = f'/{section[i]}/{i}'
+        urls.append(f'{scheme[i]}://{host}{path}')
+    return urls
+
+def generate_history_db(path, visits=10_000, days=365, domains=None, zipf_s=1.1, seed=0,
+                        end_time_us=None):
+    """
+    Write a Chrome-style History database with `visits` visits spread over
+    `days` days, ending at end_time_us (Unix microseconds, default now).
+    Returns a dict with the generated counts.
+    """
+    rng = np.random.default_rng(seed)
+    n_domains = domains or max(20, int(visits ** 0.6))
+    n_urls = max(n_domains, visits // 4)
+    domain_names = _domain_names(n_domains, rng)
+
+    # URLs grouped by domain; popular domains own more pages
+    url_domain = rng.choice(n_domains, size=n_urls, p=_zipf_weights(n_domains, zipf_s))
+    url_domain[:n_domains] = np.arange(n_domains)  # every domain has a home page
+    url_domain.sort()
+    domain_start = np.searchsorted(url_domain, np.arange(n_domains))
+    domain_count = np.bincount(url_domain, minlength=n_domains)
+
+    # Visits: Zipf over domains, then skewed towards each domain's first pages
+    visit_domain = rng.choice(n_domains, size=visits, p=_zipf_weights(n_domains, zipf_s))
+    within = np.floor(domain_count[visit_domain] * rng.random(visits) ** 3).astype(np.int64)
+    visit_url = domain_start[visit_domain] + within
+
+    # Sessions: short gaps between visits, occasional long breaks
+    new_session = rng.random(visits) < 0.04
+    new_session[0] = True
+    gaps = np.where(new_session, rng.exponential(4 * 3600, visits), rng.exponential(45, visits))
+    offsets = np.cumsum(gaps)
+    offsets *= days * 86_400 / offsets[-1]
+    if end_time_us is None:
+        end_time_us = int(np.datetime64('now', 'us').astype(np.int64))
+    visit_time = end_time_us - int(days * 86_400 * 1_000_000) + (offsets * 1_000_000).astype(np.int64)
+    visit_time += CHROME_EPOCH_OFFSET_US
+
+    # Transitions: sessions start typed, bookmarked or from a search; the rest follow links
+    visit_ids = np.arange(1, visits + 1, dtype=np.int64)
+    roll = rng.random(visits)
+    transition = np.where(
+        new_session,
+        np.select([roll < 0.6, roll < 0.7], [TYPED | FROM_ADDRESS_BAR, AUTO_BOOKMARK], GENERATED),
+        np.select([roll < 0.8, roll < 0.85, roll < 0.88, roll < 0.93, roll < 0.95],
+                  [LINK, RELOAD, FORM_SUBMIT, LINK | FORWARD_BACK, KEYWORD], LINK)
+    ).astype(np.int64)
+    transition |= CHAIN_START | CHAIN_END
+
+    # Redirects: the redirected visit ends the chain its predecessor started
+    redirect = ~new_session & (roll >= 0.95)
+    redirect_kind = np.where(rng.random(visits) < 0.8, SERVER_REDIRECT, CLIENT_REDIRECT)
+    transition[redirect] = (LINK | CHAIN_END) | redirect_kind[redirect]
+    previous = np.flatnonzero(redirect) - 1
+    transition[previous] &= ~CHAIN_END
+
+    from_visit = np.where(new_session, 0, visit_ids - 1)
+    # Time on page: until the next visit, capped at an hour
+    visit_duration = (np.minimum(np.r_[gaps[1:], 0.0], 3600) * 1_000_000).astype(np.int64)
+
+    # Only URLs that were visited end up in the table, as Chrome expires the rest
+    used = np.unique(visit_url)
+    visit_count = np.bincount(visit_url, minlength=n_urls)
+    typed_count = np.bincount(visit_url, weights=(transition & 0xFF) == TYPED, minlength=n_urls).astype(np.int64)
+    last_visit = np.zeros(n_urls, dtype=np.int64)
+    np.maximum.at(last_visit, visit_url, visit_time)
+    url_strings = _url_strings(url_domain, domain_names, rng)
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=OFF")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            "INSERT INTO urls VALUES (?, ?, ?, ?, ?, ?, 0)",
+            ((int(i) + 1, url_strings[i], f"{domain_names[url_domain[i]]} - page {i}",
+              int(visit_count[i]), int(typed_count[i]), int(last_visit[i])) for i in used)
+        )
+        for start in range(0, visits, INSERT_BATCH_ROWS):
+            end = start + INSERT_BATCH_ROWS
+            conn.executemany(
+                "INSERT INTO visits VALUES (?, ?, ?, ?, ?, 0, ?)",
+                zip(visit_ids[start:end].tolist(), (visit_url[start:end] + 1).tolist(),
+                    visit_time[start:end].tolist(), from_visit[start:end].tolist(),
+                    transition[start:end].tolist(), visit_duration[start:end].tolist())
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {'visits': visits, 'urls': len(used), 'domains': int(np.unique(visit_domain).size),
+            'sessions': int(new_session.sum()), 'days': days, 'seed': seed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--visits', type=int, default=10_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--domains', type=int, default=None, help='distinct domains (default visits**0.6)')
+    parser.add_argument('--zipf', type=float, default=1.1, help='popularity skew exponent')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='History')
+    args = parser.parse_args(argv)
+
+    stats = generate_history_db(args.out, args.visits, args.days, args.domains, args.zipf, args.seed)
+    print(f"Wrote {args.out}: {stats}")
+
+if __name__ == "__main__":
+    sys.exit(main())
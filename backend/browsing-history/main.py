@@ -1,75 +1,295 @@
-from flask import Flask, jsonify, send_file
+from flask import Flask, Response, jsonify, send_file, request
 from flask_cors import CORS
 import os
 import sys
 import json
+from contextlib import ExitStack
 
 # Add modules directory to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 
-from modules.db_reader import copy_chrome_history, read_chrome_history
+from modules.db_reader import open_history_snapshot, read_chrome_history, history_source_mtime, discover_history_sources
 from modules.data_cleaner import clean_data
-from modules.feature_engineering import engineer_features
-from modules.exporter import export_data
+from modules.feature_engineering import engineer_features, merge_new_visits
+from modules.exporter import export_data, read_exported_history
+from modules.url_dictionary import UrlDictionary, has_url_ids, iter_decoded_csv
+from modules.watermark import load_watermark, load_client_id, save_watermark
+from modules.streaming import stream_history
+from modules.profiles import tag_source, source_watermarks, ingest_sources, drop_duplicate_visits
+from modules.history_store import upsert_visits, read_history_range, materialize_csv
 from modules.sender import send_history_to_server
+from modules.pagination import PageError, parse_page_args, paginate_history, iter_ndjson
+from modules.jobs import JobRunner
+from modules.metrics import pipeline_run, render_prometheus
 
 app = Flask(__name__)
 CORS(app)
 
-def fetch_history():
+# Background runner shared by /fetch and the /jobs endpoints
+jobs = JobRunner()
+
+def fetch_history(incremental=False):
     """
     Function to fetch and process browsing history.
+    With incremental=True, only visits newer than the stored watermark are read
+    and merged into the previously exported dataset.
+    Returns the processed DataFrame, or None on failure.
     """
     try:
-        # Step 1: Copy Chrome History DB
-        print("Copying Chrome History database...")
-        db_path = copy_chrome_history()
+        output_dir = 'output'
+        with pipeline_run('fetch', output_dir) as run:
+            # Incremental runs need both a watermark and the dataset it refers to
+            watermark = load_watermark(output_dir) if incremental else None
+            existing_df = None
+            if watermark:
+                with run.stage('load_existing') as stage:
+                    existing_df = read_exported_history(output_dir)
+                    if existing_df is None:
+                        existing_df = read_history_range(output_dir)
+                    stage.rows_out = len(existing_df) if existing_df is not None else 0
 
-        # Step 2: Read history
-        print("Reading browsing history...")
-        history_list = read_chrome_history(db_path)
+            # Every profile of Chrome, Chromium and Edge, newest visit of each already ingested
+            sources = discover_history_sources()
+            if not sources:
+                raise FileNotFoundError("No Chrome, Chromium or Edge History database found. Ensure a browser is installed and has browsing history.")
+            since = source_watermarks(existing_df) if existing_df is not None else {}
 
-        # Step 3: Clean data
-        print("Cleaning data...")
-        df = clean_data(history_list)
+            if len(sources) == 1:
+                source = sources[0]
+                with ExitStack() as snapshot:
+                    # Step 1: Snapshot the History DB (released as soon as it has been read)
+                    print(f"Opening {source['source']} History snapshot...")
+                    with run.stage('snapshot'):
+                        conn = snapshot.enter_context(open_history_snapshot(path=source['path']))
 
-        # Step 4: Engineer features
-        print("Engineering features...")
-        df = engineer_features(df)
+                    # Step 2: Read history
+                    watermark = since.get(source['source'])
+                    print("Reading browsing history..." if watermark is None else
+                          f"Reading browsing history since visit {watermark['visit_id']}...")
+                    with run.stage('read') as stage:
+                        history_list = read_chrome_history(conn, since=watermark)
+                        stage.rows_out = len(history_list)
 
-        # Step 5: Export data
-        output_dir = 'output'
-        os.makedirs(output_dir, exist_ok=True)
-        print("Exporting data...")
-        export_data(df, output_dir)
+                # Step 3: Clean data
+                print("Cleaning data...")
+                with run.stage('clean', rows_in=len(history_list)) as stage:
+                    new_df = tag_source(clean_data(history_list), source['source'])
+                    stage.rows_out = len(new_df)
+            else:
+                # Steps 1-3 for each profile in its own process
+                print(f"Ingesting {len(sources)} browser profiles in parallel...")
+                with run.stage('ingest') as stage:
+                    new_df = ingest_sources(sources, since)
+                    stage.rows_out = len(new_df)
+            new_df = drop_duplicate_visits(new_df, existing_df)
+
+            if existing_df is not None:
+                print(f"Found {len(new_df)} new visits.")
+                if len(new_df):
+                    # Step 4 on the new rows only
+                    with run.stage('merge', rows_in=len(new_df)) as stage:
+                        df, touched_ids = merge_new_visits(existing_df, new_df, return_touched=True)
+                        stage.rows_out = len(df)
+                else:
+                    df = existing_df
+            else:
+                # Step 4: Engineer features
+                print("Engineering features...")
+                with run.stage('features', rows_in=len(new_df)) as stage:
+                    # The previous run's client_id keeps the ids of a rebuild stable
+                    df = engineer_features(new_df, client_id=load_client_id(output_dir))
+                    stage.rows_out = len(df)
+
+            # Step 5: Update the partitioned store and export data
+            os.makedirs(output_dir, exist_ok=True)
+            if existing_df is None or len(new_df):
+                print("Updating partitioned history store...")
+                with run.stage('store') as stage:
+                    if existing_df is None:
+                        upsert_visits(df, output_dir, rebuild=True)
+                        stage.rows_in = len(df)
+                    else:
+                        touched = df[df['visit_id'].isin(touched_ids)]
+                        upsert_visits(touched, output_dir)
+                        stage.rows_in = len(touched)
+
+                print("Exporting data...")
+                with run.stage('export', rows_in=len(df)) as stage:
+                    export_data(df, output_dir)
+                    save_watermark(df, output_dir)
+                    stage.rows_out = len(df)
+
+            run.rows = len(df)
 
-        # Clean up temp DB
-        os.remove(db_path)
         print("Process completed successfully.")
 
-        return df.to_dict(orient='records')
+        return df
 
     except Exception as e:
         print(f"Error: {e}")
         return None
 
+def fetch_history_streaming(chunk_size=50_000):
+    """
+    Fetch and process browsing history chunk by chunk, keeping memory flat.
+    Returns the number of exported rows instead of the records themselves.
+    """
+    try:
+        with pipeline_run('stream') as run:
+            sources = discover_history_sources()
+            if not sources:
+                raise FileNotFoundError("No Chrome, Chromium or Edge History database found. Ensure a browser is installed and has browsing history.")
+            with ExitStack() as snapshots:
+                # Every profile stays open so their cursors can be merged newest-first
+                connections, errors = [], []
+                for source in sources:
+                    print(f"Opening {source['source']} History snapshot...")
+                    try:
+                        conn = snapshots.enter_context(open_history_snapshot(path=source['path']))
+                    except Exception as e:
+                        print(f"Skipping {source['source']}: {e}")
+                        errors.append(f"{source['source']}: {e}")
+                        continue
+                    connections.append((source['source'], conn))
+                if not connections:
+                    raise RuntimeError(f"Could not read any browser profile ({'; '.join(errors)})")
+
+                print(f"Streaming browsing history of {len(connections)} profile(s) in chunks of {chunk_size}...")
+                # Read, clean, features and export are interleaved per chunk
+                with run.stage('stream') as stage:
+                    rows = stream_history(connections, 'output', chunk_size=chunk_size)
+                    stage.rows_out = rows
+            run.rows = rows
+        print("Process completed successfully.")
+        return rows
+
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+def _flag(name):
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+def submit_fetch_job():
+    """
+    Start (or join) the pipeline run described by the request's query string.
+    Full and incremental fetches produce the same dataset and share one key;
+    ?refresh=1 ignores a cached result.
+    """
+    try:
+        source_mtime = tuple(
+            (source['source'], history_source_mtime(source['path'])) for source in discover_history_sources()
+        ) or None
+    except ValueError:
+        source_mtime = None
+
+    if _flag('stream'):
+        chunk_size = request.args.get('chunk_size', 50_000, type=int)
+        return jobs.submit('stream', lambda: fetch_history_streaming(chunk_size=chunk_size),
+                           source_mtime=source_mtime, force=_flag('refresh'))
+
+    incremental = _flag('incremental')
+    return jobs.submit('fetch', lambda: fetch_history(incremental=incremental),
+                       source_mtime=source_mtime, force=_flag('refresh'))
+
+def job_response(job):
+    """
+    Response for a finished job: the row count of a streaming run, or the
+    requested page of the processed history.
+    """
+    if job.status == 'failed':
+        return jsonify({"error": "Failed to fetch history", "job": job.to_dict()}), 500
+    if job.key == 'stream':
+        return jsonify({"message": "History exported", "rows": job.result})
+
+    try:
+        page, next_cursor = paginate_history(job.result, **parse_page_args(request.args))
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+    if request.args.get('format', '').lower() == 'ndjson':
+        return Response(iter_ndjson(page), mimetype='application/x-ndjson', headers=headers)
+    return jsonify(page.to_dict(orient='records')), 200, headers
+
 @app.route('/fetch', methods=['GET'])
 def get_history():
     """
     API endpoint to fetch Chrome browsing history.
+    Pass ?incremental=1 to only ingest visits added since the last run, or
+    ?stream=1 to rebuild the export chunk by chunk (returns a row count only).
+    Concurrent calls share one pipeline run, and the last result is reused
+    until the History database changes (?refresh=1 forces a new run).
+
+    The response can be narrowed with since/until (ISO timestamps), limit,
+    order (asc|desc) and fields (comma-separated columns). When more rows
+    remain, the X-Next-Cursor header holds the cursor for the next page.
+    Pass ?format=ndjson to stream newline-delimited JSON instead of one array.
+    """
+    try:
+        parse_page_args(request.args)
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
+    job, _ = submit_fetch_job()
+    job.wait()
+    return job_response(job)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Start the history pipeline in the background. Takes the same run options
+    as /fetch and returns the job id; poll /jobs/<id> and read /jobs/<id>/result.
+    """
+    job, started = submit_fetch_job()
+    body = job.to_dict()
+    body['started'] = started
+    return jsonify(body), 202, {'Location': f"/jobs/{job.id}"}
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a background job.
     """
-    data = fetch_history()
-    if data is not None:
-        return jsonify(data)
-    else:
-        return jsonify({"error": "Failed to fetch history"}), 500
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
 
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Result of a finished job, with the same paging options as /fetch.
+    Returns 202 with the job status while it is still running.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if job.status in ('pending', 'running'):
+        return jsonify(job.to_dict()), 202
+    return job_response(job)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Per-stage timings, row counts and memory of the pipeline runs, in the
+    Prometheus text format.
+    """
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/files/history.csv', methods=['GET'])
 def download_history():
-    # Return the exported history CSV if it exists
-    fp = os.path.join(os.path.dirname(__file__), 'output', 'history.csv')
+    # Return the exported history CSV, rebuilding it from the partitioned store if stale
+    # Id-encoded exports (HISTORY_URL_IDS) are served with the URL strings restored
+    output_dir = os.path.join(os.path.dirname(__file__), 'output')
+    fp = materialize_csv(output_dir)
     if os.path.exists(fp):
+        with open(fp) as f:
+            header = f.readline().strip().split(',')
+        if has_url_ids(header):
+            return Response(iter_decoded_csv(fp, UrlDictionary.load(output_dir)), mimetype='text/csv',
+                            headers={'Content-Disposition': 'attachment; filename=history.csv'})
         return send_file(fp, as_attachment=True)
     return jsonify({'error': 'history.csv not found, run /fetch first'}), 404
 
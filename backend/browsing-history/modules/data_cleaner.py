@@ -1,6 +1,19 @@
+import re
+import numpy as np
 import pandas as pd
 from urllib.parse import urlparse
-import tldextract
+
+from modules.domain_extractor import extract_domain, extract_domains
+
+US_PER_SECOND = 1_000_000
+# Seconds from the Chrome epoch (1601-01-01) to the Unix epoch (1970-01-01)
+CHROME_TO_UNIX_SECONDS = 11_644_473_600
+# Timestamps below this have too many fractional bits for the int64 kernel
+MIN_VECTORIZED_SECONDS = 512
+
+# URLs clean_url() returns unchanged: lowercase scheme, '//' authority, printable
+# ASCII, and none of the characters urlparse splits on (; ? #) or validates ([ ])
+PLAIN_URL_PATTERN = re.compile(r'[a-z][a-z0-9+.\-]*://[\x21\x22\x24-\x3a\x3c-\x3e\x40-\x5a\x5c\x5e-\x7e]*')
 
 def clean_url(url):
     """
@@ -9,29 +22,78 @@ def clean_url(url):
     parsed = urlparse(url)
     return f"{parsed.scheme}://{parsed.netloc}{parsed.path}"
 
-def extract_domain(url):
+def clean_urls(urls):
+    """
+    Vectorized clean_url() for a whole column.
+    Each distinct URL is handled once: URLs that are already clean are detected
+    with one regex pass, only the rest go through urlparse, and the results are
+    mapped back to the rows.
     """
-    Extract the base domain from the URL using tldextract.
+    urls = pd.Series(urls)
+    codes, uniques = pd.factorize(urls, use_na_sentinel=False)
+    uniques = pd.Series(uniques, dtype=object)
+
+    cleaned = uniques.to_numpy(dtype=object, copy=True)
+    needs_parse = ~uniques.str.fullmatch(PLAIN_URL_PATTERN).fillna(False).to_numpy(dtype=bool)
+    cleaned[needs_parse] = [clean_url(url) for url in cleaned[needs_parse]]
+
+    return pd.Series(cleaned[codes], index=urls.index, name=urls.name)
+
+def chrome_timestamps_to_datetime(visit_times):
     """
-    extracted = tldextract.extract(url)
-    return f"{extracted.domain}.{extracted.suffix}"
+    Vectorized chrome_timestamp_to_datetime() for a whole column.
+    Uses int64 arithmetic only but reproduces the scalar function's rounding
+    (chrome_time / 1e6 as a double, then timedelta's round-half-even to whole
+    microseconds), so both give the same instants. Returns datetime64[ns];
+    missing or out-of-range timestamps become NaT.
+    """
+    visit_times = pd.Series(visit_times)
+    valid = visit_times.notna().to_numpy()
+    t = visit_times[valid].to_numpy().astype('int64')
+    q, r = np.divmod(t, US_PER_SECOND)
+    fast = q >= MIN_VECTORIZED_SECONDS
+
+    # chrome_time / 1e6 is the double nearest q + r / 1e6: with b bits of integer
+    # part it keeps k = 53 - b fractional bits, i.e. q + m / 2**k
+    k = np.where(fast, 53 - np.frexp(q.astype('float64'))[1], 0)
+    m, rem = np.divmod(np.where(fast, r, 0) << k, US_PER_SECOND)
+    m += (2 * rem > US_PER_SECOND) | ((2 * rem == US_PER_SECOND) & (m % 2 == 1))
+    q = q + (m >> k)
+    m &= (1 << k) - 1
+
+    # timedelta(seconds=...) takes the fraction to microseconds in double precision
+    fraction_us = np.rint(np.ldexp(m.astype('float64'), -k) * US_PER_SECOND).astype('int64')
+    unix_us = (q - CHROME_TO_UNIX_SECONDS) * US_PER_SECOND + fraction_us
+
+    in_range = fast & (unix_us > pd.Timestamp.min.value // 1000) & (unix_us < pd.Timestamp.max.value // 1000)
+
+    ns = np.full(len(visit_times), np.iinfo('int64').min, dtype='int64')  # NaT
+    ns_valid = ns[valid]
+    ns_valid[in_range] = unix_us[in_range] * 1000
+    ns[valid] = ns_valid
+    # Timestamps left out of the kernel (under 512 s after 1601) are before the
+    # earliest date pandas can hold, so they stay NaT as with errors='coerce'
+    return pd.Series(ns.view('datetime64[ns]'), index=visit_times.index, name=visit_times.name)
+
+# Columns of the rows produced by db_reader.iter_chrome_history()
+RAW_COLUMNS = ['url', 'title', 'visit_time', 'from_visit', 'transition', 'visit_id']
 
 def clean_data(history_list):
     """
     Clean the raw history data: convert timestamps, clean URLs, extract domains.
     Returns a pandas DataFrame.
     """
-    df = pd.DataFrame(history_list)
+    # An empty read (e.g. no new visits in a profile) still gets the raw columns
+    df = pd.DataFrame(history_list, columns=None if len(history_list) else RAW_COLUMNS)
 
     # Convert Chrome timestamps to datetime
-    from modules.db_reader import chrome_timestamp_to_datetime
-    df['time'] = df['visit_time'].apply(chrome_timestamp_to_datetime)
+    df['time'] = chrome_timestamps_to_datetime(df['visit_time'])
 
     # Clean URLs
-    df['url_clean'] = df['url'].apply(clean_url)
+    df['url_clean'] = clean_urls(df['url'])
 
     # Extract domains
-    df['url_domain'] = df['url'].apply(extract_domain)
+    df['url_domain'] = extract_domains(df['url'])
 
     # Keep all columns as per new sequence
     return df
@@ -2,8 +2,30 @@ import os
 import shutil
 import sqlite3
 import platform
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+# Snapshot strategies tried in order by open_history_snapshot():
+#   immutable - read the live file in place through a read-only immutable URI (no copy)
+#   backup    - pull the database pages into memory with the SQLite backup API
+#   copy      - full file copy into a temp directory (the original behaviour)
+SNAPSHOT_MODES = [m.strip() for m in os.getenv('HISTORY_SNAPSHOT_MODES', 'immutable,backup,copy').split(',') if m.strip()]
+
+# Chromium-based browsers whose profiles are ingested, in priority order
+HISTORY_BROWSERS = [b.strip() for b in os.getenv('HISTORY_BROWSERS', 'chrome,chromium,edge').split(',') if b.strip()]
+
+# User data directory of each browser, relative to the per-OS base directory
+BROWSER_DATA_DIRS = {
+    'Windows': {'chrome': 'Google/Chrome/User Data', 'chromium': 'Chromium/User Data', 'edge': 'Microsoft/Edge/User Data'},
+    'Darwin': {'chrome': 'Google/Chrome', 'chromium': 'Chromium', 'edge': 'Microsoft Edge'},
+    'Linux': {'chrome': 'google-chrome', 'chromium': 'chromium', 'edge': 'microsoft-edge'},
+}
+
+# Profile directories that never hold user browsing history
+SKIPPED_PROFILES = {'System Profile', 'Guest Profile'}
+
 def get_chrome_history_path():
     """
     Get the path to Chrome's History database based on the operating system.
@@ -23,6 +45,53 @@ def get_chrome_history_path():
         raise ValueError("Unsupported operating system")
     return path
 
+def browser_data_dirs(browsers=None):
+    """
+    User data directory of each browser on this operating system.
+    """
+    system = platform.system()
+    if system == "Windows":
+        base = os.getenv('LOCALAPPDATA') or f"C:\\Users\\{os.getenv('USERNAME')}\\AppData\\Local"
+    elif system == "Darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    elif system == "Linux":
+        base = os.getenv('XDG_CONFIG_HOME') or os.path.expanduser("~/.config")
+    else:
+        raise ValueError("Unsupported operating system")
+    dirs = BROWSER_DATA_DIRS[system]
+    return {b: os.path.join(base, *dirs[b].split('/')) for b in (browsers or HISTORY_BROWSERS) if b in dirs}
+
+def _profile_order(name):
+    # Default first, then "Profile 1", "Profile 2", ... numerically
+    number = name.rsplit(' ', 1)[-1]
+    return (name != 'Default', int(number) if number.isdigit() else float('inf'), name)
+
+def discover_history_sources(browsers=None, data_dirs=None):
+    """
+    Find the History database of every profile of every browser.
+    `data_dirs` maps browser name -> user data directory (default browser_data_dirs()).
+    Returns a list of {'source': 'browser/Profile', 'browser', 'profile', 'path'}
+    in priority order: browsers as listed, Default profile first.
+    """
+    data_dirs = data_dirs if data_dirs is not None else browser_data_dirs(browsers)
+    sources = []
+    seen = set()
+    for browser, data_dir in data_dirs.items():
+        if not os.path.isdir(data_dir):
+            continue
+        profiles = [
+            name for name in os.listdir(data_dir)
+            if name not in SKIPPED_PROFILES and os.path.isfile(os.path.join(data_dir, name, 'History'))
+        ]
+        for profile in sorted(profiles, key=_profile_order):
+            path = os.path.join(data_dir, profile, 'History')
+            real = os.path.realpath(path)
+            if real in seen:  # e.g. a browser directory symlinked to another
+                continue
+            seen.add(real)
+            sources.append({'source': f'{browser}/{profile}', 'browser': browser, 'profile': profile, 'path': path})
+    return sources
+
 def copy_chrome_history():
     """
     Make a safe copy of the Chrome History database to avoid locking issues.
@@ -37,36 +106,163 @@ def copy_chrome_history():
     shutil.copy2(original_path, temp_path)
     return temp_path
 
-def read_chrome_history(db_path):
+def history_source_mtime(path=None):
     """
-    Read browsing history from the copied Chrome History database.
-    Returns a list of dictionaries with raw data.
+    Latest modification time of the History database and its journal/WAL files,
+    or None if the database does not exist. Used to tell whether a cached
+    pipeline result is still current.
+    """
+    path = path or get_chrome_history_path()
+    if not os.path.exists(path):
+        return None
+    mtimes = []
+    for candidate in (path, path + '-journal', path + '-wal'):
+        try:
+            mtimes.append(os.path.getmtime(candidate))
+        except OSError:
+            # Journal files come and go while Chrome writes
+            pass
+    return max(mtimes) if mtimes else None
+
+def _probe_tables(conn):
+    """
+    Touch both tables the reader needs so a locked or torn file fails here, not mid-read.
     """
-    conn = sqlite3.connect(db_path)
+    conn.execute("SELECT max(id) FROM visits").fetchone()
+    conn.execute("SELECT max(id) FROM urls").fetchone()
+
+def _probe(conn):
+    """
+    Return `conn` if it can read the history tables, otherwise close it and re-raise.
+    """
+    try:
+        _probe_tables(conn)
+    except sqlite3.Error:
+        conn.close()
+        raise
+    return conn
+
+def _open_immutable(path):
+    """
+    Open the History file in place, read-only, without taking SQLite locks.
+    Only the pages touched by the query are read.
+    """
+    uri = Path(path).absolute().as_uri() + "?mode=ro&immutable=1"
+    return _probe(sqlite3.connect(uri, uri=True))
+
+def _open_backup(path):
+    """
+    Copy the History database page by page into an in-memory database.
+    Nothing is written to disk.
+    """
+    uri = Path(path).absolute().as_uri() + "?mode=ro"
+    source = sqlite3.connect(uri, uri=True, timeout=1)
+    try:
+        # Hold a read transaction so a locked file fails fast here; backup()
+        # itself would keep retrying while Chrome holds the lock
+        source.execute("BEGIN")
+        _probe_tables(source)
+        snapshot = sqlite3.connect(":memory:")
+        source.backup(snapshot)
+    finally:
+        source.close()
+    return snapshot
+
+@contextmanager
+def open_history_snapshot(modes=None, path=None):
+    """
+    Yield a sqlite3 connection to a snapshot of Chrome's History database.
+    Strategies from `modes` (default SNAPSHOT_MODES) are tried in order until one
+    opens; anything created for the snapshot is removed on exit, even on error.
+    """
+    path = path or get_chrome_history_path()
+    if not os.path.exists(path):
+        raise FileNotFoundError("Chrome History database not found. Ensure Chrome is installed and has browsing history.")
+
+    conn = None
+    temp_dir = None
+    errors = []
+    try:
+        for mode in modes or SNAPSHOT_MODES:
+            try:
+                if mode == 'immutable':
+                    conn = _open_immutable(path)
+                elif mode == 'backup':
+                    conn = _open_backup(path)
+                elif mode == 'copy':
+                    temp_dir = tempfile.mkdtemp(prefix='history_')
+                    temp_path = os.path.join(temp_dir, 'History_temp')
+                    shutil.copy2(path, temp_path)
+                    conn = _probe(sqlite3.connect(temp_path))
+                else:
+                    raise ValueError(f"Unknown snapshot mode: {mode}")
+                break
+            except (sqlite3.Error, OSError) as e:
+                print(f"Snapshot mode '{mode}' failed: {e}")
+                errors.append(f"{mode}: {e}")
+        if conn is None:
+            raise RuntimeError(f"Could not snapshot Chrome History database ({'; '.join(errors)})")
+        yield conn
+    finally:
+        if conn is not None:
+            conn.close()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def iter_chrome_history(db_path, since=None, chunk_size=50_000):
+    """
+    Read browsing history from the copied Chrome History database in chunks.
+    `db_path` may also be an open connection, e.g. from open_history_snapshot().
+    If `since` is a watermark dict ({'visit_time': ..., 'visit_id': ...}), only
+    visits strictly newer than it are returned.
+    Yields lists of at most `chunk_size` raw dictionaries, newest visit first.
+    """
+    owns_conn = not isinstance(db_path, sqlite3.Connection)
+    conn = sqlite3.connect(db_path) if owns_conn else db_path
     cursor = conn.cursor()
 
-    # Query the urls and visits tables for history records
-    cursor.execute("""
-        SELECT u.url, u.title, v.visit_time, v.from_visit, v.transition, v.id as visit_id
-        FROM urls u
-        JOIN visits v ON u.id = v.url
-        ORDER BY v.visit_time DESC
-    """)
+    try:
+        # Query the urls and visits tables for history records
+        query = """
+            SELECT u.url, u.title, v.visit_time, v.from_visit, v.transition, v.id as visit_id
+            FROM urls u
+            JOIN visits v ON u.id = v.url
+        """
+        params = ()
+        if since is not None:
+            # Keyset on (visit_time, visit_id) so visits sharing the watermark's
+            # timestamp are neither skipped nor read twice
+            query += " WHERE v.visit_time > ? OR (v.visit_time = ? AND v.id > ?)"
+            params = (since['visit_time'], since['visit_time'], since['visit_id'])
+        query += " ORDER BY v.visit_time DESC, v.id DESC"
+        cursor.execute(query, params)
 
-    rows = cursor.fetchall()
-    conn.close()
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [{
+                'url': row[0],
+                'title': row[1] or '',  # Handle None titles
+                'visit_time': row[2],  # Chrome timestamp
+                'from_visit': row[3],
+                'transition': row[4],
+                'visit_id': row[5]
+            } for row in rows]
+    finally:
+        cursor.close()
+        if owns_conn:
+            conn.close()
 
+def read_chrome_history(db_path, since=None):
+    """
+    Read browsing history from the copied Chrome History database.
+    Accepts the same arguments as iter_chrome_history().
+    Returns a list of dictionaries with raw data.
+    """
     history = []
-    for row in rows:
-        history.append({
-            'url': row[0],
-            'title': row[1] or '',  # Handle None titles
-            'visit_time': row[2],  # Chrome timestamp
-            'from_visit': row[3],
-            'transition': row[4],
-            'visit_id': row[5]
-        })
-
+    for chunk in iter_chrome_history(db_path, since=since):
+        history.extend(chunk)
     return history
 
 def chrome_timestamp_to_datetime(chrome_time):
@@ -0,0 +1,56 @@
+import os
+from pathlib import Path
+from functools import lru_cache
+import pandas as pd
+import tldextract
+from tldextract.remote import lenient_netloc
+
+# Pinned copy of the Public Suffix List (see its VERSION/COMMIT header).
+# tldextract reads it through a file:// URL, so domain extraction never goes to the network.
+SUFFIX_LIST_PATH = os.path.join(os.path.dirname(__file__), 'data', 'public_suffix_list.dat')
+
+# Distinct hosts kept in the in-process LRU cache, shared across requests
+DOMAIN_CACHE_SIZE = int(os.getenv('DOMAIN_CACHE_SIZE', '50000'))
+
+_extractor = tldextract.TLDExtract(
+    suffix_list_urls=(Path(SUFFIX_LIST_PATH).absolute().as_uri(),),
+    cache_dir=None,  # no disk cache; the list is parsed once per process
+    fallback_to_snapshot=True
+)
+
+@lru_cache(maxsize=DOMAIN_CACHE_SIZE)
+def domain_for_host(host):
+    """
+    Return the registered domain ("domain.suffix") for a host name.
+    """
+    extracted = _extractor.extract_str(host)
+    return f"{extracted.domain}.{extracted.suffix}"
+
+def extract_domain(url):
+    """
+    Extract the base domain from the URL, memoized per host.
+    """
+    return domain_for_host(lenient_netloc(url))
+
+def extract_domains(urls):
+    """
+    Vectorized extract_domain() for a whole column.
+    Hosts are parsed once per distinct URL and resolved once per distinct host,
+    then the results are mapped back to the rows.
+    """
+    urls = pd.Series(urls)
+    codes, unique_urls = pd.factorize(urls)
+    hosts = pd.Series([lenient_netloc(url) for url in unique_urls], dtype=object)
+    host_codes, unique_hosts = pd.factorize(hosts)
+    domains = pd.Series([domain_for_host(host) for host in unique_hosts], dtype=object).to_numpy()
+
+    result = pd.Series(domains[host_codes][codes], index=urls.index, name=urls.name)
+    result[codes == -1] = None
+    return result
+
+def cache_stats():
+    """
+    Hit/miss counters of the host cache, as a dict.
+    """
+    info = domain_for_host.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'max_size': info.maxsize}
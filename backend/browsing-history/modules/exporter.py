@@ -1,25 +1,248 @@
 import pandas as pd
 import os
+import gzip
+
+from modules.url_dictionary import URL_IDS, UrlDictionary, encode_url_columns, decode_url_columns, has_url_ids
+
+# Output file name per export format
+EXPORT_FILES = {
+    'csv': 'history.csv',
+    'json': 'history.json',
+    'ndjson': 'history.ndjson.gz',
+    'parquet': 'history.parquet',
+    'feather': 'history.feather',  # Arrow IPC file (Feather v2), uncompressed so it can be memory-mapped
+}
+
+# Formats written when the caller doesn't choose; e.g. HISTORY_EXPORT_FORMATS=csv,parquet
+DEFAULT_EXPORT_FORMATS = [f.strip() for f in os.getenv('HISTORY_EXPORT_FORMATS', 'csv,json').split(',') if f.strip()]
+
+# Rows serialized at a time by the text writers, so no format builds the whole file in memory
+WRITE_BATCH_ROWS = 50_000
+
+PARQUET_COMPRESSION = os.getenv('HISTORY_PARQUET_COMPRESSION', 'zstd')
+
+def arrow_types():
+    """
+    Typed Arrow schema for the engineered history columns.
+    """
+    import pyarrow as pa
+    return {
+        'url': pa.string(), 'title': pa.string(), 'visit_time': pa.int64(), 'from_visit': pa.int64(),
+        'transition': pa.int64(), 'visit_id': pa.int64(), 'time': pa.timestamp('us'),
+        'url_clean': pa.string(), 'url_domain': pa.string(), 'url_id': pa.int64(), 'url_clean_id': pa.int64(),
+        'hour': pa.int8(), 'day_of_week': pa.int8(), 'is_weekend': pa.int8(), 'day_of_month': pa.int8(),
+        'week_of_month': pa.int8(), 'month_of_year': pa.int8(), 'total_history_days': pa.int32(),
+        'seconds_until_next_visit_url': pa.float64(), 'seconds_until_next_visit_url_clean': pa.float64(),
+        'seconds_until_next_visit_domain': pa.float64(), 'seconds_until_next_visit': pa.float64(),
+        'page_transition': pa.string(), 'id': pa.string(), 'client_id': pa.string(),
+        'updated_at': pa.string(), 'is_local': pa.int8(), 'ref_id': pa.string(), 'profile': pa.string(),
+        'session_id': pa.int64(), 'chain_depth': pa.int32(),
+    }
+
+def to_arrow_table(df, schema=None):
+    """
+    Convert a DataFrame to an Arrow table, with the typed schema for known columns.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is required for the parquet and feather export formats (pip install pyarrow)")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is None:
+        types = arrow_types()
+        schema = pa.schema([
+            pa.field(field.name, types.get(field.name, field.type)) for field in table.schema
+        ])
+    return table.cast(schema)
+
+class _CsvWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.header_written = False
+
+    def write(self, chunk):
+        # An empty first chunk still produces the header, like DataFrame.to_csv
+        if chunk.empty and self.header_written:
+            return
+        chunk.to_csv(self.file, index=False, header=not self.header_written)
+        self.header_written = True
+
+    def close(self):
+        self.file.close()
+
+class _JsonWriter:
+    def __init__(self, path):
+        self.file = open(path, 'w')
+        self.file.write('[')
+        self.rows = 0
+
+    def write(self, chunk):
+        if chunk.empty:
+            return
+        # Splice each chunk's records into one top-level JSON array
+        records = chunk.to_json(orient='records', date_format='iso')
+        self.file.write(('' if self.rows == 0 else ',') + records[1:-1])
+        self.rows += len(chunk)
+
+    def close(self):
+        self.file.write(']')
+        self.file.close()
+
+class _NdjsonWriter:
+    def __init__(self, path):
+        self.file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, chunk):
+        if chunk.empty:
+            return
+        lines = chunk.to_json(orient='records', lines=True, date_format='iso')
+        self.file.write(lines if lines.endswith('\n') else lines + '\n')
+
+    def close(self):
+        self.file.close()
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.schema = None
+        self.writer = None
+
+    def write(self, chunk):
+        import pyarrow.parquet as pq
+        table = to_arrow_table(chunk, self.schema)
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pq.ParquetWriter(self.path, self.schema, compression=PARQUET_COMPRESSION)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+class _FeatherWriter:
+    def __init__(self, path):
+        self.path = path
+        self.schema = None
+        self.sink = None
+        self.writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        table = to_arrow_table(chunk, self.schema)
+        if self.writer is None:
+            self.schema = table.schema
+            self.sink = pa.OSFile(self.path, 'wb')
+            self.writer = pa.ipc.new_file(self.sink, self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.sink.close()
+
+_WRITERS = {
+    'csv': _CsvWriter,
+    'json': _JsonWriter,
+    'ndjson': _NdjsonWriter,
+    'parquet': _ParquetWriter,
+    'feather': _FeatherWriter,
+}
+
+def export_chunks(chunks, output_dir='output', formats=None, url_ids=None):
+    """
+    Export an iterable of DataFrame chunks to the given formats (default
+    DEFAULT_EXPORT_FORMATS), appending chunk by chunk so only one chunk is held
+    in memory. Every file is written to a temp name and renamed into place only
+    once all formats succeeded, so readers never see a half-written export.
+    With url_ids=True (default HISTORY_URL_IDS) url / url_clean are written as
+    url_id / url_clean_id, and new URLs are added to output/urls.csv first.
+    Returns the number of rows written.
+    """
+    formats = formats or DEFAULT_EXPORT_FORMATS
+    unknown = [f for f in formats if f not in _WRITERS]
+    if unknown:
+        raise ValueError(f"Unknown export formats: {unknown}. Supported: {list(_WRITERS)}")
+    dictionary = UrlDictionary.load(output_dir) if (URL_IDS if url_ids is None else url_ids) else None
+
+    paths = {f: os.path.join(output_dir, EXPORT_FILES[f]) for f in formats}
+    writers = {}
+    rows = 0
+    try:
+        for f in formats:
+            writers[f] = _WRITERS[f](paths[f] + '.tmp')
+        for chunk in chunks:
+            encoded = chunk if dictionary is None else encode_url_columns(chunk, dictionary)
+            for writer in writers.values():
+                writer.write(encoded)
+            rows += len(chunk)
+        for writer in writers.values():
+            writer.close()
+        # Ids must be resolvable before any file that uses them is in place
+        if dictionary is not None:
+            dictionary.save(output_dir)
+    except BaseException:
+        for f, writer in writers.items():
+            try:
+                writer.close()
+            except Exception:
+                pass
+            if os.path.exists(paths[f] + '.tmp'):
+                os.remove(paths[f] + '.tmp')
+        raise
+
+    for f in formats:
+        os.replace(paths[f] + '.tmp', paths[f])
+        print(f"Exported {rows} rows to {paths[f]}")
+    return rows
+
+def _batches(df):
+    """
+    Split a DataFrame into WRITE_BATCH_ROWS-sized slices (at least one, even if empty).
+    """
+    yield df.iloc[:WRITE_BATCH_ROWS]
+    for start in range(WRITE_BATCH_ROWS, len(df), WRITE_BATCH_ROWS):
+        yield df.iloc[start:start + WRITE_BATCH_ROWS]
 
 def export_to_csv(df, output_dir='output'):
     """
     Export the DataFrame to CSV.
     """
-    path = os.path.join(output_dir, 'history.csv')
-    df.to_csv(path, index=False)
-    print(f"Exported to {path}")
+    export_chunks(_batches(df), output_dir, ['csv'])
 
 def export_to_json(df, output_dir='output'):
     """
     Export the DataFrame to JSON.
     """
-    path = os.path.join(output_dir, 'history.json')
-    df.to_json(path, orient='records', date_format='iso')
-    print(f"Exported to {path}")
+    export_chunks(_batches(df), output_dir, ['json'])
+
+def export_data(df, output_dir='output', formats=None):
+    """
+    Export the dataset to the given formats (by default CSV and JSON).
+    Supported: csv, json, ndjson (gzip), parquet, feather (Arrow IPC).
+    """
+    export_chunks(_batches(df), output_dir, formats)
 
-def export_data(df, output_dir='output'):
+def read_exported_history(output_dir='output'):
     """
-    Export the dataset to both CSV and JSON formats.
+    Load the most recently exported history (parquet, feather or CSV), or None if there is none.
+    Id-encoded exports are decoded with output/urls.csv.
     """
-    export_to_csv(df, output_dir)
-    export_to_json(df, output_dir)
+    candidates = [
+        os.path.join(output_dir, EXPORT_FILES[f]) for f in ('parquet', 'feather', 'csv')
+    ]
+    candidates = [p for p in candidates if os.path.exists(p)]
+    if not candidates:
+        return None
+    path = max(candidates, key=os.path.getmtime)
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    elif path.endswith('.feather'):
+        from pyarrow import feather
+        df = feather.read_table(path, memory_map=True).to_pandas()
+    else:
+        df = pd.read_csv(path)
+    if has_url_ids(df.columns):
+        df = decode_url_columns(df, UrlDictionary.load(output_dir))
+    df['time'] = pd.to_datetime(df['time'])
+    return df
@@ -1,7 +1,14 @@
+import os
+import numpy as np
 import pandas as pd
 import uuid
 from datetime import datetime
 
+from modules.navigation import transition_names, add_navigation_features
+
+# Opt-in compact in-memory dtypes for the engineered frame (see compact_schema)
+COMPACT_SCHEMA = os.getenv('HISTORY_COMPACT_SCHEMA', '').lower() in ('1', 'true', 'yes')
+
 def add_date_time_features(df):
     """
     Add derived date/time features to the DataFrame.
@@ -25,58 +32,168 @@ def add_date_time_features(df):
 
     return df
 
+# Grouping keys that get a seconds-until-next-visit feature, and their column names
+GAP_KEYS = ['url', 'url_clean', 'url_domain']
+GAP_COLUMNS = {
+    'url': 'seconds_until_next_visit_url',
+    'url_clean': 'seconds_until_next_visit_url_clean',
+    'url_domain': 'seconds_until_next_visit_domain',
+}
+
+def gap_column(group_by):
+    """
+    Name of the seconds-until-next-visit column produced for a grouping key.
+    Keys without a fixed name (e.g. 'title') get 'seconds_until_next_visit_<key>'.
+    """
+    return GAP_COLUMNS.get(group_by, f'seconds_until_next_visit_{group_by}')
+
+# int64 view of NaT
+NAT = np.iinfo('int64').min
+
+def next_visit_gaps(times, codes):
+    """
+    Seconds from each visit to the next visit with the same group code.
+    `times` are int64 nanoseconds already in visit order and `codes` the
+    factorized group of each row (-1 = no group). Rows with no next visit,
+    no group or no time get -1.
+    """
+    n = len(codes)
+    gaps = np.full(n, -1.0)
+    if n < 2:
+        return gaps
+
+    # Stable sort on the small integer codes keeps each group in time order
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    sorted_times = times[order]
+
+    has_next = (sorted_codes[1:] == sorted_codes[:-1]) & (sorted_codes[:-1] >= 0)
+    has_next &= (sorted_times[1:] != NAT) & (sorted_times[:-1] != NAT)
+    sorted_gaps = np.full(n, -1.0)
+    sorted_gaps[:-1] = np.where(has_next, (sorted_times[1:] - sorted_times[:-1]) / 1e9, -1.0)
+
+    gaps[order] = sorted_gaps
+    return gaps
+
+def add_gap_features(df, keys=None):
+    """
+    Add seconds-until-next-visit features for any number of grouping keys.
+    The frame is sorted by (time, visit_id) once; each key is then factorized
+    to integer codes and handled in a single vectorized pass over NumPy arrays.
+    Returns the frame in time order with a fresh index.
+    """
+    # visit_id breaks ties so equal timestamps always resolve the same way;
+    # NaT sorts last, as it does in sort_values
+    df = df.sort_values(['time', 'visit_id'], kind='stable', na_position='last').reset_index(drop=True)
+    times = df['time'].to_numpy(dtype='datetime64[ns]').view('int64')
+
+    for key in keys or GAP_KEYS:
+        codes = pd.factorize(df[key])[0]
+        df[gap_column(key)] = next_visit_gaps(times, codes)
+
+    return df
+
 def calculate_seconds_until_next_visit(df, group_by='url'):
     """
     Calculate seconds until next visit for each group (url, url_clean, or url_domain).
+    Prefer add_gap_features() with all keys at once.
     """
-    df = df.sort_values('time').reset_index(drop=True)
+    return add_gap_features(df, [group_by])
 
-    # Group by the specified column and calculate time differences
-    df[f'seconds_until_next_visit_{group_by.replace("url_", "")}'] = df.groupby(group_by)['time'].diff(-1).dt.total_seconds().abs()
+_HEX_PAIRS = np.array([f'{i:02x}' for i in range(256)], dtype='S2')
+# Where the 32 hex digits go in the 36-character UUID string
+_UUID_HEX_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
 
-    # Fill NaN for the last visit in each group
-    df[f'seconds_until_next_visit_{group_by.replace("url_", "")}'] = df[f'seconds_until_next_visit_{group_by.replace("url_", "")}'].fillna(-1)
+def _mix64(x):
+    """
+    splitmix64 finalizer on a uint64 array (wrapping arithmetic).
+    """
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
 
-    return df
+def visit_uuids(visit_ids, client_id=None):
+    """
+    Deterministic UUID strings for a column of visit ids, computed without a
+    Python-level loop. The same visit of the same client always gets the same
+    id; different clients get unrelated ids. Version 8 (custom) RFC 4122 layout.
+    """
+    try:
+        namespace = uuid.UUID(client_id).int if client_id else 0
+    except ValueError:
+        namespace = uuid.uuid5(uuid.NAMESPACE_OID, client_id).int
+    ns_hi, ns_lo = np.uint64(namespace >> 64), np.uint64(namespace & (2**64 - 1))
+
+    with np.errstate(over='ignore'):
+        ids = np.asarray(visit_ids, dtype=np.int64).astype(np.uint64)
+        hi = _mix64(ids ^ ns_hi)
+        lo = _mix64(hi ^ ids ^ ns_lo ^ np.uint64(0x9E3779B97F4A7C15))
+    hi = (hi & np.uint64(~0xF000 & (2**64 - 1))) | np.uint64(0x8000)                       # version 8
+    lo = (lo & np.uint64(0x3FFFFFFFFFFFFFFF)) | np.uint64(0x8000000000000000)             # RFC 4122 variant
 
-def add_additional_features(df):
+    words = np.empty((len(ids), 2), dtype='>u8')
+    words[:, 0], words[:, 1] = hi, lo
+    digits = _HEX_PAIRS[words.view(np.uint8).reshape(-1, 16)].view('S1').reshape(-1, 32)
+    chars = np.full((len(ids), 36), b'-', dtype='S1')
+    chars[:, _UUID_HEX_POSITIONS] = digits
+    return chars.view('S36').ravel().astype(str)
+
+def add_additional_features(df, client_id=None, updated_at=None):
     """
     Add page_transition, ref_id, is_local, and auto-generated fields.
-    Note: Chrome's visits table has page_transition, but for simplicity, we'll assume or set defaults.
-    Since we don't have visits table data, we'll set defaults or skip some.
+    page_transition is the core type decoded from Chrome's transition value and
+    ref_id the id of the visit this one was reached from (from_visit), which is
+    the same id that visit gets, since ids are derived from visit ids.
+    Pass `client_id`/`updated_at` to share them across separately processed batches of rows.
     """
-    # For now, set defaults as per requirements; in a full implementation, join with visits table
-    df['page_transition'] = 'LINK'  # Default
-    df['ref_id'] = None  # Not available without visits table
+    df['page_transition'] = transition_names(df['transition'])
     df['is_local'] = 0  # Assume not local
 
     # Auto-generate
-    df['id'] = [str(uuid.uuid4()) for _ in range(len(df))]  # New unique id
-    df['client_id'] = str(uuid.uuid4())  # Same for all records
-    df['updated_at'] = datetime.now().isoformat()
+    client_id = client_id or str(uuid.uuid4())
+    df['id'] = visit_uuids(df['visit_id'], client_id)  # Stable per visit and client
+    from_visit = df['from_visit'].fillna(0).to_numpy(np.int64)
+    df['ref_id'] = np.where(from_visit > 0, visit_uuids(from_visit, client_id), None)
+    df['client_id'] = client_id  # Same for all records
+    df['updated_at'] = updated_at or datetime.now().isoformat()
 
     return df
 
-def engineer_features(df):
+REQUIRED_COLUMNS = [
+    'url', 'title', 'visit_time', 'from_visit', 'transition', 'visit_id', 'time', 'url_clean', 'url_domain',
+    'hour', 'day_of_week', 'is_weekend', 'day_of_month', 'week_of_month', 'month_of_year', 'total_history_days',
+    'seconds_until_next_visit_url', 'seconds_until_next_visit_url_clean', 'seconds_until_next_visit_domain',
+    'seconds_until_next_visit', 'page_transition', 'id', 'client_id', 'updated_at', 'is_local', 'ref_id',
+    'profile', 'session_id', 'chain_depth'
+]
+
+def add_streaming_gap_features(chunk, carry):
     """
-    Apply all feature engineering steps.
+    Add seconds-until-next-visit features to one chunk of a newest-first stream.
+    `carry` maps each grouping key to the earliest visit time already seen per
+    group in previous (later) chunks; it is updated in place, so state stays
+    bounded by the number of distinct groups rather than the number of visits.
     """
-    df = add_date_time_features(df)
-    df = calculate_seconds_until_next_visit(df, 'url')
-    df = calculate_seconds_until_next_visit(df, 'url_clean')
-    df = calculate_seconds_until_next_visit(df, 'url_domain')
-    df = add_additional_features(df)
-
-    # Ensure all required columns are present
-    required_columns = [
-        'url', 'title', 'visit_time', 'from_visit', 'transition', 'visit_id', 'time', 'url_clean', 'url_domain',
-        'hour', 'day_of_week', 'is_weekend', 'day_of_month', 'week_of_month', 'month_of_year', 'total_history_days',
-        'seconds_until_next_visit_url', 'seconds_until_next_visit_url_clean', 'seconds_until_next_visit_domain',
-        'seconds_until_next_visit', 'page_transition', 'id', 'client_id', 'updated_at', 'is_local', 'ref_id'
-    ]
+    chunk = chunk.sort_values(['time', 'visit_id'], ascending=False, kind='stable').reset_index(drop=True)
+    for key in GAP_KEYS:
+        seen = carry.get(key)
+
+        # Newest first, so the previous row of a group is its next visit
+        next_time = chunk.groupby(key)['time'].shift(1)
+        if seen is not None:
+            next_time = next_time.fillna(chunk[key].map(seen))
+        chunk[gap_column(key)] = (next_time - chunk['time']).dt.total_seconds().abs().fillna(-1)
 
+        earliest = chunk.groupby(key)['time'].last()
+        carry[key] = earliest if seen is None else earliest.combine_first(seen)
+    return chunk
+
+def finalize_columns(df):
+    """
+    Ensure all required columns are present and in the exported order.
+    """
     # Add missing columns if not present
-    for col in required_columns:
+    for col in REQUIRED_COLUMNS:
         if col not in df.columns:
             df[col] = None
 
@@ -84,6 +201,127 @@ def engineer_features(df):
     df['seconds_until_next_visit'] = df['seconds_until_next_visit_url']
 
     # Reorder columns
-    df = df[required_columns]
+    return df[REQUIRED_COLUMNS]
+
+# Column groups for compact_schema()
+CATEGORY_COLUMNS = ['url', 'title', 'url_clean', 'url_domain', 'page_transition', 'ref_id', 'profile']
+INT8_COLUMNS = ['hour', 'day_of_week', 'is_weekend', 'day_of_month', 'week_of_month', 'month_of_year', 'is_local']
+# Same value in every row of a dataset
+CONSTANT_COLUMNS = ['total_history_days', 'client_id', 'updated_at']
+
+def compact_schema(df):
+    """
+    Shrink the engineered frame in memory without changing any value, so the
+    exports stay identical: repeated strings become categoricals, the calendar
+    fields int8, and each constant column a one-category categorical (the value
+    is stored once, one byte of code per row). The constants are also kept in
+    df.attrs['constants'].
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    for col in INT8_COLUMNS:
+        if col in df.columns and df[col].notna().all():
+            df[col] = df[col].astype(np.int8)
+
+    constants = {}
+    for col in CONSTANT_COLUMNS:
+        if col in df.columns and len(df) and df[col].nunique(dropna=False) == 1:
+            value = df[col].iloc[0]
+            constants[col] = value.item() if hasattr(value, 'item') else value
+            df[col] = df[col].astype('category')
+    df.attrs['constants'] = constants
+    return df
+
+def engineer_features(df, compact=None, client_id=None):
+    """
+    Apply all feature engineering steps.
+    With compact=True (default HISTORY_COMPACT_SCHEMA) the result uses compact_schema().
+    Pass the previous run's `client_id` so a rebuild keeps the same visit ids.
+    """
+    df = add_date_time_features(df)
+    df = add_gap_features(df)
+    df = add_navigation_features(df)
+    df = add_additional_features(df, client_id=client_id)
+    df = finalize_columns(df)
+    if COMPACT_SCHEMA if compact is None else compact:
+        df = compact_schema(df)
+    return df
+
+def _boundary_rows(existing_df, new_df, key):
+    """
+    Mask of the existing rows (sorted by time, visit_id) whose `key` gap the new
+    rows can change: the last row of each group that received new visits, or
+    every row of a group whose earliest new visit sorts before its last one.
+    """
+    last = ~existing_df.duplicated(key, keep='last')
+    tails = existing_df.loc[last & existing_df[key].isin(new_df[key]), [key, 'time', 'visit_id']]
+    first_new = (new_df[[key, 'time', 'visit_id']].dropna(subset=[key])
+                 .sort_values(['time', 'visit_id'], kind='stable').drop_duplicates(key))
+    pairs = tails.merge(first_new, on=key, suffixes=('', '_new'))
+    late = (pairs['time_new'] < pairs['time']) | (
+        (pairs['time_new'] == pairs['time']) & (pairs['visit_id_new'] < pairs['visit_id']))
+    return pd.Series(existing_df.index.isin(tails.index), index=existing_df.index) | \
+        existing_df[key].isin(pairs.loc[late, key])
+
+def merge_new_visits(existing_df, new_df, return_touched=False):
+    """
+    Merge newly read (cleaned) visits into an already engineered dataset.
+    Only the new rows go through feature engineering. The previous last visit of
+    every group touched by the new rows is re-run together with them, so its
+    seconds-until-next-visit stops reading -1 and points at the first new visit;
+    a group that gets visits older than its last one is re-run in full.
+    With return_touched=True, also returns the visit_ids of the new and patched rows.
+    """
+    existing_df = existing_df.copy()
+    existing_df['time'] = pd.to_datetime(existing_df['time'])
+    existing_df = existing_df.sort_values(['time', 'visit_id'], kind='stable').reset_index(drop=True)
+    client_id = existing_df['client_id'].iloc[0] if len(existing_df) else None
+
+    new_df = add_date_time_features(new_df).reset_index(drop=True)
+
+    # Last existing visit per group, for groups that received new visits; groups
+    # whose new visits go before existing ones (e.g. a profile read for the first
+    # time) are recomputed in full
+    tails = {key: _boundary_rows(existing_df, new_df, key) for key in GAP_KEYS}
+    boundary_mask = pd.concat(tails.values(), axis=1).any(axis=1)
+
+    # Run the gap step on just the boundary rows plus the new rows;
+    # negative row ids mark the new rows
+    inputs = ['time', 'visit_id'] + GAP_KEYS
+    boundary = existing_df.loc[boundary_mask, inputs]
+    boundary['_row'] = boundary.index
+    new_inputs = new_df[inputs].copy()
+    new_inputs['_row'] = -1 - new_df.index
+    combined = add_gap_features(pd.concat([boundary, new_inputs], ignore_index=True)).set_index('_row')
+
+    # Patch the boundary rows, only for the keys they were the tail of
+    patched = existing_df.loc[boundary_mask, 'visit_id']
+    for key in GAP_KEYS:
+        column = gap_column(key)
+        rows = existing_df.index[tails[key]]
+        existing_df.loc[rows, column] = combined.loc[rows, column]
+        new_df[column] = combined.loc[-1 - new_df.index, column].to_numpy()
+
+    # Sessions and chains continue from the existing visits; datasets exported
+    # before these columns existed get them computed first
+    if len(existing_df) and ('session_id' not in existing_df.columns or existing_df['session_id'].isna().any()):
+        existing_df = add_navigation_features(existing_df)
+    new_df = add_navigation_features(new_df, context=existing_df)
+
+    new_df = add_additional_features(new_df, client_id=client_id)
+    new_df = finalize_columns(new_df)
+
+    df = pd.concat([finalize_columns(existing_df), new_df], ignore_index=True)
+    df = df.sort_values(['time', 'visit_id'], kind='stable').reset_index(drop=True)
+
+    # History span depends on the whole dataset
+    total_days = (df['time'].max() - df['time'].min()).days if len(df) else 0
+    df['total_history_days'] = total_days
 
+    df = finalize_columns(df)
+    if COMPACT_SCHEMA:
+        df = compact_schema(df)
+    if return_touched:
+        return df, pd.concat([patched, new_df['visit_id']], ignore_index=True)
     return df
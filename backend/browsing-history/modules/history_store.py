@@ -0,0 +1,188 @@
+import os
+import json
+import shutil
+import pandas as pd
+
+from modules.exporter import PARQUET_COMPRESSION, to_arrow_table, export_chunks, arrow_types
+from modules.feature_engineering import REQUIRED_COLUMNS
+
+STORE_DIR_NAME = 'store'
+META_FILE = '_meta.json'
+
+# Partition granularity for new stores: 'day' or 'month'
+PARTITION_BY = os.getenv('HISTORY_PARTITION_BY', 'month')
+
+_KEY_FORMATS = {'day': '%Y-%m-%d', 'month': '%Y-%m'}
+
+def store_dir(output_dir='output'):
+    """
+    Directory holding the partition files and their metadata.
+    """
+    return os.path.join(output_dir, STORE_DIR_NAME)
+
+def _load_meta(directory):
+    path = os.path.join(directory, META_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def _save_meta(directory, meta):
+    path = os.path.join(directory, META_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def _partition_bounds(key, granularity):
+    """
+    Time range [start, end) covered by a partition key.
+    """
+    start = pd.Timestamp(key)
+    end = start + (pd.DateOffset(days=1) if granularity == 'day' else pd.DateOffset(months=1))
+    return start, end
+
+def _write_partition(path, df):
+    import pyarrow.parquet as pq
+    pq.write_table(to_arrow_table(df), path + '.tmp', compression=PARQUET_COMPRESSION)
+    os.replace(path + '.tmp', path)
+
+def _read_partition(path):
+    df = pd.read_parquet(path)
+    df['time'] = pd.to_datetime(df['time'])
+    return df
+
+def upsert_visits(df, output_dir='output', rebuild=False):
+    """
+    Write visits into the date-partitioned store, one Parquet file per day or
+    month of the 'time' column. Rows are matched on visit_id, so re-sent rows
+    (e.g. a previous tail whose gap feature changed) replace their old version.
+    Only partitions that receive rows are rewritten, merged into a single
+    compacted file. With rebuild=True the store is cleared first.
+    Returns the list of touched partition keys.
+    """
+    directory = store_dir(output_dir)
+    meta = None if rebuild else _load_meta(directory)
+    if rebuild and os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+    if meta is None:
+        meta = {'granularity': PARTITION_BY, 'partitions': {}}
+    granularity = meta['granularity']
+
+    df = df.copy()
+    df['time'] = pd.to_datetime(df['time'])
+    keys = df['time'].dt.strftime(_KEY_FORMATS[granularity])
+
+    touched = []
+    for key, part in df.groupby(keys, sort=True):
+        path = os.path.join(directory, f'{key}.parquet')
+        if os.path.exists(path):
+            part = pd.concat([_read_partition(path), part], ignore_index=True)
+            part = part.drop_duplicates('visit_id', keep='last')
+        part = part.sort_values(['time', 'visit_id'], kind='stable').reset_index(drop=True)
+        _write_partition(path, part)
+        meta['partitions'][key] = {
+            'rows': len(part),
+            'min_time': part['time'].min().isoformat(),
+            'max_time': part['time'].max().isoformat(),
+        }
+        touched.append(key)
+
+    _save_meta(directory, meta)
+    return touched
+
+def list_partitions(output_dir='output', start=None, end=None):
+    """
+    Partition keys, oldest first, whose time range overlaps [start, end].
+    """
+    meta = _load_meta(store_dir(output_dir))
+    if meta is None:
+        return []
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    keys = []
+    for key in sorted(meta['partitions']):
+        part_start, part_end = _partition_bounds(key, meta['granularity'])
+        if start is not None and part_end <= start:
+            continue
+        if end is not None and part_start > end:
+            continue
+        keys.append(key)
+    return keys
+
+def iter_partitions(output_dir='output', start=None, end=None):
+    """
+    Yield the visits of each partition overlapping [start, end], oldest first,
+    filtered to that range.
+    """
+    directory = store_dir(output_dir)
+    meta = _load_meta(directory)
+    for key in list_partitions(output_dir, start, end):
+        df = _read_partition(os.path.join(directory, f'{key}.parquet'))
+        if start is not None:
+            df = df[df['time'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['time'] <= pd.Timestamp(end)]
+        # History span is a dataset-wide value; take it from the whole store
+        df['total_history_days'] = _total_history_days(meta)
+        yield df.reset_index(drop=True)
+
+def _empty_frame(directory, meta):
+    """
+    A frame with no rows and the store's columns and dtypes: those of a
+    partition file, or the exported columns if the store has no partitions.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    keys = sorted(meta['partitions'])
+    if keys:
+        schema = pq.read_schema(os.path.join(directory, f'{keys[0]}.parquet'))
+    else:
+        types = arrow_types()
+        schema = pa.schema([pa.field(col, types[col]) for col in REQUIRED_COLUMNS])
+    df = schema.empty_table().to_pandas()
+    df['time'] = pd.to_datetime(df['time'])
+    return df
+
+def read_history_range(output_dir='output', start=None, end=None):
+    """
+    Load the visits with start <= time <= end, reading only the partitions that
+    overlap the range. Returns None if there is no store yet, and an empty
+    frame with the store's columns if a range matches no visits.
+    """
+    directory = store_dir(output_dir)
+    meta = _load_meta(directory)
+    if meta is None:
+        return None
+    parts = list(iter_partitions(output_dir, start, end))
+    if not parts:
+        return None if start is None and end is None else _empty_frame(directory, meta)
+    return pd.concat(parts, ignore_index=True)
+
+def _total_history_days(meta):
+    partitions = meta['partitions'].values()
+    if not partitions:
+        return 0
+    min_time = min(pd.Timestamp(p['min_time']) for p in partitions)
+    max_time = max(pd.Timestamp(p['max_time']) for p in partitions)
+    return (max_time - min_time).days
+
+def store_mtime(output_dir='output'):
+    """
+    Last modification time of the store, or None if there is none.
+    """
+    path = os.path.join(store_dir(output_dir), META_FILE)
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def materialize_csv(output_dir='output'):
+    """
+    Write output/history.csv from the store if it is missing or older than the
+    store. Streams one partition at a time. Returns the CSV path.
+    """
+    path = os.path.join(output_dir, 'history.csv')
+    mtime = store_mtime(output_dir)
+    if mtime is not None and (not os.path.exists(path) or os.path.getmtime(path) < mtime):
+        print("Materializing history.csv from the partitioned store...")
+        export_chunks(iter_partitions(output_dir), output_dir, ['csv'])
+    return path
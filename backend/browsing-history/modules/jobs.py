@@ -0,0 +1,121 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict
+
+# Finished jobs remembered for the status/result endpoints
+JOB_HISTORY_SIZE = int(os.getenv('HISTORY_JOB_HISTORY', '50'))
+
+class Job:
+    """
+    One background run of a pipeline function.
+    status goes pending -> running -> done | failed.
+    """
+    def __init__(self, key, source_mtime=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.source_mtime = source_mtime
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """
+        Block until the job has finished; returns False on timeout.
+        """
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'kind': self.key,
+            'status': self.status,
+            'error': self.error,
+            'submitted_at': self.submitted_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+class JobRunner:
+    """
+    Runs pipeline functions on background threads.
+
+    Submissions are coalesced per key: while a job for a key is pending or
+    running, further submissions get that same job (single-flight). The last
+    successful job of a key is reused as long as the source database's mtime
+    hasn't changed since it was submitted. Runs are serialized with one lock,
+    so different pipelines never write the output directory at the same time.
+    """
+    def __init__(self, history_size=JOB_HISTORY_SIZE):
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self._latest = {}
+
+    def submit(self, key, func, source_mtime=None, force=False):
+        """
+        Run func() in the background under `key`, unless an in-flight job or an
+        up-to-date cached result for that key exists.
+        Returns (job, started) where started tells whether a new run began.
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                return job, False
+            cached = self._latest.get(key)
+            if (not force and cached is not None and source_mtime is not None
+                    and cached.source_mtime == source_mtime):
+                return cached, False
+
+            job = Job(key, source_mtime)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._prune()
+
+        threading.Thread(target=self._run, args=(job, func), daemon=True).start()
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, func):
+        with self._run_lock:
+            job.status = 'running'
+            job.started_at = time.time()
+            try:
+                result = func()
+                error = None if result is not None else 'Pipeline failed, see the service log'
+            except Exception as e:
+                result, error = None, str(e)
+
+        with self._lock:
+            job.result = result
+            job.error = error
+            job.status = 'failed' if error else 'done'
+            job.finished_at = time.time()
+            if error is None:
+                self._latest[job.key] = job
+            self._inflight.pop(job.key, None)
+        job._done.set()
+
+    def _prune(self):
+        """
+        Forget the oldest finished jobs beyond history_size, keeping in-flight
+        and cached ones.
+        """
+        keep = {id(j) for j in self._inflight.values()} | {id(j) for j in self._latest.values()}
+        excess = len(self._jobs) - self.history_size
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if id(self._jobs[job_id]) not in keep:
+                del self._jobs[job_id]
+                excess -= 1
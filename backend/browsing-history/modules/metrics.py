@@ -0,0 +1,224 @@
+import os
+import sys
+import json
+import time
+import uuid
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Opt-in: trace Python allocations per stage (slows the pipeline down noticeably)
+TRACE_MEMORY = os.getenv('HISTORY_TRACE_MEMORY', '').lower() in ('1', 'true', 'yes')
+# Opt-in: dump a cProfile of every run to output/metrics/profiles/<run_id>.prof
+PROFILE_RUNS = os.getenv('HISTORY_PROFILE', '').lower() in ('1', 'true', 'yes')
+
+METRICS_DIR_NAME = 'metrics'
+RUN_LOG_FILE = 'runs.ndjson'
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far (its lifetime high-water
+    mark, never lower than in earlier runs), or None where unavailable.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class Stage:
+    """
+    Measurements of one pipeline stage. Set rows_in / rows_out inside the
+    `with run.stage(...)` block.
+    peak_rss_growth_bytes is how far the stage raised the process's peak RSS:
+    0 when it stayed below a peak reached earlier, so it only shows stages that
+    set a new high. traced_peak_bytes (with tracing on) is the stage's own
+    peak of Python allocations above what was allocated when it started.
+    """
+    def __init__(self, name, rows_in=None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.seconds = None
+        self.peak_rss_growth_bytes = None
+        self.traced_peak_bytes = None
+
+    def to_dict(self):
+        return {
+            'stage': self.name,
+            'seconds': self.seconds,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'peak_rss_growth_bytes': self.peak_rss_growth_bytes,
+            'traced_peak_bytes': self.traced_peak_bytes,
+        }
+
+class PipelineRun:
+    """
+    Per-stage wall time, row counts and memory of one pipeline run.
+    """
+    def __init__(self, pipeline):
+        self.run_id = uuid.uuid4().hex
+        self.pipeline = pipeline
+        self.status = 'ok'
+        self.started_at = datetime.now().isoformat()
+        self.seconds = None
+        self.rows = None  # rows produced by the run, set by the caller
+        self.stages = []
+        self.profile_path = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        stage = Stage(name, rows_in)
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            traced_before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        rss_before = peak_rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds = time.perf_counter() - start
+            if rss_before is not None:
+                stage.peak_rss_growth_bytes = peak_rss_bytes() - rss_before
+            if tracing:
+                stage.traced_peak_bytes = tracemalloc.get_traced_memory()[1] - traced_before
+            self.stages.append(stage)
+
+    def to_dict(self):
+        return {
+            'run_id': self.run_id,
+            'pipeline': self.pipeline,
+            'status': self.status,
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'rows': self.rows,
+            'process_peak_rss_bytes': peak_rss_bytes(),
+            'profile': self.profile_path,
+            'stages': [stage.to_dict() for stage in self.stages],
+        }
+
+# Aggregates over all runs in this process, rendered by render_prometheus()
+_lock = threading.Lock()
+_runs = {}     # (pipeline, status) -> count
+_stages = {}   # (pipeline, stage) -> running totals and last values
+_last_runs = {}
+
+def _record(run):
+    with _lock:
+        key = (run.pipeline, run.status)
+        _runs[key] = _runs.get(key, 0) + 1
+        _last_runs[run.pipeline] = run
+        for stage in run.stages:
+            totals = _stages.setdefault((run.pipeline, stage.name), {
+                'count': 0, 'seconds': 0.0, 'rows_in': 0, 'rows_out': 0,
+            })
+            totals['count'] += 1
+            totals['seconds'] += stage.seconds
+            totals['rows_in'] += stage.rows_in or 0
+            totals['rows_out'] += stage.rows_out or 0
+            totals['last'] = stage
+
+def _append_log(run, output_dir):
+    directory = os.path.join(output_dir, METRICS_DIR_NAME)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, RUN_LOG_FILE), 'a') as f:
+        f.write(json.dumps(run.to_dict()) + '\n')
+
+@contextmanager
+def pipeline_run(pipeline, output_dir='output', profile=None, trace_memory=None):
+    """
+    Instrument one pipeline run; use run.stage(name) around each step.
+    On exit the run is added to the /metrics aggregates and appended as one
+    JSON line to output/metrics/runs.ndjson. With profile=True (default
+    HISTORY_PROFILE) the whole run is also profiled to a .prof file.
+    """
+    profile = PROFILE_RUNS if profile is None else profile
+    trace_memory = TRACE_MEMORY if trace_memory is None else trace_memory
+    run = PipelineRun(pipeline)
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    profiler = cProfile.Profile() if profile else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield run
+    except BaseException:
+        run.status = 'failed'
+        raise
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile_dir = os.path.join(output_dir, METRICS_DIR_NAME, 'profiles')
+            os.makedirs(profile_dir, exist_ok=True)
+            run.profile_path = os.path.join(profile_dir, f'{run.run_id}.prof')
+            profiler.dump_stats(run.profile_path)
+        if started_tracing:
+            tracemalloc.stop()
+        run.seconds = time.perf_counter() - run._start
+        _record(run)
+        try:
+            _append_log(run, output_dir)
+        except OSError as e:
+            print(f"Could not write the run log: {e}")
+        print("Stage timings: " + ", ".join(f"{s.name}={s.seconds:.3f}s" for s in run.stages))
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+def render_prometheus():
+    """
+    All recorded metrics in the Prometheus text exposition format.
+    """
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in samples:
+            if value is not None:
+                lines.append(f'{name}{_labels(**labels)} {value}')
+
+    with _lock:
+        runs = sorted(_runs.items())
+        stages = sorted(_stages.items())
+        last_runs = sorted(_last_runs.items())
+
+    metric('history_pipeline_runs_total', 'counter', 'Pipeline runs by outcome.',
+           [({'pipeline': p, 'status': s}, n) for (p, s), n in runs])
+    metric('history_pipeline_last_run_seconds', 'gauge', 'Wall time of the last run.',
+           [({'pipeline': p}, run.seconds) for p, run in last_runs])
+    metric('history_pipeline_last_run_rows', 'gauge', 'Rows produced by the last run.',
+           [({'pipeline': p}, run.rows) for p, run in last_runs])
+    metric('history_stage_runs_total', 'counter', 'Times each stage ran.',
+           [({'pipeline': p, 'stage': s}, t['count']) for (p, s), t in stages])
+    metric('history_stage_seconds_total', 'counter', 'Wall time spent in each stage.',
+           [({'pipeline': p, 'stage': s}, t['seconds']) for (p, s), t in stages])
+    metric('history_stage_rows_in_total', 'counter', 'Rows passed into each stage.',
+           [({'pipeline': p, 'stage': s}, t['rows_in']) for (p, s), t in stages])
+    metric('history_stage_rows_out_total', 'counter', 'Rows produced by each stage.',
+           [({'pipeline': p, 'stage': s}, t['rows_out']) for (p, s), t in stages])
+    metric('history_stage_last_seconds', 'gauge', 'Wall time of the stage in the last run.',
+           [({'pipeline': p, 'stage': s}, t['last'].seconds) for (p, s), t in stages])
+    metric('history_stage_last_traced_peak_bytes', 'gauge',
+           'Peak traced Python allocations during the stage in the last run (HISTORY_TRACE_MEMORY=1).',
+           [({'pipeline': p, 'stage': s}, t['last'].traced_peak_bytes) for (p, s), t in stages])
+    metric('history_stage_last_peak_rss_growth_bytes', 'gauge',
+           'How far the stage raised the process peak RSS in the last run (0 if below an earlier peak).',
+           [({'pipeline': p, 'stage': s}, t['last'].peak_rss_growth_bytes) for (p, s), t in stages])
+    metric('history_process_peak_rss_bytes', 'gauge', 'Lifetime peak resident set size of the service.',
+           [({}, peak_rss_bytes())])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,186 @@
+import os
+import numpy as np
+import pandas as pd
+
+# ui::PageTransition core types (the low byte of visits.transition), by value
+TRANSITION_CORE_TYPES = [
+    'LINK', 'TYPED', 'AUTO_BOOKMARK', 'AUTO_SUBFRAME', 'MANUAL_SUBFRAME', 'GENERATED',
+    'AUTO_TOPLEVEL', 'FORM_SUBMIT', 'RELOAD', 'KEYWORD', 'KEYWORD_GENERATED',
+]
+CORE_MASK = 0xFF
+
+# Qualifier bits
+BLOCKED = 0x00800000
+FORWARD_BACK = 0x01000000
+FROM_ADDRESS_BAR = 0x02000000
+HOME_PAGE = 0x04000000
+FROM_API = 0x08000000
+CHAIN_START = 0x10000000
+CHAIN_END = 0x20000000
+CLIENT_REDIRECT = 0x40000000
+SERVER_REDIRECT = 0x80000000
+
+# Idle time that starts a new browsing session
+SESSION_GAP_SECONDS = int(os.getenv('HISTORY_SESSION_GAP_SECONDS', '1800'))
+
+# Use a dense visit_id -> row array when the id range is at most this many times the row count
+DENSE_INDEX_FACTOR = 4
+
+# int64 view of NaT
+NAT = np.iinfo('int64').min
+
+_CORE_NAMES = np.array(TRANSITION_CORE_TYPES + ['UNKNOWN'], dtype=object)
+
+def decode_transitions(transitions):
+    """
+    Split Chrome transition values into the core type and qualifier flags.
+    Returns a dict of arrays: core (int), page_transition (core type name),
+    and booleans forward_back, from_address_bar, chain_start, chain_end, redirect.
+    """
+    # Older profiles store the value as a signed 32-bit int
+    t = np.asarray(transitions, dtype=np.int64) & 0xFFFFFFFF
+    core = t & CORE_MASK
+    return {
+        'core': core,
+        'page_transition': _CORE_NAMES[np.minimum(core, len(TRANSITION_CORE_TYPES))],
+        'forward_back': (t & FORWARD_BACK) != 0,
+        'from_address_bar': (t & FROM_ADDRESS_BAR) != 0,
+        'chain_start': (t & CHAIN_START) != 0,
+        'chain_end': (t & CHAIN_END) != 0,
+        'redirect': (t & (CLIENT_REDIRECT | SERVER_REDIRECT)) != 0,
+    }
+
+def transition_names(transitions):
+    """
+    Core type name ('LINK', 'TYPED', ...) of each transition value.
+    """
+    return decode_transitions(transitions)['page_transition']
+
+def lookup_rows(visit_ids, keys):
+    """
+    Row of each key in visit_ids, or -1 if absent (keys <= 0 never match).
+    Uses a dense visit_id -> row array when the ids are compact, which is the
+    usual case for one profile; otherwise a sorted index with binary search.
+    """
+    visit_ids = np.asarray(visit_ids, dtype=np.int64)
+    keys = np.asarray(keys, dtype=np.int64)
+    rows = np.full(len(keys), -1, dtype=np.int64)
+    if len(visit_ids) == 0:
+        return rows
+    low, high = visit_ids.min(), visit_ids.max()
+    valid = (keys > 0) & (keys >= low) & (keys <= high)
+
+    if high - low < DENSE_INDEX_FACTOR * len(visit_ids) + 1024:
+        index = np.full(high - low + 1, -1, dtype=np.int64)
+        index[visit_ids - low] = np.arange(len(visit_ids))
+        rows[valid] = index[keys[valid] - low]
+    else:
+        order = np.argsort(visit_ids, kind='stable')
+        sorted_ids = visit_ids[order]
+        pos = np.searchsorted(sorted_ids, keys[valid])
+        pos = np.minimum(pos, len(sorted_ids) - 1)
+        found = sorted_ids[pos] == keys[valid]
+        rows[np.flatnonzero(valid)[found]] = order[pos[found]]
+    return rows
+
+def chain_roots(parent, max_rounds=64):
+    """
+    Root row and depth of every row in the forest given by `parent` (-1 = root),
+    by pointer doubling: O(n log depth) array operations, no per-row Python.
+    """
+    n = len(parent)
+    rows = np.arange(n)
+    has_parent = (parent >= 0) & (parent != rows)
+    top = np.where(has_parent, parent, rows)
+    depth = has_parent.astype(np.int64)
+    for _ in range(max_rounds):
+        next_top = top[top]
+        if np.array_equal(next_top, top):
+            break
+        depth = depth + depth[top]
+        top = next_top
+    return top, depth
+
+def navigation_arrays(visit_ids, from_visits, times_ns, profile_codes, gap_seconds=SESSION_GAP_SECONDS):
+    """
+    Parent row, chain root, chain depth and session of each visit.
+    Within a profile, in time order, a visit starts a new session when more
+    than `gap_seconds` passed since the previous visit and it was not reached
+    from a visit in the data (a link followed from a tab left open stays in the
+    current session). session_start is the row that started each row's session
+    and order the rows' (profile, time, visit_id) order.
+    """
+    visit_ids = np.asarray(visit_ids, dtype=np.int64)
+    profile_codes = np.asarray(profile_codes)
+    n = len(visit_ids)
+    parent = lookup_rows(visit_ids, from_visits)
+    root, depth = chain_roots(parent)
+
+    # (profile, time, visit_id) order; NaT sorts first, and always starts a session
+    times = np.asarray(times_ns, dtype=np.int64)
+    order = np.lexsort((visit_ids, times, profile_codes))
+    sorted_times = times[order]
+    new_session = np.ones(n, dtype=bool)
+    if n > 1:
+        same_profile = profile_codes[order][1:] == profile_codes[order][:-1]
+        has_time = (sorted_times[1:] != NAT) & (sorted_times[:-1] != NAT)
+        idle = sorted_times[1:] - sorted_times[:-1] > gap_seconds * 1_000_000_000
+        linked = parent[order][1:] >= 0
+        new_session[1:] = ~same_profile | ~has_time | (idle & ~linked)
+    start = np.maximum.accumulate(np.where(new_session, np.arange(n), 0))
+    session_start = np.empty(n, dtype=np.int64)
+    session_start[order] = order[start]
+
+    return {
+        'parent': parent,
+        'root': root,
+        'chain_depth': depth,
+        'session_start': session_start,
+        'session_id': visit_ids[session_start],
+        'order': order,
+    }
+
+def add_navigation_features(df, context=None, gap_seconds=SESSION_GAP_SECONDS):
+    """
+    Add session_id (visit_id of the session's first visit) and chain_depth
+    (number of from_visit hops to the start of the navigation chain).
+    `context` holds earlier visits whose sessions and chains the new rows may
+    continue, e.g. the existing dataset in an incremental run; it is only read.
+    Its session_id / chain_depth, when present, are carried over, so a context
+    that covers the last visit per profile and the parents gives exact results;
+    it need not hold the visits in between.
+    """
+    columns = [c for c in ['visit_id', 'from_visit', 'time', 'profile'] if c in df.columns]
+    rows = df[columns]
+    skip = 0
+    if context is not None and len(context):
+        rows = pd.concat([context[[c for c in columns if c in context.columns]], rows], ignore_index=True)
+        skip = len(context)
+
+    times = rows['time'].to_numpy(dtype='datetime64[ns]').view('int64')
+    profiles = rows['profile'] if 'profile' in rows.columns else pd.Series('', index=rows.index)
+    profile_codes = pd.factorize(profiles.astype(object).fillna(''))[0]
+    result = navigation_arrays(rows['visit_id'].to_numpy(np.int64), rows['from_visit'].fillna(0).to_numpy(np.int64),
+                               times, profile_codes, gap_seconds)
+
+    session_id = result['session_id'][skip:]
+    chain_depth = result['chain_depth'][skip:]
+    if skip and 'session_id' in context.columns and 'chain_depth' in context.columns:
+        known_session = context['session_id'].to_numpy()
+        known_depth = context['chain_depth'].to_numpy()
+        start, root = result['session_start'][skip:], result['root'][skip:]
+        # A session continued from the context is that of the profile's latest
+        # context row, which precedes the new rows in (profile, time) order
+        order = result['order']
+        latest = np.maximum.accumulate(np.where(order < skip, np.arange(len(order)), 0))
+        previous = np.empty(len(order), dtype=np.int64)
+        previous[order] = order[latest]
+        previous = previous[skip:]
+        in_context = (start < skip) & (previous < skip) & pd.notna(known_session[np.minimum(previous, skip - 1)])
+        session_id = np.where(in_context, known_session[np.minimum(previous, skip - 1)], session_id)
+        root_in_context = (root < skip) & pd.notna(known_depth[np.minimum(root, skip - 1)])
+        chain_depth = np.where(root_in_context, chain_depth + known_depth[np.minimum(root, skip - 1)], chain_depth)
+
+    df['session_id'] = np.asarray(session_id, dtype=np.int64)
+    df['chain_depth'] = np.asarray(chain_depth, dtype=np.int64)
+    return df
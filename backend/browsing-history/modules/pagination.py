@@ -0,0 +1,124 @@
+import base64
+import pandas as pd
+
+# Rows serialized per yield in the NDJSON response
+NDJSON_BATCH_ROWS = 5_000
+
+class PageError(ValueError):
+    """
+    Raised for malformed paging parameters (bad timestamp, cursor, field, ...).
+    """
+
+def encode_cursor(time, visit_id):
+    """
+    Opaque cursor for the keyset position (time, visit_id).
+    """
+    raw = f"{pd.Timestamp(time).value}:{int(visit_id)}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Inverse of encode_cursor(); returns (time_ns, visit_id).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        time_ns, visit_id = raw.split(':')
+        return int(time_ns), int(visit_id)
+    except (ValueError, UnicodeDecodeError):
+        raise PageError(f"Invalid cursor: {cursor!r}")
+
+def _parse_time(value, name):
+    """
+    Parse a since/until value. The visit times are naive UTC, so timestamps
+    with an offset or 'Z' are converted to UTC and made naive.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        ts = pd.Timestamp(value)
+    except ValueError:
+        raise PageError(f"Invalid '{name}' timestamp: {value!r}")
+    if ts is pd.NaT:
+        raise PageError(f"Invalid '{name}' timestamp: {value!r}")
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return ts
+
+def parse_page_args(args):
+    """
+    Read the paging parameters from a request's query string:
+    since / until (ISO timestamps, inclusive), limit, cursor, order (asc|desc)
+    and fields (comma-separated column names).
+    """
+    limit = args.get('limit')
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PageError(f"Invalid limit: {limit!r}")
+        if limit < 0:
+            raise PageError("limit must be >= 0")
+
+    order = args.get('order', 'asc').lower()
+    if order not in ('asc', 'desc'):
+        raise PageError("order must be 'asc' or 'desc'")
+
+    fields = args.get('fields')
+    fields = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+
+    return {
+        'since': _parse_time(args.get('since'), 'since'),
+        'until': _parse_time(args.get('until'), 'until'),
+        'limit': limit,
+        'cursor': args.get('cursor') or None,
+        'order': order,
+        'fields': fields,
+    }
+
+def paginate_history(df, since=None, until=None, limit=None, cursor=None, order='asc', fields=None):
+    """
+    Select one page of visits, ordered by (time, visit_id).
+    Rows are filtered to since <= time <= until, then continue after the cursor
+    position (the next_cursor of the previous page). Only the requested fields
+    are kept. Returns (page, next_cursor), where next_cursor is None on the last page.
+    """
+    if fields:
+        unknown = [f for f in fields if f not in df.columns]
+        if unknown:
+            raise PageError(f"Unknown fields: {unknown}")
+
+    times = pd.to_datetime(df['time']).astype('datetime64[ns]')
+    mask = pd.Series(True, index=df.index)
+    if since is not None:
+        mask &= times >= since
+    if until is not None:
+        mask &= times <= until
+    if cursor is not None:
+        cursor_ns, cursor_id = decode_cursor(cursor)
+        time_ns = times.astype('int64')
+        if order == 'asc':
+            mask &= (time_ns > cursor_ns) | ((time_ns == cursor_ns) & (df['visit_id'] > cursor_id))
+        else:
+            mask &= (time_ns < cursor_ns) | ((time_ns == cursor_ns) & (df['visit_id'] < cursor_id))
+
+    page = df[mask.to_numpy()]
+    page = page.sort_values(['time', 'visit_id'], ascending=order == 'asc', kind='stable')
+
+    next_cursor = None
+    if limit is not None and len(page) > limit:
+        page = page.iloc[:limit]
+        if limit > 0:
+            last = page.iloc[-1]
+            next_cursor = encode_cursor(last['time'], last['visit_id'])
+
+    if fields:
+        page = page[fields]
+    return page.reset_index(drop=True), next_cursor
+
+def iter_ndjson(df, batch_rows=NDJSON_BATCH_ROWS):
+    """
+    Yield the rows as newline-delimited JSON, a batch of rows at a time.
+    """
+    for start in range(0, len(df), batch_rows):
+        lines = df.iloc[start:start + batch_rows].to_json(orient='records', lines=True, date_format='iso')
+        yield lines if lines.endswith('\n') else lines + '\n'
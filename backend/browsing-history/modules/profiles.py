@@ -0,0 +1,120 @@
+import os
+import zlib
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.db_reader import open_history_snapshot, read_chrome_history
+from modules.data_cleaner import clean_data
+
+# Worker processes for multi-profile ingestion (default: one per profile, up to the CPU count)
+INGEST_WORKERS = int(os.getenv('HISTORY_INGEST_WORKERS', '0')) or None
+
+# The profile the single-profile pipeline always read; its visit ids are kept as-is
+PRIMARY_SOURCE = 'chrome/Default'
+
+# Visit ids of other profiles are moved into their own range, so ids stay unique
+# across profiles: offset = (22-bit hash of the profile name) << 40
+SOURCE_ID_SHIFT = 40
+SOURCE_SLOT_BITS = 22
+
+def source_id_offset(source):
+    """
+    Amount added to the visit ids of a profile ('browser/Profile').
+    Stable across runs, since it only depends on the profile's name.
+    """
+    if source == PRIMARY_SOURCE:
+        return 0
+    slot = zlib.crc32(source.encode('utf-8')) & ((1 << SOURCE_SLOT_BITS) - 1)
+    return (slot or 1) << SOURCE_ID_SHIFT
+
+def tag_source(df, source):
+    """
+    Add the profile column and move visit_id / from_visit into the profile's id range.
+    """
+    offset = source_id_offset(source)
+    df['profile'] = source
+    if offset:
+        df['visit_id'] = df['visit_id'] + offset
+        df['from_visit'] = df['from_visit'].where(df['from_visit'] == 0, df['from_visit'] + offset)
+    return df
+
+def _profiles(df):
+    """
+    The profile column, with rows from before it existed counted as PRIMARY_SOURCE.
+    """
+    if 'profile' not in df.columns:
+        return pd.Series(PRIMARY_SOURCE, index=df.index, dtype=object)
+    return df['profile'].astype(object).fillna(PRIMARY_SOURCE)
+
+def source_watermarks(existing_df):
+    """
+    Newest visit per profile of an already ingested dataset, as the watermark
+    dicts read_chrome_history() takes (with the profile's raw visit id).
+    """
+    if existing_df is None or existing_df.empty:
+        return {}
+    newest = (existing_df[['visit_time', 'visit_id']].assign(profile=_profiles(existing_df))
+              .sort_values(['visit_time', 'visit_id']).groupby('profile').tail(1))
+    return {
+        row.profile: {'visit_time': int(row.visit_time), 'visit_id': int(row.visit_id) - source_id_offset(row.profile)}
+        for row in newest.itertuples(index=False)
+    }
+
+def ingest_source(source, since=None):
+    """
+    Snapshot, read and clean one profile's History database.
+    Runs in a worker process; returns the cleaned DataFrame with its profile column.
+    """
+    with open_history_snapshot(path=source['path']) as conn:
+        history_list = read_chrome_history(conn, since=since)
+    print(f"Read {len(history_list)} visits from {source['source']}")
+    return tag_source(clean_data(history_list), source['source'])
+
+def drop_duplicate_visits(df, existing_df=None):
+    """
+    Drop visits that were already ingested from another profile: the same URL
+    at the same visit_time. The first profile in priority order (or the
+    existing dataset) wins; repeats within one profile are kept.
+    """
+    existing_profiles = set()
+    if existing_df is not None and len(existing_df):
+        existing_profiles = set(_profiles(existing_df).unique())
+    if len(set(df['profile'].unique()) | existing_profiles) <= 1:
+        return df  # a single profile never duplicates itself
+
+    first_profile = df.groupby(['url', 'visit_time'], sort=False)['profile'].transform('first')
+    keep = df['profile'] == first_profile
+    if existing_profiles:
+        existing_keys = pd.MultiIndex.from_frame(existing_df[['url', 'visit_time']])
+        keep &= ~pd.MultiIndex.from_frame(df[['url', 'visit_time']]).isin(existing_keys)
+    dropped = int((~keep).sum())
+    if dropped:
+        print(f"Dropped {dropped} visits already ingested from another profile")
+    return df[keep.to_numpy()].reset_index(drop=True)
+
+def ingest_sources(sources, since=None, max_workers=INGEST_WORKERS):
+    """
+    Ingest several profiles in parallel, one worker process per profile, and
+    merge them into one cleaned DataFrame. `since` maps source -> watermark.
+    Profiles that fail to open are skipped; raises if all of them fail.
+    """
+    since = since or {}
+    workers = min(len(sources), max_workers or os.cpu_count() or 1)
+    frames, errors = [], []
+    # spawn, not fork: the service calls this from a background thread
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(ingest_source, source, since.get(source['source'])) for source in sources]
+        # Collected in priority order, which drop_duplicate_visits relies on
+        for source, future in zip(sources, futures):
+            try:
+                frames.append(future.result())
+            except Exception as e:
+                print(f"Skipping {source['source']}: {e}")
+                errors.append(f"{source['source']}: {e}")
+    if not frames:
+        raise RuntimeError(f"Could not read any browser profile ({'; '.join(errors)})")
+    # Empty reads would turn the concatenated columns into object dtype
+    non_empty = [frame for frame in frames if len(frame)]
+    return pd.concat(non_empty or frames[:1], ignore_index=True)
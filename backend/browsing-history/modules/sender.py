@@ -1,16 +1,155 @@
-import requests
+import os
 import json
+import gzip
+import requests
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Upper bound on the uncompressed JSON size of one batch
+SEND_BATCH_BYTES = int(os.getenv('HISTORY_SEND_BATCH_BYTES', str(1024 * 1024)))
+# Batches in flight at once
+SEND_PARALLEL = int(os.getenv('HISTORY_SEND_PARALLEL', '4'))
+SEND_RETRIES = int(os.getenv('HISTORY_SEND_RETRIES', '3'))
+SEND_BACKOFF = float(os.getenv('HISTORY_SEND_BACKOFF', '0.5'))
+SEND_TIMEOUT = float(os.getenv('HISTORY_SEND_TIMEOUT', '30'))
+
+# Per-endpoint upload progress, kept next to the exports
+SEND_STATE_FILE = 'send_state.json'
+
+def make_session(parallel=SEND_PARALLEL, retries=SEND_RETRIES, backoff=SEND_BACKOFF):
+    """
+    requests.Session with a connection pool sized for `parallel` batches and
+    exponential-backoff retries on connection errors and 429/5xx responses.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['POST']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=parallel, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def make_batches(records, max_bytes=SEND_BATCH_BYTES, start=0):
+    """
+    Group records, from index `start` on, into JSON arrays of at most max_bytes
+    (a single larger record gets a batch of its own).
+    Yields (offset, count, body) with body the uncompressed JSON bytes.
+    """
+    batch, size, offset = [], 2, start
+    for record in records[start:]:
+        encoded = json.dumps(record, default=str).encode('utf-8')
+        if batch and size + len(encoded) + 1 > max_bytes:
+            yield offset, len(batch), b'[' + b','.join(batch) + b']'
+            offset += len(batch)
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        yield offset, len(batch), b'[' + b','.join(batch) + b']'
 
-def send_history_to_server(api_url, data):
+def load_send_offset(api_url, state_dir='output'):
+    """
+    Number of leading records already accepted by api_url, 0 if unknown.
     """
-    Send the history data to the server via POST request.
-    data should be a list of dicts (JSON serializable).
+    path = os.path.join(state_dir, SEND_STATE_FILE)
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        return json.load(f).get(api_url, 0)
+
+def save_send_offset(api_url, offset, state_dir='output'):
     """
-    try:
-        response = requests.post(api_url, json=data)
-        response.raise_for_status()  # Raise error for bad status codes
-        print(f"Successfully sent data to {api_url}")
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending data to server: {e}")
+    Record the resumable offset for api_url (atomic replace).
+    """
+    path = os.path.join(state_dir, SEND_STATE_FILE)
+    state = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+    state[api_url] = offset
+    os.makedirs(state_dir, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def _post_batch(session, api_url, offset, count, body, timeout):
+    response = session.post(
+        api_url,
+        data=gzip.compress(body),
+        headers={
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            # Lets the server recognize a batch it has already stored
+            'X-Batch-Offset': str(offset),
+            'X-Batch-Count': str(count),
+        },
+        timeout=timeout
+    )
+    response.raise_for_status()  # Raise error for bad status codes
+    return offset, count
+
+def send_history_to_server(api_url, data, state_dir='output', resume=True,
+                           batch_bytes=SEND_BATCH_BYTES, parallel=SEND_PARALLEL,
+                           retries=SEND_RETRIES, backoff=SEND_BACKOFF, timeout=SEND_TIMEOUT):
+    """
+    Send the history data to the server via POST requests.
+    data should be a list of dicts (JSON serializable) or a DataFrame, in a
+    stable order (new visits appended at the end).
+
+    The records are split into gzip-compressed batches of at most batch_bytes
+    of JSON, posted `parallel` at a time over one pooled session with retries.
+    The number of leading records the server has accepted is saved in
+    state_dir, so with resume=True a later call skips them.
+    Returns {'sent', 'batches', 'offset'}, or None if a batch failed.
+    """
+    if hasattr(data, 'to_dict'):
+        data = data.to_dict(orient='records')
+    offset = load_send_offset(api_url, state_dir) if resume else 0
+    if offset > len(data):
+        offset = 0  # the data was rebuilt; start over
+
+    session = make_session(parallel, retries, backoff)
+    done = {}          # batch offset -> record count, for batches accepted out of order
+    errors = []
+    sent = batches = 0
+
+    def collect(futures):
+        nonlocal sent, batches
+        for future in futures:
+            try:
+                batch_offset, count = future.result()
+            except requests.exceptions.RequestException as e:
+                errors.append(e)
+                continue
+            done[batch_offset] = count
+            sent += count
+            batches += 1
+
+    with session, ThreadPoolExecutor(max_workers=parallel) as pool:
+        pending = set()
+        for batch in make_batches(data, batch_bytes, start=offset):
+            if errors:
+                break
+            pending.add(pool.submit(_post_batch, session, api_url, *batch, timeout))
+            if len(pending) >= parallel:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+        collect(pending)
+
+    # Only advance past a contiguous run of accepted batches
+    acked = offset
+    while acked in done:
+        acked += done.pop(acked)
+    save_send_offset(api_url, acked, state_dir)
+
+    if errors:
+        print(f"Error sending data to server: {errors[0]} (resumable from record {acked})")
         return None
+    print(f"Successfully sent {sent} records in {batches} batches to {api_url}")
+    return {'sent': sent, 'batches': batches, 'offset': acked}
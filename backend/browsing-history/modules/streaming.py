@@ -0,0 +1,156 @@
+import os
+import uuid
+import heapq
+import tempfile
+import itertools
+from collections import deque
+import pandas as pd
+from datetime import datetime
+
+from modules.db_reader import iter_chrome_history
+from modules.data_cleaner import clean_data
+from modules.feature_engineering import (
+    add_date_time_features, add_streaming_gap_features, add_additional_features, finalize_columns
+)
+from modules.navigation import add_navigation_features
+from modules.exporter import export_chunks
+from modules.watermark import load_client_id, save_watermark
+from modules.history_store import upsert_visits
+from modules.profiles import PRIMARY_SOURCE, tag_source, source_id_offset
+
+# Processed visits kept to resolve the from_visit parents of later chunks;
+# a parent further back than this starts a new navigation chain
+STREAM_CONTEXT_VISITS = int(os.getenv('HISTORY_STREAM_CONTEXT_VISITS', '500000'))
+
+# Columns add_navigation_features() reads from its context
+NAVIGATION_COLUMNS = ['visit_id', 'from_visit', 'time', 'profile', 'session_id', 'chain_depth']
+
+def navigation_context(history, latest, chunk):
+    """
+    Context for add_navigation_features() on the next oldest-first chunk: the
+    parents its rows link to, out of `history` (navigation columns of the
+    processed chunks), plus `latest`, the newest processed visit of each profile.
+    """
+    from_visit = chunk['from_visit'].fillna(0)
+    wanted = from_visit[(from_visit > 0) & ~from_visit.isin(chunk['visit_id'])].unique()
+    parents = [frame[frame['visit_id'].isin(wanted)] for frame in history] if len(wanted) else []
+    frames = [frame for frame in parents + [latest] if frame is not None and len(frame)]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True).drop_duplicates('visit_id')
+
+def iter_source_chunks(connections, chunk_size=50_000):
+    """
+    Cleaned chunks of the visits of one or more profiles, newest first.
+    `connections` is a list of (source, connection) pairs in priority order.
+    Several profiles are merged on (visit_time, visit_id), and a visit an earlier
+    profile already has (same URL at the same visit_time) is dropped, as
+    drop_duplicate_visits() does for the in-memory pipeline.
+    """
+    if len(connections) == 1:
+        source, conn = connections[0]
+        for raw_chunk in iter_chrome_history(conn, chunk_size=chunk_size):
+            yield tag_source(clean_data(raw_chunk), source)
+        return
+
+    def tagged_rows(priority, source, conn):
+        offset = source_id_offset(source)
+        for raw_chunk in iter_chrome_history(conn, chunk_size=chunk_size):
+            for row in raw_chunk:
+                row['visit_id'] += offset
+                if row['from_visit']:
+                    row['from_visit'] += offset
+                row['profile'] = source
+                yield priority, row
+
+    def first_profile_only(merged):
+        # Duplicates share a visit_time, so only one timestamp's rows are held at once
+        for _, group in itertools.groupby(merged, key=lambda item: item[1]['visit_time']):
+            group = list(group)
+            first = {}
+            for priority, row in group:
+                first[row['url']] = min(priority, first.get(row['url'], priority))
+            for priority, row in group:
+                if priority == first[row['url']]:
+                    yield row
+
+    merged = heapq.merge(
+        *(tagged_rows(i, source, conn) for i, (source, conn) in enumerate(connections)),
+        key=lambda item: (item[1]['visit_time'], item[1]['visit_id']), reverse=True,
+    )
+    rows = first_profile_only(merged)
+    while True:
+        raw_chunk = list(itertools.islice(rows, chunk_size))
+        if not raw_chunk:
+            break
+        yield clean_data(raw_chunk)
+
+def stream_history(conn, output_dir='output', chunk_size=50_000, source=PRIMARY_SOURCE):
+    """
+    Memory-bounded version of the read -> clean -> features -> export pipeline.
+
+    Pass 1 pulls chunks newest-first off the cursor, cleans them and adds the
+    row-local and gap features (the gap state carried between chunks is one
+    timestamp per distinct group), then spills each chunk to a temp directory.
+    Pass 2 fills in the dataset-wide fields, links each chunk's sessions and
+    navigation chains to the visits already processed (the newest visit of each
+    profile and, within STREAM_CONTEXT_VISITS, every parent), and appends the
+    spilled chunks to the partitioned store and the exporters oldest-first, so
+    the output matches the non-streaming pipeline.
+    `conn` is either one profile's connection, with `source` its 'browser/Profile',
+    or a list of (source, connection) pairs in priority order (see iter_source_chunks()).
+    Returns the number of rows exported.
+    """
+    connections = conn if isinstance(conn, list) else [(source, conn)]
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='history_chunks_') as spill_dir:
+        spills = []
+        carry = {}
+        newest = None
+        min_time = max_time = None
+
+        for chunk in iter_source_chunks(connections, chunk_size=chunk_size):
+            chunk = add_date_time_features(chunk)
+            chunk = add_streaming_gap_features(chunk, carry)
+
+            if newest is None:
+                newest = chunk.head(1)
+            chunk_min, chunk_max = chunk['time'].min(), chunk['time'].max()
+            min_time = chunk_min if min_time is None else min(min_time, chunk_min)
+            max_time = chunk_max if max_time is None else max(max_time, chunk_max)
+
+            path = os.path.join(spill_dir, f'chunk_{len(spills):06d}.pkl')
+            chunk.to_pickle(path)
+            spills.append(path)
+            print(f"Processed chunk {len(spills)} ({len(chunk)} visits)")
+
+        total_days = (max_time - min_time).days if newest is not None else 0
+        client_id = load_client_id(output_dir) or str(uuid.uuid4())
+        updated_at = datetime.now().isoformat()
+
+        def oldest_first():
+            history, kept, latest = deque(), 0, None
+            for i, path in enumerate(reversed(spills)):
+                chunk = pd.read_pickle(path).iloc[::-1].reset_index(drop=True)
+                chunk['total_history_days'] = total_days
+                chunk = add_navigation_features(chunk, context=navigation_context(history, latest, chunk))
+
+                # Bounded visit -> (session_id, chain_depth) state for the chunks still to come
+                processed = chunk[NAVIGATION_COLUMNS].copy()
+                history.append(processed)
+                kept += len(processed)
+                while kept - len(history[0]) >= STREAM_CONTEXT_VISITS:
+                    kept -= len(history.popleft())
+                newest_per_profile = processed.drop_duplicates('profile', keep='last')
+                latest = newest_per_profile if latest is None else pd.concat(
+                    [latest, newest_per_profile], ignore_index=True).drop_duplicates('profile', keep='last')
+                chunk = add_additional_features(chunk, client_id=client_id, updated_at=updated_at)
+                chunk = finalize_columns(chunk)
+                upsert_visits(chunk, output_dir, rebuild=(i == 0))
+                yield chunk
+
+        rows = export_chunks(oldest_first(), output_dir)
+
+    if newest is not None:
+        save_watermark(newest, output_dir, rows=rows, client_id=client_id)
+    return rows
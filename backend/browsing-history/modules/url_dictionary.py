@@ -0,0 +1,121 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Opt-in: exports carry integer url ids instead of the url / url_clean strings,
+# with the strings stored once in output/urls.csv
+URL_IDS = os.getenv('HISTORY_URL_IDS', '').lower() in ('1', 'true', 'yes')
+
+URL_DICTIONARY_FILE = 'urls.csv'
+
+# String column -> id column that replaces it in id-encoded exports
+URL_ID_COLUMNS = {'url': 'url_id', 'url_clean': 'url_clean_id'}
+
+# Id of a missing URL
+NULL_URL_ID = -1
+
+class UrlDictionary:
+    """
+    Append-only mapping between URL strings and stable integer ids (their
+    position in the dictionary). One id space is shared by url and url_clean.
+    """
+    def __init__(self, urls=()):
+        self.urls = pd.Index(list(urls), dtype=object)
+        self.saved = len(self.urls)
+
+    @classmethod
+    def load(cls, output_dir='output'):
+        """
+        Dictionary stored in output_dir, or an empty one if there is none yet.
+        """
+        path = os.path.join(output_dir, URL_DICTIONARY_FILE)
+        if not os.path.exists(path):
+            return cls()
+        stored = pd.read_csv(path, dtype={'url': object}, keep_default_na=False)
+        if not np.array_equal(stored['url_id'].to_numpy(), np.arange(len(stored))):
+            raise ValueError(f"{path} is not a contiguous url dictionary")
+        return cls(stored['url'])
+
+    def save(self, output_dir='output'):
+        """
+        Append the ids added since the dictionary was loaded or last saved.
+        Existing ids never change, so files written earlier still decode.
+        """
+        if len(self.urls) == self.saved:
+            return
+        path = os.path.join(output_dir, URL_DICTIONARY_FILE)
+        added = pd.DataFrame({
+            'url_id': np.arange(self.saved, len(self.urls)),
+            'url': self.urls[self.saved:],
+        })
+        with open(path, 'a', newline='') as f:
+            added.to_csv(f, index=False, header=self.saved == 0)
+            f.flush()
+            os.fsync(f.fileno())
+        self.saved = len(self.urls)
+
+    def __len__(self):
+        return len(self.urls)
+
+    def encode(self, values):
+        """
+        Ids of a column of URLs, adding the ones not seen before.
+        Missing values get NULL_URL_ID.
+        """
+        values = pd.Series(values, dtype=object)
+        present = values.notna().to_numpy()
+        ids = np.full(len(values), NULL_URL_ID, dtype=np.int64)
+        ids[present] = self.urls.get_indexer(values[present])
+
+        unknown = present & (ids == -1)
+        if unknown.any():
+            # Unique new URLs in order of first appearance get the next ids
+            new_urls = pd.unique(values[unknown])
+            self.urls = self.urls.append(pd.Index(new_urls, dtype=object))
+            ids[unknown] = self.urls.get_indexer(values[unknown])
+        return ids
+
+    def decode(self, ids):
+        """
+        URL strings of a column of ids (None for NULL_URL_ID).
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        urls = np.append(self.urls.to_numpy(dtype=object), [None])
+        return urls[np.where(ids < 0, len(urls) - 1, ids)]
+
+def encode_url_columns(df, dictionary):
+    """
+    Copy of df with url / url_clean replaced, in place, by their id columns.
+    """
+    df = df.copy(deep=False)
+    for column, id_column in URL_ID_COLUMNS.items():
+        if column in df.columns:
+            df[column] = dictionary.encode(df[column])
+            df = df.rename(columns={column: id_column})
+    return df
+
+def decode_url_columns(df, dictionary):
+    """
+    Turn the id columns of an id-encoded frame back into url / url_clean strings.
+    """
+    for column, id_column in URL_ID_COLUMNS.items():
+        if id_column in df.columns:
+            df[id_column] = dictionary.decode(df[id_column])
+            df = df.rename(columns={id_column: column})
+    return df
+
+def has_url_ids(columns):
+    """
+    True if a frame or file header with these columns is id-encoded.
+    """
+    return any(id_column in columns and column not in columns for column, id_column in URL_ID_COLUMNS.items())
+
+def iter_decoded_csv(path, dictionary, chunk_rows=50_000):
+    """
+    Yield an id-encoded CSV export as CSV text with the URL strings restored,
+    one chunk of rows at a time.
+    """
+    header = True
+    for chunk in pd.read_csv(path, chunksize=chunk_rows):
+        yield decode_url_columns(chunk, dictionary).to_csv(index=False, header=header)
+        header = False
@@ -0,0 +1,67 @@
+import os
+import json
+from datetime import datetime
+
+WATERMARK_FILE = 'watermark.json'
+
+def load_watermark(output_dir='output'):
+    """
+    Load the last ingested visit watermark from the output directory.
+    Returns a dict with 'visit_time' and 'visit_id', or None if no previous run exists.
+    """
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            watermark = json.load(f)
+        return {
+            'visit_time': int(watermark['visit_time']),
+            'visit_id': int(watermark['visit_id'])
+        }
+    except (ValueError, KeyError, TypeError) as e:
+        print(f"Ignoring unreadable watermark {path}: {e}")
+        return None
+
+def load_client_id(output_dir='output'):
+    """
+    The client_id of the previously exported dataset, or None if no run recorded one.
+    Full rebuilds reuse it so the visit ids derived from it stay the same.
+    """
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f).get('client_id') or None
+    except (ValueError, AttributeError) as e:
+        print(f"Ignoring unreadable watermark {path}: {e}")
+        return None
+
+def save_watermark(df, output_dir='output', rows=None, client_id=None):
+    """
+    Persist the newest (visit_time, visit_id) in the DataFrame as the watermark
+    for the next incremental run. `rows` overrides the recorded dataset size when
+    `df` is only part of it; `client_id` defaults to the frame's client_id column.
+    """
+    if df.empty:
+        return None
+    last = df.sort_values(['visit_time', 'visit_id']).iloc[-1]
+    watermark = {
+        'visit_time': int(last['visit_time']),
+        'visit_id': int(last['visit_id']),
+        'rows': len(df) if rows is None else rows,
+        'updated_at': datetime.now().isoformat()
+    }
+    if client_id is None and 'client_id' in df.columns:
+        client_id = last['client_id']
+    if client_id is not None:
+        watermark['client_id'] = str(client_id)
+
+    # Write to a temp file first so a crash never leaves a half-written watermark
+    path = os.path.join(output_dir, WATERMARK_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(watermark, f)
+    os.replace(tmp_path, path)
+    return watermark
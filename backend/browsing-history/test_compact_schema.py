@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""Test script for the compact engineered schema."""
+
+import os
+import sys
+import uuid
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+
+from modules.db_reader import read_chrome_history
+from modules.data_cleaner import clean_data
+from modules.feature_engineering import engineer_features, compact_schema, visit_uuids
+from test_incremental import build_history_db
+
+def test_compact_exports_are_identical():
+    """The compact frame is smaller but serializes to the same CSV and JSON."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        build_history_db(db_path, range(1, 2001))
+        df = engineer_features(clean_data(read_chrome_history(db_path)))
+
+    compact = compact_schema(df.copy())
+    assert compact.memory_usage(deep=True).sum() * 2 < df.memory_usage(deep=True).sum()
+    assert compact.to_csv(index=False) == df.to_csv(index=False)
+    assert compact.to_json(orient='records', date_format='iso') == df.to_json(orient='records', date_format='iso')
+    assert compact.attrs['constants']['client_id'] == df['client_id'].iloc[0]
+
+def test_visit_uuids_are_deterministic():
+    """Ids are valid UUIDs, stable per (client, visit) and distinct across clients."""
+    client_a, client_b = str(uuid.uuid4()), str(uuid.uuid4())
+    ids = visit_uuids([1, 2, 3, 1], client_a)
+    assert ids[0] == ids[3] and len(set(ids[:3])) == 3
+    assert all(str(uuid.UUID(i)) == i for i in ids)
+    assert list(visit_uuids([1, 2, 3], client_a)) == list(ids[:3])
+    assert not set(visit_uuids([1, 2, 3], client_b)) & set(ids)
+
+if __name__ == "__main__":
+    test_compact_exports_are_identical()
+    test_visit_uuids_are_deterministic()
+    print("Compact schema tests completed.")
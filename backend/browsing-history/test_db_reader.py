@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Test script for the History database snapshot strategies."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+
+import modules.db_reader as db_reader
+from modules.db_reader import open_history_snapshot, read_chrome_history
+from test_incremental import build_history_db
+
+def snapshot_visits(path, modes):
+    with open_history_snapshot(modes=modes, path=path) as conn:
+        return [row['visit_id'] for row in read_chrome_history(conn)]
+
+def test_each_mode_reads_the_database():
+    """immutable, backup and copy each return every visit of the database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'History')
+        build_history_db(path, range(1, 41))
+        for mode in ('immutable', 'backup', 'copy'):
+            assert sorted(snapshot_visits(path, [mode])) == list(range(1, 41)), mode
+
+def test_copy_mode_cleans_up():
+    """The temporary copy is removed on exit, also when the caller raises."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'History')
+        build_history_db(path, range(1, 11))
+        created = []
+        real_mkdtemp = db_reader.tempfile.mkdtemp
+
+        def mkdtemp(**kwargs):
+            created.append(real_mkdtemp(**kwargs))
+            return created[-1]
+
+        db_reader.tempfile.mkdtemp = mkdtemp
+        try:
+            try:
+                with open_history_snapshot(modes=['copy'], path=path):
+                    raise KeyError('caller failed')
+            except KeyError:
+                pass
+        finally:
+            db_reader.tempfile.mkdtemp = real_mkdtemp
+        assert len(created) == 1 and not os.path.exists(created[0])
+
+def test_locked_database_falls_back_to_copy():
+    """While another connection holds an exclusive lock, backup fails fast and copy is used."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'History')
+        build_history_db(path, range(1, 21))
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute("BEGIN EXCLUSIVE")
+        try:
+            assert sorted(snapshot_visits(path, ['backup', 'copy'])) == list(range(1, 21))
+            try:
+                snapshot_visits(path, ['backup'])
+                assert False, "backup should fail on a locked database"
+            except RuntimeError as e:
+                assert 'backup' in str(e)
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+
+def test_unreadable_file_falls_back():
+    """A file without the history tables fails the probe of every mode."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'History')
+        sqlite3.connect(path).close()
+        try:
+            snapshot_visits(path, ['immutable', 'backup', 'copy'])
+            assert False, "an empty database has no history tables"
+        except RuntimeError as e:
+            assert all(mode in str(e) for mode in ('immutable', 'backup', 'copy'))
+
+if __name__ == "__main__":
+    test_each_mode_reads_the_database()
+    test_copy_mode_cleans_up()
+    test_locked_database_falls_back_to_copy()
+    test_unreadable_file_falls_back()
+    print("Snapshot tests completed.")
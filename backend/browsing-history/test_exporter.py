@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Test script for the multi-format exporter."""
+
+import os
+import sys
+import gzip
+import json
+import time
+import tempfile
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.db_reader import read_chrome_history
+from modules.data_cleaner import clean_data
+from modules.feature_engineering import engineer_features
+from modules.exporter import EXPORT_FILES, export_chunks, export_data, read_exported_history
+from test_incremental import build_history_db
+
+FORMATS = ['csv', 'json', 'ndjson', 'parquet', 'feather']
+
+def make_history(tmp, visits=300):
+    db_path = os.path.join(tmp, 'History')
+    build_history_db(db_path, range(1, visits + 1))
+    return engineer_features(clean_data(read_chrome_history(db_path)))
+
+def test_every_format_has_the_same_rows():
+    """Each format written chunk by chunk holds every row, in order."""
+    with tempfile.TemporaryDirectory() as tmp:
+        df = make_history(tmp)
+        out = os.path.join(tmp, 'out')
+        os.makedirs(out)
+        rows = export_chunks([df.iloc[:100], df.iloc[100:250], df.iloc[250:]], out, FORMATS)
+        assert rows == len(df)
+        assert sorted(os.listdir(out)) == sorted(EXPORT_FILES[f] for f in FORMATS)
+
+        expected = list(df['visit_id'])
+        assert list(pd.read_csv(os.path.join(out, 'history.csv'))['visit_id']) == expected
+        with open(os.path.join(out, 'history.json')) as f:
+            assert [r['visit_id'] for r in json.load(f)] == expected
+        with gzip.open(os.path.join(out, 'history.ndjson.gz'), 'rt') as f:
+            assert [json.loads(line)['visit_id'] for line in f] == expected
+        assert list(pd.read_parquet(os.path.join(out, 'history.parquet'))['visit_id']) == expected
+        feather = pd.read_feather(os.path.join(out, 'history.feather'))
+        assert list(feather['visit_id']) == expected
+        assert str(feather['hour'].dtype) == 'int8'
+
+def test_failed_export_keeps_previous_files():
+    """A failure part-way leaves the previous export in place and no temp files behind."""
+    with tempfile.TemporaryDirectory() as tmp:
+        df = make_history(tmp)
+        out = os.path.join(tmp, 'out')
+        os.makedirs(out)
+        export_data(df.iloc[:10], out, ['csv', 'json'])
+
+        def failing_chunks():
+            yield df.iloc[:100]
+            raise RuntimeError('source failed')
+
+        try:
+            export_chunks(failing_chunks(), out, ['csv', 'json'])
+            assert False, "the export should fail"
+        except RuntimeError:
+            pass
+        assert sorted(os.listdir(out)) == ['history.csv', 'history.json']
+        assert len(pd.read_csv(os.path.join(out, 'history.csv'))) == 10
+
+def test_read_newest_export():
+    """read_exported_history picks the most recently written of parquet, feather and CSV."""
+    with tempfile.TemporaryDirectory() as tmp:
+        df = make_history(tmp)
+        out = os.path.join(tmp, 'out')
+        os.makedirs(out)
+        assert read_exported_history(out) is None
+
+        export_data(df.iloc[:50], out, ['csv'])
+        export_data(df.iloc[:80], out, ['parquet'])
+        now = time.time()
+        os.utime(os.path.join(out, 'history.csv'), (now - 60, now - 60))
+        loaded = read_exported_history(out)
+        assert len(loaded) == 80
+        assert pd.api.types.is_datetime64_any_dtype(loaded['time'])
+
+        export_data(df.iloc[:30], out, ['feather'])
+        os.utime(os.path.join(out, 'history.parquet'), (now - 30, now - 30))
+        assert len(read_exported_history(out)) == 30
+
+if __name__ == "__main__":
+    test_every_format_has_the_same_rows()
+    test_failed_export_keeps_previous_files()
+    test_read_newest_export()
+    print("Exporter tests completed.")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Parity test of the vectorized gap features against the original groupby formula."""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.feature_engineering import GAP_KEYS, add_gap_features, gap_column
+
+def baseline_gaps(df, group_by):
+    """
+    The original calculate_seconds_until_next_visit() formula. It sorted on time
+    alone, so ties are put in visit_id order first to make it deterministic.
+    """
+    df = df.sort_values(['time', 'visit_id'], kind='stable', na_position='last').reset_index(drop=True)
+    return df['visit_id'], df.groupby(group_by)['time'].diff(-1).dt.total_seconds().abs().fillna(-1)
+
+def random_visits(rows, seed):
+    rng = np.random.default_rng(seed)
+    # Few distinct seconds, so many visits share a timestamp
+    seconds = rng.integers(0, rows // 4, rows)
+    times = pd.Series(pd.Timestamp('2025-09-01') + pd.to_timedelta(seconds, unit='s'))
+    times[rng.random(rows) < 0.01] = pd.NaT
+    df = pd.DataFrame({
+        'visit_id': rng.permutation(rows) + 1,
+        'time': times,
+    })
+    for key, groups in (('url', rows // 3), ('url_clean', rows // 10), ('url_domain', 12)):
+        values = pd.Series([f"{key}-{i}" for i in rng.integers(0, groups, rows)], dtype=object)
+        values[rng.random(rows) < 0.03] = None  # missing keys have no next visit
+        df[key] = values
+    # One-visit groups
+    singles = rng.random(rows) < 0.05
+    df.loc[singles, 'url'] = [f"single-{i}" for i in range(int(singles.sum()))]
+    return df
+
+def test_gaps_match_groupby_diff():
+    """Ties, missing keys and times, and one-visit groups give the groupby(...).diff(-1) result."""
+    for seed in range(5):
+        df = random_visits(3000, seed)
+        result = add_gap_features(df.copy())
+        for key in GAP_KEYS:
+            visit_ids, expected = baseline_gaps(df, key)
+            assert list(result['visit_id']) == list(visit_ids)
+            np.testing.assert_array_equal(result[gap_column(key)].to_numpy(), expected.to_numpy(), err_msg=key)
+
+def test_small_frames():
+    """Empty and one-row frames get -1 throughout."""
+    df = random_visits(40, 0)
+    for rows in (df.iloc[:0], df.iloc[:1]):
+        result = add_gap_features(rows.copy())
+        for key in GAP_KEYS:
+            assert (result[gap_column(key)] == -1).all()
+
+if __name__ == "__main__":
+    test_gaps_match_groupby_diff()
+    test_small_frames()
+    print("Feature engineering tests completed.")
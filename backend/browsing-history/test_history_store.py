@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Test script for the date-partitioned history store."""
+
+import os
+import sys
+import tempfile
+import pandas as pd
+import pyarrow.parquet as pq
+sys.path.append(os.path.dirname(__file__))
+
+import modules.history_store as history_store
+from modules.db_reader import read_chrome_history
+from modules.data_cleaner import clean_data
+from modules.exporter import PARQUET_COMPRESSION
+from modules.feature_engineering import engineer_features, REQUIRED_COLUMNS
+from modules.history_store import upsert_visits, list_partitions, read_history_range, store_dir
+from modules.profiles import source_watermarks
+from test_incremental import build_history_db
+
+def make_history(tmp):
+    """About 300 visits an hour apart, spread over three months."""
+    db_path = os.path.join(tmp, 'History')
+    build_history_db(db_path, range(1, 301))
+    df = engineer_features(clean_data(read_chrome_history(db_path)))
+    df['time'] = pd.Timestamp('2025-07-20') + pd.to_timedelta(df.index * 8, unit='h')
+    return df
+
+def test_range_reads_only_overlapping_partitions():
+    """A time range only opens the partitions it overlaps."""
+    with tempfile.TemporaryDirectory() as tmp:
+        df = make_history(tmp)
+        assert upsert_visits(df, tmp, rebuild=True) == ['2025-07', '2025-08', '2025-09', '2025-10']
+        assert list_partitions(tmp, '2025-08-10', '2025-08-20') == ['2025-08']
+
+        opened = []
+        real_read = history_store._read_partition
+
+        def read_partition(path):
+            opened.append(os.path.basename(path))
+            return real_read(path)
+
+        history_store._read_partition = read_partition
+        try:
+            part = read_history_range(tmp, '2025-08-10', '2025-09-05')
+        finally:
+            history_store._read_partition = real_read
+        assert opened == ['2025-08.parquet', '2025-09.parquet']
+        expected = df[(df['time'] >= '2025-08-10') & (df['time'] <= '2025-09-05')]
+        assert list(part['visit_id']) == list(expected['visit_id'])
+
+        metadata = pq.ParquetFile(os.path.join(store_dir(tmp), '2025-08.parquet')).metadata
+        assert metadata.row_group(0).column(0).compression.lower() == PARQUET_COMPRESSION.lower()
+
+def test_upsert_replaces_touched_rows():
+    """Re-sent visits replace their stored version, and other partitions are not rewritten."""
+    with tempfile.TemporaryDirectory() as tmp:
+        df = make_history(tmp)
+        upsert_visits(df, tmp, rebuild=True)
+        july = os.path.join(store_dir(tmp), '2025-07.parquet')
+        july_mtime = os.stat(july).st_mtime_ns
+
+        touched = df[df['time'].dt.month == 9].head(5).copy()
+        touched['seconds_until_next_visit_url'] = 12345.0
+        assert upsert_visits(touched, tmp) == ['2025-09']
+        assert os.stat(july).st_mtime_ns == july_mtime
+
+        stored = read_history_range(tmp)
+        assert len(stored) == len(df) and stored['visit_id'].is_unique
+        updated = stored.set_index('visit_id').loc[touched['visit_id'], 'seconds_until_next_visit_url']
+        assert (updated == 12345.0).all()
+
+def test_empty_range_keeps_the_schema():
+    """A range with no visits returns an empty frame with the store's columns."""
+    with tempfile.TemporaryDirectory() as tmp:
+        assert read_history_range(tmp) is None
+        upsert_visits(make_history(tmp), tmp, rebuild=True)
+
+        empty = read_history_range(tmp, '2030-01-01', '2030-02-01')
+        assert empty.empty and list(empty.columns) == REQUIRED_COLUMNS
+        assert pd.api.types.is_datetime64_any_dtype(empty['time'])
+        assert source_watermarks(empty) == {}
+
+if __name__ == "__main__":
+    test_range_reads_only_overlapping_partitions()
+    test_upsert_replaces_touched_rows()
+    test_empty_range_keeps_the_schema()
+    print("History store tests completed.")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Test script for incremental history ingestion."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.db_reader import read_chrome_history
+from modules.data_cleaner import clean_data
+from modules.feature_engineering import engineer_features, merge_new_visits
+from modules.exporter import export_data, read_exported_history
+from modules.profiles import tag_source, drop_duplicate_visits
+from modules.watermark import load_watermark, load_client_id, save_watermark
+
+URLS = [
+    'https://www.youtube.com/',
+    'https://www.youtube.com/watch?v=1',
+    'https://github.com/fawad57',
+    'https://docs.google.com/document?id=1',
+    'http://localhost:5173/',
+]
+
+def build_history_db(path, visit_ids, start_time=13401382387798732):
+    """Append visits to a minimal Chrome History database; returns the last visit_time."""
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS urls (id INTEGER PRIMARY KEY, url TEXT, title TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS visits (id INTEGER PRIMARY KEY, url INTEGER, visit_time INTEGER, from_visit INTEGER, transition INTEGER)")
+    for i, url in enumerate(URLS, 1):
+        conn.execute("INSERT OR IGNORE INTO urls VALUES (?, ?, ?)", (i, url, f"Page {i}"))
+    visit_time = start_time
+    for visit_id in visit_ids:
+        # Repeat some timestamps to exercise tie handling at the boundary
+        visit_time += [0, 1_000, 5_000_000, 60_000_000][visit_id % 4]
+        conn.execute("INSERT INTO visits VALUES (?, ?, ?, 0, 805306368)",
+                     (visit_id, (visit_id * 7) % len(URLS) + 1, visit_time))
+    conn.commit()
+    conn.close()
+    return visit_time
+
+def test_incremental_matches_full_rebuild():
+    """Merging new visits into an exported dataset equals rebuilding from scratch."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        last_time = build_history_db(db_path, range(1, 201))
+
+        df = engineer_features(clean_data(read_chrome_history(db_path)))
+        export_data(df, tmp)
+        save_watermark(df, tmp)
+
+        build_history_db(db_path, range(201, 351), start_time=last_time)
+        new_rows = read_chrome_history(db_path, since=load_watermark(tmp))
+        assert len(new_rows) == 150
+
+        merged = merge_new_visits(read_exported_history(tmp), clean_data(new_rows))
+        full = engineer_features(clean_data(read_chrome_history(db_path)))
+
+        columns = ['visit_id', 'seconds_until_next_visit_url', 'seconds_until_next_visit_domain',
+                   'seconds_until_next_visit', 'total_history_days', 'hour']
+        pd.testing.assert_frame_equal(merged[columns], full[columns], check_dtype=False)
+        assert merged['client_id'].nunique() == 1
+        assert merged['client_id'].iloc[0] == df['client_id'].iloc[0]
+
+def test_full_rebuild_keeps_ids():
+    """A second full run reuses the recorded client_id, so every id and ref_id is unchanged."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        build_history_db(db_path, range(1, 101))
+        assert load_client_id(tmp) is None
+
+        first = engineer_features(clean_data(read_chrome_history(db_path)), client_id=load_client_id(tmp))
+        save_watermark(first, tmp)
+        assert load_client_id(tmp) == first['client_id'].iloc[0]
+
+        second = engineer_features(clean_data(read_chrome_history(db_path)), client_id=load_client_id(tmp))
+        for column in ('id', 'ref_id', 'client_id'):
+            assert list(second[column]) == list(first[column]), column
+
+def test_new_profile_with_older_visits():
+    """A profile ingested for the first time, older than the stored visits, merges like a full run."""
+    with tempfile.TemporaryDirectory() as tmp:
+        chrome, edge = os.path.join(tmp, 'Chrome'), os.path.join(tmp, 'Edge')
+        build_history_db(chrome, range(1, 201), start_time=13401400000000000)
+        # Starts earlier and overlaps the first profile's visits
+        build_history_db(edge, range(1, 201), start_time=13401399000000000)
+        chrome_df = tag_source(clean_data(read_chrome_history(chrome)), 'chrome/Default')
+        edge_df = tag_source(clean_data(read_chrome_history(edge)), 'edge/Default')
+
+        existing = engineer_features(chrome_df.copy())
+        merged, touched = merge_new_visits(existing, edge_df.copy(), return_touched=True)
+        full = engineer_features(drop_duplicate_visits(pd.concat([chrome_df, edge_df], ignore_index=True)))
+
+        columns = ['visit_id', 'profile', 'seconds_until_next_visit_url', 'seconds_until_next_visit_url_clean',
+                   'seconds_until_next_visit_domain', 'seconds_until_next_visit', 'session_id', 'chain_depth']
+        pd.testing.assert_frame_equal(merged[columns], full[columns], check_dtype=False)
+
+        # Every stored row whose features changed is upserted
+        before = existing.set_index('visit_id')[columns[2:]]
+        after = merged.set_index('visit_id').loc[before.index, columns[2:]]
+        changed = before.index[(before != after).any(axis=1)]
+        assert len(changed) and set(changed) <= set(touched)
+
+if __name__ == "__main__":
+    test_incremental_matches_full_rebuild()
+    test_full_rebuild_keeps_ids()
+    test_new_profile_with_older_visits()
+    print("Incremental ingestion test completed.")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Test script for the background job runner."""
+
+import os
+import sys
+import threading
+sys.path.append(os.path.dirname(__file__))
+
+from modules.jobs import JobRunner
+
+def test_concurrent_submissions_coalesce():
+    """Submissions made while a run is in flight join that run."""
+    runner = JobRunner()
+    release = threading.Event()
+    calls = []
+
+    def pipeline():
+        calls.append(1)
+        release.wait(5)
+        return ['row']
+
+    first, started = runner.submit('fetch', pipeline, source_mtime=1.0)
+    second, joined = runner.submit('fetch', pipeline, source_mtime=1.0)
+    assert started and not joined
+    assert first is second
+
+    release.set()
+    assert first.wait(5)
+    assert first.status == 'done' and first.result == ['row']
+    assert len(calls) == 1
+
+def test_result_cached_until_source_changes():
+    """A finished result is reused until the source mtime changes."""
+    runner = JobRunner()
+    job, _ = runner.submit('fetch', lambda: 'v1', source_mtime=1.0)
+    job.wait(5)
+
+    cached, started = runner.submit('fetch', lambda: 'v2', source_mtime=1.0)
+    assert cached is job and not started
+
+    fresh, started = runner.submit('fetch', lambda: 'v2', source_mtime=2.0)
+    assert started
+    fresh.wait(5)
+    assert fresh.result == 'v2'
+    assert runner.get(job.id) is job
+
+def test_failed_run_is_not_cached():
+    """A run returning None is reported as failed and retried on the next submission."""
+    runner = JobRunner()
+    job, _ = runner.submit('fetch', lambda: None, source_mtime=1.0)
+    job.wait(5)
+    assert job.status == 'failed'
+
+    retry, started = runner.submit('fetch', lambda: 'ok', source_mtime=1.0)
+    assert started and retry is not job
+
+if __name__ == "__main__":
+    test_concurrent_submissions_coalesce()
+    test_result_cached_until_source_changes()
+    test_failed_run_is_not_cached()
+    print("Job runner tests completed.")
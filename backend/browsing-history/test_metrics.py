@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test script for the pipeline instrumentation."""
+
+import os
+import sys
+import json
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+
+from modules.metrics import pipeline_run, render_prometheus
+
+def test_stages_are_logged_and_exported():
+    """Stage timings and row counts reach the run log and the Prometheus text."""
+    with tempfile.TemporaryDirectory() as tmp:
+        with pipeline_run('test', tmp, profile=True, trace_memory=True) as run:
+            with run.stage('build', rows_in=3) as stage:
+                rows = [list(range(1000)) for _ in range(3)]
+                stage.rows_out = len(rows)
+            run.rows = len(rows)
+
+        with open(os.path.join(tmp, 'metrics', 'runs.ndjson')) as f:
+            logged = json.loads(f.readline())
+        assert logged['status'] == 'ok' and logged['rows'] == 3
+        assert logged['stages'][0]['stage'] == 'build'
+        assert logged['stages'][0]['rows_out'] == 3
+        assert logged['stages'][0]['traced_peak_bytes'] > 0
+        assert logged['stages'][0]['peak_rss_growth_bytes'] >= 0
+        assert os.path.exists(logged['profile'])
+
+    text = render_prometheus()
+    assert 'history_stage_rows_out_total{pipeline="test",stage="build"} 3' in text
+    assert 'history_pipeline_runs_total{pipeline="test",status="ok"} 1' in text
+
+def test_stage_memory_is_per_stage():
+    """A stage that allocates little after a large one reports its own peaks, not the earlier high."""
+    with tempfile.TemporaryDirectory() as tmp:
+        with pipeline_run('memory', tmp, trace_memory=True) as run:
+            with run.stage('large'):
+                block = bytearray(64 * 2**20)
+                block[::4096] = b'x' * len(block[::4096])
+                del block
+            with run.stage('small'):
+                rows = [0] * 1000
+        large, small = run.stages
+        assert large.traced_peak_bytes >= 64 * 2**20
+        assert small.traced_peak_bytes < 2**20
+        if small.peak_rss_growth_bytes is not None:
+            assert small.peak_rss_growth_bytes < 2**20
+
+if __name__ == "__main__":
+    test_stages_are_logged_and_exported()
+    test_stage_memory_is_per_stage()
+    print("Metrics test completed.")
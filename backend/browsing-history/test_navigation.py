@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""Test script for transition decoding and session / chain reconstruction."""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.navigation import decode_transitions, lookup_rows, add_navigation_features
+from modules.feature_engineering import engineer_features, merge_new_visits
+
+def make_visits():
+    """Two sessions: a typed visit followed by links and a redirect, then a new chain after a long break."""
+    minutes = [0, 1, 2, 3, 90, 91, 200]
+    return pd.DataFrame({
+        'url': [f'https://example.com/{i}' for i in range(7)],
+        'title': [f'Page {i}' for i in range(7)],
+        'visit_time': [13401382387798732 + m * 60_000_000 for m in minutes],
+        'from_visit': [0, 1, 2, 3, 0, 5, 6],
+        # TYPED|FROM_ADDRESS_BAR, LINK, FORWARD_BACK link, server redirect, AUTO_BOOKMARK, FORM_SUBMIT, signed RELOAD
+        'transition': [0x02000001 | 0x30000000, 0x30000000, 0x31000000, 0xA0000000 - 2**32, 2, 7, -2**31 | 8],
+        'visit_id': list(range(1, 8)),
+        'time': pd.to_datetime([1_760_000_000 + m * 60 for m in minutes], unit='s'),
+        'url_clean': [f'https://example.com/{i}' for i in range(7)],
+        'url_domain': ['example.com'] * 7,
+        'profile': 'chrome/Default',
+    })
+
+def test_decode_transitions():
+    """Core types and qualifier bits decode from signed and unsigned values alike."""
+    decoded = decode_transitions(make_visits()['transition'])
+    assert list(decoded['page_transition']) == ['TYPED', 'LINK', 'LINK', 'LINK', 'AUTO_BOOKMARK', 'FORM_SUBMIT', 'RELOAD']
+    assert list(decoded['from_address_bar']) == [True] + [False] * 6
+    assert list(decoded['forward_back']) == [False, False, True, False, False, False, False]
+    assert list(decoded['redirect']) == [False, False, False, True, False, False, True]
+
+def test_lookup_rows_dense_and_sparse():
+    """Both index layouts find the same rows and report missing ids as -1."""
+    ids = np.array([5, 3, 9, 1])
+    assert list(lookup_rows(ids, [9, 0, 4, 1])) == [2, -1, -1, 3]
+    assert list(lookup_rows(ids << 40, np.array([9, 0, 4, 1]) << 40)) == [2, -1, -1, 3]
+
+def test_sessions_and_chains():
+    """Linked visits stay in their session across an idle gap; unlinked ones start a new one."""
+    df = engineer_features(make_visits())
+    assert list(df['session_id']) == [1, 1, 1, 1, 5, 5, 5]
+    assert list(df['chain_depth']) == [0, 1, 2, 3, 0, 1, 2]
+    assert list(df['page_transition'][:2]) == ['TYPED', 'LINK']
+    assert pd.isna(df['ref_id'].iloc[0])
+    assert list(df['ref_id'][1:4]) == list(df['id'][:3])
+
+def test_context_continues_sessions():
+    """Visits processed after their session started match a single pass over all of them."""
+    full = add_navigation_features(make_visits())
+    earlier = full.iloc[:5].copy()
+    later = add_navigation_features(make_visits().iloc[5:].reset_index(drop=True), context=earlier)
+    assert list(later['session_id']) == list(full['session_id'][5:])
+    assert list(later['chain_depth']) == list(full['chain_depth'][5:])
+
+    merged = merge_new_visits(engineer_features(make_visits().iloc[:5].copy()), make_visits().iloc[5:].reset_index(drop=True))
+    assert list(merged['session_id']) == list(full['session_id'])
+    assert merged['ref_id'].iloc[5] == merged['id'].iloc[4]
+
+if __name__ == "__main__":
+    test_decode_transitions()
+    test_lookup_rows_dense_and_sparse()
+    test_sessions_and_chains()
+    test_context_continues_sessions()
+    print("Navigation tests completed.")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Test script for paging through the fetched history."""
+
+import os
+import sys
+import json
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.pagination import paginate_history, parse_page_args, iter_ndjson
+
+def make_history():
+    """Ten visits; visit_ids 5 and 6 share a timestamp."""
+    times = pd.to_datetime(['2025-01-01 10:00'] * 2 + ['2025-01-02 10:00'] * 4 + ['2025-01-03 10:00'] * 4)
+    times = times + pd.to_timedelta([0, 1, 0, 1, 2, 2, 2, 3, 4, 5], unit='min')
+    return pd.DataFrame({
+        'url': [f'https://example.com/{i}' for i in range(1, 11)],
+        'visit_id': range(1, 11),
+        'time': times,
+    })
+
+def test_cursor_walks_every_row_once():
+    """Following next_cursor visits all rows once, in both orders."""
+    df = make_history()
+    for order in ('asc', 'desc'):
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_history(df, limit=3, cursor=cursor, order=order)
+            seen.extend(page['visit_id'])
+            if cursor is None:
+                break
+        expected = list(range(1, 11))
+        assert seen == (expected if order == 'asc' else expected[::-1])
+
+def test_filters_and_fields():
+    """since/until bound the rows and fields projects the columns."""
+    args = parse_page_args({'since': '2025-01-02', 'until': '2025-01-02T23:59', 'fields': 'visit_id,url'})
+    page, cursor = paginate_history(make_history(), **args)
+    assert list(page.columns) == ['visit_id', 'url']
+    assert list(page['visit_id']) == [3, 4, 5, 6]
+    assert cursor is None
+
+def test_timezone_aware_bounds():
+    """since/until with 'Z' or an offset are compared in UTC, not rejected."""
+    df = make_history()
+    page, _ = paginate_history(df, **parse_page_args({'since': '2025-01-02T00:00:00Z'}))
+    assert list(page['visit_id']) == list(range(3, 11))
+    page, _ = paginate_history(df, **parse_page_args({'until': '2025-01-02T12:02:00+02:00'}))
+    assert list(page['visit_id']) == [1, 2, 3, 4, 5, 6]
+
+def test_ndjson_lines():
+    """NDJSON output has one JSON object per row."""
+    lines = ''.join(iter_ndjson(make_history(), batch_rows=4)).splitlines()
+    assert [json.loads(line)['visit_id'] for line in lines] == list(range(1, 11))
+
+if __name__ == "__main__":
+    test_cursor_walks_every_row_once()
+    test_filters_and_fields()
+    test_timezone_aware_bounds()
+    test_ndjson_lines()
+    print("Pagination tests completed.")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Test script for multi-profile, multi-browser ingestion."""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(__file__))
+
+from modules.db_reader import discover_history_sources
+from modules.feature_engineering import engineer_features
+from modules.profiles import ingest_sources, drop_duplicate_visits, source_watermarks, PRIMARY_SOURCE
+from test_incremental import build_history_db
+
+def make_profiles(root):
+    """Chrome Default + Profile 2 + Profile 10, Edge Default (a copy of Chrome's first 20 visits)."""
+    chrome, edge = os.path.join(root, 'chrome'), os.path.join(root, 'edge')
+    for path in ('Default', 'Profile 2', 'Profile 10', 'System Profile'):
+        os.makedirs(os.path.join(chrome, path))
+    os.makedirs(os.path.join(edge, 'Default'))
+    build_history_db(os.path.join(chrome, 'Default', 'History'), range(1, 101))
+    build_history_db(os.path.join(chrome, 'Profile 2', 'History'), range(1, 51), start_time=13402000000000000)
+    build_history_db(os.path.join(chrome, 'Profile 10', 'History'), range(1, 31), start_time=13403000000000000)
+    build_history_db(os.path.join(chrome, 'System Profile', 'History'), range(1, 5))
+    build_history_db(os.path.join(edge, 'Default', 'History'), range(1, 21))
+    return {'chrome': chrome, 'edge': edge, 'chromium': os.path.join(root, 'missing')}
+
+def test_discovery_order():
+    """Profiles are found per browser, Default first, numeric profile order, system profile skipped."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = discover_history_sources(data_dirs=make_profiles(tmp))
+        assert [s['source'] for s in sources] == [
+            'chrome/Default', 'chrome/Profile 2', 'chrome/Profile 10', 'edge/Default'
+        ]
+
+def test_merged_profiles_are_unique():
+    """Profiles merge into one dataset with unique visit ids and no cross-profile duplicates."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = discover_history_sources(data_dirs=make_profiles(tmp))
+        df = drop_duplicate_visits(ingest_sources(sources, max_workers=2))
+
+        counts = df['profile'].value_counts().to_dict()
+        assert counts == {'chrome/Default': 100, 'chrome/Profile 2': 50, 'chrome/Profile 10': 30}
+        assert df['visit_id'].is_unique
+        # The primary profile keeps its raw visit ids
+        assert set(df.loc[df['profile'] == PRIMARY_SOURCE, 'visit_id']) == set(range(1, 101))
+
+        df = engineer_features(df)
+        assert df['profile'].notna().all()
+
+        # Each profile resumes from its own newest raw visit
+        since = source_watermarks(df)
+        assert since['chrome/Profile 2']['visit_id'] == 50
+        build_history_db(sources[1]['path'], range(51, 61), start_time=13404000000000000)
+        new = drop_duplicate_visits(ingest_sources(sources, since, max_workers=2), df)
+        assert new['profile'].value_counts().to_dict() == {'chrome/Profile 2': 10}
+
+if __name__ == "__main__":
+    test_discovery_order()
+    test_merged_profiles_are_unique()
+    print("Multi-profile ingestion tests completed.")
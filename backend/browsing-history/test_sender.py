@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""Test script for batched uploads against a local stand-in server."""
+
+import os
+import sys
+import gzip
+import json
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+sys.path.append(os.path.dirname(__file__))
+
+from modules.sender import send_history_to_server, load_send_offset
+
+class StandInServer:
+    """Collects posted batches; batches starting at or after `fail_from` always get a 500."""
+
+    def __init__(self):
+        self.batches = {}
+        self.fail_from = None
+        self.lock = threading.Lock()
+        owner = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                offset = int(self.headers['X-Batch-Offset'])
+                if owner.fail_from is not None and offset >= owner.fail_from:
+                    self.send_response(500)
+                    self.end_headers()
+                    return
+                assert self.headers['Content-Encoding'] == 'gzip'
+                with owner.lock:
+                    owner.batches[offset] = json.loads(gzip.decompress(body))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"ok": true}')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/history"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def received(self):
+        return [row for offset in sorted(self.batches) for row in self.batches[offset]]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+RECORDS = [{'visit_id': i, 'url': f'https://example.com/{i}', 'title': 'x' * 40} for i in range(500)]
+
+def test_batches_arrive_complete():
+    """Every record is delivered once, split into size-bounded batches."""
+    server = StandInServer()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = send_history_to_server(server.url, RECORDS, state_dir=tmp, batch_bytes=4096)
+            assert result['sent'] == len(RECORDS) and result['batches'] > 1
+            assert server.received() == RECORDS
+            assert all(len(json.dumps(b)) <= 4096 for b in server.batches.values())
+    finally:
+        server.close()
+
+def test_failed_upload_resumes_at_offset():
+    """After a failed batch, the next call only sends what the server hasn't accepted."""
+    server = StandInServer()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            first = send_history_to_server(server.url, RECORDS[:100], state_dir=tmp, batch_bytes=4096,
+                                           parallel=1)
+            assert first['offset'] == 100
+
+            server.fail_from = 250
+            assert send_history_to_server(server.url, RECORDS, state_dir=tmp, batch_bytes=4096,
+                                          parallel=1, retries=1, backoff=0) is None
+            resume_at = load_send_offset(server.url, tmp)
+            assert 250 <= resume_at < len(RECORDS)
+            assert server.received() == RECORDS[:resume_at]
+
+            server.fail_from = None
+            server.batches.clear()
+            result = send_history_to_server(server.url, RECORDS, state_dir=tmp, batch_bytes=4096)
+            assert min(server.batches) == resume_at
+            assert server.received() == RECORDS[resume_at:]
+            assert result['offset'] == len(RECORDS)
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    test_batches_arrive_complete()
+    test_failed_upload_resumes_at_offset()
+    print("Sender tests completed.")
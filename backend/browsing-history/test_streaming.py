@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Test script for the chunked streaming pipeline."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.db_reader import read_chrome_history
+from modules.data_cleaner import clean_data
+from modules.feature_engineering import engineer_features
+from modules.exporter import export_data
+from modules.db_reader import discover_history_sources
+from modules.profiles import tag_source, drop_duplicate_visits, PRIMARY_SOURCE
+from modules.streaming import stream_history
+from test_incremental import build_history_db
+from test_profiles import make_profiles
+
+# Columns generated per run rather than derived from the visits
+RUN_COLUMNS = ['id', 'client_id', 'updated_at', 'ref_id']
+
+class CountingCursor(sqlite3.Cursor):
+    sizes = []
+
+    def fetchmany(self, size=None):
+        CountingCursor.sizes.append(size)
+        return super().fetchmany(size)
+
+    def fetchall(self):
+        raise AssertionError("the streaming reader must not fetch all rows at once")
+
+class CountingConnection(sqlite3.Connection):
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
+
+def full_export(db_path, output_dir):
+    os.makedirs(output_dir)
+    df = engineer_features(tag_source(clean_data(read_chrome_history(db_path)), PRIMARY_SOURCE))
+    export_data(df, output_dir, ['csv'])
+    return pd.read_csv(os.path.join(output_dir, 'history.csv'))
+
+def test_stream_matches_full_pipeline():
+    """Streaming in small chunks exports the same rows as the in-memory pipeline."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        build_history_db(db_path, range(1, 501))
+        stream_dir, full_dir = os.path.join(tmp, 'stream'), os.path.join(tmp, 'full')
+
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = stream_history(conn, stream_dir, chunk_size=64)
+        finally:
+            conn.close()
+        assert rows == 500
+
+        streamed = pd.read_csv(os.path.join(stream_dir, 'history.csv'))
+        full = full_export(db_path, full_dir)
+        pd.testing.assert_frame_equal(streamed.drop(columns=RUN_COLUMNS), full.drop(columns=RUN_COLUMNS))
+        assert streamed['client_id'].nunique() == 1
+
+        # A second streaming run keeps the client_id and with it every id
+        conn = sqlite3.connect(db_path)
+        try:
+            stream_history(conn, stream_dir, chunk_size=64)
+        finally:
+            conn.close()
+        again = pd.read_csv(os.path.join(stream_dir, 'history.csv'))
+        pd.testing.assert_frame_equal(again[['id', 'client_id', 'ref_id']], streamed[['id', 'client_id', 'ref_id']])
+
+def link_visits(db_path):
+    """Chain visits across chunk boundaries and split the history into sessions."""
+    conn = sqlite3.connect(db_path)
+    # Hour-long idle gaps every 40 visits, bridged by some of the links
+    conn.execute("UPDATE visits SET visit_time = visit_time + (id / 40) * 3600000000")
+    conn.execute("UPDATE visits SET from_visit = id - 147 WHERE id % 7 = 0 AND id > 147")
+    conn.execute("UPDATE visits SET from_visit = id - 1 WHERE id % 5 = 1 AND id > 1")
+    conn.execute("UPDATE visits SET from_visit = id - 41 WHERE id % 40 = 0 AND id > 41")
+    conn.commit()
+    conn.close()
+
+def test_stream_links_across_chunks():
+    """Sessions and chains whose parents lie several chunks back match the in-memory pipeline."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        build_history_db(db_path, range(1, 801))
+        link_visits(db_path)
+        stream_dir, full_dir = os.path.join(tmp, 'stream'), os.path.join(tmp, 'full')
+
+        conn = sqlite3.connect(db_path)
+        try:
+            stream_history(conn, stream_dir, chunk_size=64)
+        finally:
+            conn.close()
+
+        streamed = pd.read_csv(os.path.join(stream_dir, 'history.csv'))
+        full = full_export(db_path, full_dir)
+        assert full['chain_depth'].max() > 3 and full['session_id'].nunique() > 1
+        pd.testing.assert_frame_equal(streamed[['visit_id', 'session_id', 'chain_depth']],
+                                      full[['visit_id', 'session_id', 'chain_depth']])
+
+def test_stream_merges_profiles():
+    """Every profile is streamed into one export that matches the merged in-memory pipeline."""
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = discover_history_sources(data_dirs=make_profiles(tmp))
+        connections = [(source['source'], sqlite3.connect(source['path'])) for source in sources]
+        stream_dir, full_dir = os.path.join(tmp, 'stream'), os.path.join(tmp, 'full')
+        try:
+            rows = stream_history(connections, stream_dir, chunk_size=32)
+        finally:
+            for _, conn in connections:
+                conn.close()
+        # Edge's visits are copies of Chrome Default's and are dropped
+        assert rows == 180
+
+        frames = [tag_source(clean_data(read_chrome_history(s['path'])), s['source']) for s in sources]
+        df = engineer_features(drop_duplicate_visits(pd.concat(frames, ignore_index=True)))
+        os.makedirs(full_dir)
+        export_data(df, full_dir, ['csv'])
+        full = pd.read_csv(os.path.join(full_dir, 'history.csv'))
+        streamed = pd.read_csv(os.path.join(stream_dir, 'history.csv'))
+        pd.testing.assert_frame_equal(streamed.drop(columns=RUN_COLUMNS), full.drop(columns=RUN_COLUMNS))
+
+def test_chunks_are_fetched_with_fetchmany():
+    """The cursor is drained chunk_size rows at a time."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        build_history_db(db_path, range(1, 201))
+        CountingCursor.sizes = []
+        conn = sqlite3.connect(db_path, factory=CountingConnection)
+        try:
+            stream_history(conn, os.path.join(tmp, 'out'), chunk_size=50)
+        finally:
+            conn.close()
+        # Four full chunks and the empty fetch that ends the loop
+        assert CountingCursor.sizes == [50] * 5
+
+if __name__ == "__main__":
+    test_stream_matches_full_pipeline()
+    test_stream_links_across_chunks()
+    test_stream_merges_profiles()
+    test_chunks_are_fetched_with_fetchmany()
+    print("Streaming tests completed.")
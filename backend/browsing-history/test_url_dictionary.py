@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Test script for url dictionary encoded exports."""
+
+import os
+import sys
+import tempfile
+import pandas as pd
+sys.path.append(os.path.dirname(__file__))
+
+from modules.db_reader import read_chrome_history
+from modules.data_cleaner import clean_data
+from modules.feature_engineering import engineer_features
+from modules.exporter import export_data, export_chunks, read_exported_history
+from modules.url_dictionary import UrlDictionary, URL_DICTIONARY_FILE
+from test_incremental import build_history_db
+
+def test_id_encoded_export_round_trips():
+    """An id-encoded CSV is smaller and reads back to the same frame."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'History')
+        build_history_db(db_path, range(1, 2001))
+        df = engineer_features(clean_data(read_chrome_history(db_path)))
+
+        plain_dir, ids_dir = os.path.join(tmp, 'plain'), os.path.join(tmp, 'ids')
+        os.makedirs(plain_dir)
+        os.makedirs(ids_dir)
+        export_data(df, plain_dir, ['csv'])
+        export_chunks([df.iloc[:1000], df.iloc[1000:]], ids_dir, ['csv'], url_ids=True)
+
+        header = pd.read_csv(os.path.join(ids_dir, 'history.csv'), nrows=0).columns
+        assert 'url_id' in header and 'url' not in header
+        assert os.path.getsize(os.path.join(ids_dir, 'history.csv')) < os.path.getsize(os.path.join(plain_dir, 'history.csv'))
+
+        pd.testing.assert_frame_equal(read_exported_history(ids_dir), read_exported_history(plain_dir), check_dtype=False)
+
+def test_ids_are_stable():
+    """Known URLs keep their ids across saves; new ones are appended."""
+    with tempfile.TemporaryDirectory() as tmp:
+        first = UrlDictionary()
+        assert list(first.encode(['https://a/', 'https://b/', 'https://a/', None])) == [0, 1, 0, -1]
+        first.save(tmp)
+
+        second = UrlDictionary.load(tmp)
+        assert list(second.encode(['https://c/', 'https://b/'])) == [2, 1]
+        second.save(tmp)
+
+        assert list(UrlDictionary.load(tmp).decode([2, 0, -1])) == ['https://c/', 'https://a/', None]
+        assert len(pd.read_csv(os.path.join(tmp, URL_DICTIONARY_FILE))) == 3
+
+if __name__ == "__main__":
+    test_id_encoded_export_round_trips()
+    test_ids_are_stable()
+    print("Url dictionary tests completed.")
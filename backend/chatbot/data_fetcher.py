@@ -5,6 +5,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Browsing history columns used to build the RAG context
+HISTORY_FIELDS = ["url", "title", "url_domain", "visit_time"]
+
 class DataFetcher:
     """Fetches user data from various PsyPlex services for RAG context."""
 
@@ -41,11 +44,16 @@ class DataFetcher:
             print(f"Error fetching profile: {e}")
             return {}
 
-    def fetch_browsing_history(self) -> List[Dict[str, Any]]:
-        """Fetch user's browsing history."""
+    def fetch_browsing_history(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Fetch the user's most recent browsing history entries."""
         try:
             response = requests.get(
                 f"{self.api_base}/chrome-history/fetch",
+                params={
+                    "limit": limit,
+                    "order": "desc",
+                    "fields": ",".join(HISTORY_FIELDS)
+                },
                 headers=self._get_headers(),
                 timeout=30
             )
@@ -75,15 +83,16 @@ class DataFetcher:
             print(f"Error fetching mood tracks: {e}")
             return []
 
-    def fetch_emotion_data(self) -> List[Dict[str, Any]]:
-        """Fetch emotion data from domain classification service."""
+    def fetch_emotion_data(self, tail: int = 20) -> List[Dict[str, Any]]:
+        """Fetch the most recent emotion entries from domain classification service."""
         try:
             response = requests.get(
                 f"{self.domain_api_base}/get_emotion_data",
+                params={"tail": tail},
                 timeout=10
             )
             if response.status_code == 200:
-                return response.json()
+                return response.json().get("data", [])
             else:
                 print(f"Failed to fetch emotion data: {response.status_code}")
                 return []
@@ -62,7 +62,7 @@ class VectorStoreManager:
                 Browsing Activity:
                 URL: {item.get('url', '')}
                 Title: {item.get('title', '')}
-                Domain: {item.get('domain', '')}
+                Domain: {item.get('domain', item.get('url_domain', ''))}
                 Visit Time: {item.get('visit_time', '')}
                 Time Spent: {item.get('time_spent', 0)} seconds
                 Category: {item.get('category', 'Unknown')}
@@ -71,7 +71,7 @@ class VectorStoreManager:
                     page_content=history_text.strip(),
                     metadata={
                         "type": "browsing_history",
-                        "domain": item.get("domain"),
+                        "domain": item.get("domain", item.get("url_domain")),
                         "category": item.get("category"),
                         "time_spent": item.get("time_spent", 0)
                     }